@@ -0,0 +1,279 @@
+"""Offline latency and accuracy benchmark for TShirtQueryHelper.
+
+Loads ``dataset/atliq_tshirts.sql`` into a local SQLite file, runs a question
+corpus (seeded from ``few_shots``; expected answers come from running each
+reference SQL against the same database) through the pipeline and prints a
+JSON report with per-stage p50/p95 latency, cold and warm throughput per
+concurrency level and exact-match accuracy.
+
+    python benchmark.py --llm oracle --llm-latency 0.5 --concurrency 1 4 8
+    python benchmark.py --llm gemini --embeddings local --record recordings.json
+    python benchmark.py --llm replay --recordings recordings.json --embeddings local
+
+``oracle`` is a stub LLM that answers with the reference SQL, ``replay``
+serves responses recorded from a live run; both need no network.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.language_models.llms import LLM
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from few_shots import few_shots
+from embedded_db import ensure_embedded_database, sqlite_uri
+from sql_database import TShirtSQLDatabase
+from embedding_backends import load_embeddings
+from langchain_helper import TShirtQueryHelper, INVENTORY_TABLES, format_numeric_answer
+
+
+class OracleLLM(LLM):
+    """Stub LLM that writes the reference SQL for known questions."""
+
+    sql_by_question: Dict[str, str]
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "oracle-stub"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        if "\nDouble check the" in prompt:
+            return prompt.split("\nDouble check the")[0].strip()
+        question = prompt.rsplit("Question: ", 1)[-1]
+        if question.rstrip().endswith("Answer:"):
+            result = question.rsplit("SQLResult:", 1)[-1]
+            number = re.search(r"-?\d+(?:\.\d+)?", result)
+            return number.group() if number else result.strip()
+        return self.sql_by_question.get(question.split("\nSQLQuery:")[0].strip(), "SELECT 1")
+
+
+def _prompt_key(prompt):
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+class ReplayLLM(LLM):
+    """Serves responses recorded by ``RecordingLLM``, keyed by prompt hash."""
+
+    recordings: Dict[str, str]
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        key = _prompt_key(prompt)
+        if key not in self.recordings:
+            raise KeyError(f"No recorded response for prompt {key[:12]}")
+        return self.recordings[key]
+
+
+class RecordingLLM(LLM):
+    """Wraps a live LLM and records every response for later replay."""
+
+    llm: Any
+    recordings: Dict[str, str]
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        response = self.llm.invoke(prompt, stop=stop)
+        text = getattr(response, "content", response)
+        self.recordings[_prompt_key(prompt)] = text
+        return text
+
+
+def load_corpus(path=None):
+    """Return ``[{"question", "sql"}]`` from few_shots plus an optional JSONL file."""
+    corpus = [{"question": example["Question"], "sql": example["SQLQuery"]} for example in few_shots]
+    if path:
+        with open(path) as f:
+            corpus.extend(json.loads(line) for line in f if line.strip())
+    return corpus
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+    }
+
+
+def build_helper(args, corpus):
+    db_path = ensure_embedded_database(args.db_path, seed=args.seed)
+    db = TShirtSQLDatabase.from_uri(sqlite_uri(db_path), sample_rows_in_table_info=3, include_tables=INVENTORY_TABLES)
+
+    if args.embeddings == "stub":
+        embeddings = DeterministicFakeEmbedding(size=256)
+    else:
+        embeddings = load_embeddings(args.embeddings)
+
+    recordings = {}
+    if args.llm == "oracle":
+        llm = OracleLLM(sql_by_question={item["question"]: item["sql"] for item in corpus}, latency=args.llm_latency)
+    elif args.llm == "replay":
+        with open(args.recordings) as f:
+            recordings = json.load(f)
+        llm = ReplayLLM(recordings=recordings, latency=args.llm_latency)
+    else:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+        if args.record:
+            llm = RecordingLLM(llm=llm, recordings=recordings)
+
+    os.environ.setdefault("FEW_SHOT_STORE_DIR", os.path.join(tempfile.mkdtemp(prefix="benchmark-"), "few_shots"))
+    helper = TShirtQueryHelper(
+        use_sql_cache=not args.no_cache,
+        use_fast_path=not args.no_fast_path,
+        use_inventory_cube=not args.no_cube,
+        cost_guard=not args.no_cost_guard,
+        query_checker=args.query_checker,
+        answer_mode=args.answer_mode,
+        example_selector=args.example_selector,
+        llm=llm,
+        embeddings=embeddings,
+        db=db
+    )
+    helper.chain.verbose = False
+    return helper, db, recordings
+
+
+def run_accuracy(helper, db, corpus, top_k):
+    # With --answer-mode llm each question also gets its natural-language answer (the "answer" stage).
+    with_answer = helper.answer_mode == "llm"
+    results = []
+    stage_timings = {}
+    for item in corpus:
+        expected = format_numeric_answer(db.run(item["sql"], fetch="cursor").fetchone()[0])
+        started = time.perf_counter()
+        try:
+            result = helper.query_tshirt_inventory_rows(item["question"], top_k=top_k, with_answer=with_answer)
+            elapsed = time.perf_counter() - started
+            rows = result["rows"]
+            answer = format_numeric_answer(rows[0][0]) if rows and rows[0] else None
+            entry = {"source": result["source"], "sql": result["sql"], "answer_text": result["answer"],
+                     "timings": result["timings"], "error": None}
+            for stage, seconds in result["timings"].items():
+                stage_timings.setdefault(stage, []).append(seconds)
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            answer = None
+            entry = {"source": None, "sql": None, "answer_text": None, "timings": {}, "error": str(e)}
+        stage_timings.setdefault("total", []).append(elapsed)
+        entry.update(question=item["question"], expected=expected, answer=answer, correct=answer == expected)
+        results.append(entry)
+    return results, stage_timings
+
+
+def _timed_batch(helper, questions, top_k, concurrency):
+    started = time.perf_counter()
+    answers = helper.query_tshirt_inventory_batch(questions, top_k=top_k, max_concurrency=concurrency)
+    elapsed = time.perf_counter() - started
+    return {
+        "questions": len(questions),
+        "errors": sum(1 for answer in answers if answer["error"]),
+        "seconds": round(elapsed, 4),
+        "questions_per_second": round(len(questions) / elapsed, 3) if elapsed else None,
+    }
+
+
+def run_throughput(make_helper, corpus, concurrency_levels, repeat, top_k):
+    """Time batches per concurrency level, each level on a helper from ``make_helper()``.
+
+    The first pass over the corpus is reported as "cold"; the other
+    ``repeat - 1`` passes, served from the SQL cache and cube the first pass
+    filled, as "warm".
+    """
+    questions = [item["question"] for item in corpus]
+    report = []
+    for concurrency in concurrency_levels:
+        helper = make_helper()
+        entry = {"concurrency": concurrency, "cold": _timed_batch(helper, questions, top_k, concurrency)}
+        if repeat > 1:
+            entry["warm"] = _timed_batch(helper, questions * (repeat - 1), top_k, concurrency)
+        report.append(entry)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--llm", choices=["oracle", "replay", "gemini"], default="oracle")
+    parser.add_argument("--embeddings", choices=["stub", "local", "google"], default="stub")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per stub LLM call")
+    parser.add_argument("--recordings", help="JSON file of recorded responses for --llm replay")
+    parser.add_argument("--record", help="with --llm gemini, write recorded responses to this JSON file")
+    parser.add_argument("--corpus", help="extra JSONL questions with reference SQL: {\"question\", \"sql\"}")
+    parser.add_argument("--db-path", default=os.path.join(".benchmark", "atliq_tshirts.db"))
+    parser.add_argument("--seed", type=int, default=0, help="seed for the PopulateTShirts data")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="corpus repetitions per concurrency level; all but the first are warm")
+    parser.add_argument("--top-k", type=int, default=1)
+    parser.add_argument("--query-checker", choices=["local", "llm"], default="local")
+    parser.add_argument("--answer-mode", choices=["llm", "sql"], default="sql")
+    parser.add_argument("--example-selector", choices=["numpy", "chroma"], default="numpy")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-fast-path", action="store_true")
+    parser.add_argument("--no-cube", action="store_true")
+    parser.add_argument("--no-cost-guard", action="store_true")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.record:
+        args.llm = "gemini"
+
+    corpus = load_corpus(args.corpus)
+    helper, db, recordings = build_helper(args, corpus)
+    results, stage_timings = run_accuracy(helper, db, corpus, args.top_k)
+
+    def fresh_helper():
+        # Each level starts without the SQL cache and cube filled by earlier runs.
+        helper, _, more_recordings = build_helper(args, corpus)
+        recordings.update(more_recordings)
+        return helper
+
+    throughput = run_throughput(fresh_helper, corpus, args.concurrency, args.repeat, args.top_k)
+
+    correct = sum(1 for result in results if result["correct"])
+    sources = {}
+    for result in results:
+        sources[result["source"]] = sources.get(result["source"], 0) + 1
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "record")},
+        "accuracy": {"correct": correct, "total": len(results), "exact_match": round(correct / len(results), 4)},
+        "latency": {stage: summarize(values) for stage, values in stage_timings.items()},
+        "sources": sources,
+        "throughput": throughput,
+        "questions": results,
+    }
+
+    if args.record:
+        with open(args.record, "w") as f:
+            json.dump(recordings, f, indent=2)
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,99 @@
+from decimal import Decimal
+import numpy as np
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _to_array(values):
+    """Typed array for one column of a batch: int64, float64 (NULL as NaN), bool or object."""
+    array = np.asarray(values)
+    if array.dtype.kind == "b":
+        return array
+    if array.dtype.kind == "i":
+        return array.astype(np.int64, copy=False)
+    if array.dtype.kind == "u":
+        return array  # only above the int64 range
+    if array.dtype.kind == "f":
+        return array.astype(np.float64, copy=False)
+    if array.dtype.kind != "O":
+        return _object_array(values)  # strings, dates
+
+    # NULLs, DECIMALs or mixed types: decide from the non-NULL values.
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (int, float, Decimal, np.number)) and not isinstance(value, (bool, np.bool_))
+                       for value in present):
+        return np.asarray([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+    return _object_array(values)
+
+
+class ColumnarBuilder:
+    """Collects row batches as per-column NumPy chunks."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self._chunks = [[] for _ in self.columns]
+        self.num_rows = 0
+
+    def add(self, rows):
+        if not rows:
+            return
+        for chunks, values in zip(self._chunks, zip(*rows)):
+            chunks.append(_to_array(list(values)))
+        self.num_rows += len(rows)
+
+    def build(self, truncated=False):
+        arrays = [
+            np.concatenate(chunks) if chunks else np.empty(0, dtype=object)
+            for chunks in self._chunks
+        ]
+        return ColumnarResult(self.columns, arrays, truncated=truncated)
+
+
+class ColumnarResult:
+    """Query result as one typed NumPy array per column.
+
+    ``truncated`` is True when the query returned more rows than the cap.
+    DECIMAL values become float64 and NULLs in numeric columns become NaN.
+    """
+
+    def __init__(self, columns, arrays, truncated=False):
+        self.columns = list(columns)
+        self.arrays = list(arrays)
+        self.truncated = truncated
+
+    def __len__(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def __getitem__(self, column):
+        return self.arrays[self.columns.index(column)]
+
+    def rows(self, limit=None):
+        count = len(self) if limit is None else min(limit, len(self))
+        return [tuple(array[i].item() if hasattr(array[i], "item") else array[i] for array in self.arrays)
+                for i in range(count)]
+
+    def to_dict(self):
+        """``{column: list}`` with plain Python values (NaN back to None), e.g. for JSON."""
+        return {
+            column: [None if value != value else value for value in array.tolist()] if array.dtype.kind == "f"
+            else array.tolist()
+            for column, array in zip(self.columns, self.arrays)
+        }
+
+    def to_arrow(self):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("to_arrow needs pyarrow: pip install pyarrow")
+        return pa.table({column: array for column, array in zip(self.columns, self.arrays)})
+
+    def preview(self, limit=20):
+        """Short string of the first rows, for the answer prompt."""
+        text = str(self.rows(limit))
+        if len(self) > limit or self.truncated:
+            text += f" ... ({len(self)}{'+' if self.truncated else ''} rows)"
+        return text
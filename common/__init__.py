@@ -0,0 +1 @@
+"""Helpers shared by the T-shirt app and the document Q&A app in ``querywebsite/``."""
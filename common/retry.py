@@ -0,0 +1,47 @@
+import time
+import random
+import asyncio
+
+RATE_LIMIT_MARKERS = ("429", "rate limit", "ratelimit", "resource exhausted", "resource_exhausted", "quota")
+
+
+def is_rate_limited(exc):
+    """Best-effort check for provider rate-limit / quota errors."""
+    if getattr(exc, "code", None) == 429 or getattr(exc, "status_code", None) == 429:
+        return True
+    name = type(exc).__name__.lower()
+    if "ratelimit" in name or "resourceexhausted" in name:
+        return True
+    message = str(exc).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """Exponential backoff with full jitter for the given 0-based attempt."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_backoff(fn, *args, max_retries=3, base_delay=1.0, max_delay=30.0, **kwargs):
+    """Call ``fn`` and retry it with backoff while it fails with a rate-limit error."""
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_rate_limited(e):
+                raise
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+
+
+async def acall_with_backoff(fn, *args, max_retries=3, base_delay=1.0, max_delay=30.0, **kwargs):
+    """Async counterpart of ``call_with_backoff`` for coroutine functions."""
+    attempt = 0
+    while True:
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_rate_limited(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
@@ -0,0 +1,18 @@
+class TokenCounter:
+    """Counts tokens with tiktoken.
+
+    Falls back to roughly four characters per token when the encoding cannot
+    be loaded (tiktoken downloads it on first use).
+    """
+
+    def __init__(self, encoding_name="cl100k_base"):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception:
+            self._encoding = None
+
+    def count(self, text):
+        if self._encoding is None:
+            return (len(text) + 3) // 4
+        return len(self._encoding.encode(text, disallowed_special=()))
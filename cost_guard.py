@@ -0,0 +1,217 @@
+import re
+import threading
+from sql_validator import _tokenize, _is_name
+
+SQLITE_PLAN_STEP = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS (\S+))?(.*)$")
+TIMEOUT_ERRORS = ("maximum statement execution time exceeded", "interrupted")
+
+
+class CostLimitExceeded(ValueError):
+    """A generated statement was rejected before (or while) running.
+
+    ``violations`` is a list of ``{"rule", "actual", "limit"}`` dicts (plus
+    ``"table"`` for full scans) and ``estimate`` the plan summary they were
+    found in; ``feedback()`` turns them into an instruction for regenerating
+    a cheaper query.
+    """
+
+    def __init__(self, sql, violations, estimate=None):
+        self.sql = sql
+        self.violations = violations
+        self.estimate = estimate or {}
+        super().__init__("Rejected expensive SQL: " + "; ".join(_describe(v) for v in violations))
+
+    def feedback(self):
+        return (f"The query {self.sql} was rejected as too expensive ("
+                + "; ".join(_describe(v) for v in self.violations)
+                + "). Write a cheaper query: filter on indexed columns, join fewer tables, "
+                  "aggregate in SQL and use LIMIT.")
+
+
+def _describe(violation):
+    rule = violation["rule"].replace("_", " ")
+    if "table" in violation:
+        rule += f" of {violation['table']}"
+    return f"{rule} {violation['actual']} exceeds {violation['limit']}"
+
+
+def count_joins(sql):
+    """Number of joins: JOIN keywords plus commas between tables in a FROM list."""
+    joins = 0
+    in_from = False
+    stack = []
+    for kind, value in _tokenize(sql):
+        upper = value.upper() if kind == "word" else value
+        if upper == "(":
+            stack.append(in_from)
+            in_from = False
+        elif upper == ")":
+            in_from = stack.pop() if stack else False
+        elif kind == "word" and upper == "JOIN":
+            joins += 1
+            in_from = True
+        elif kind == "word" and upper == "FROM":
+            in_from = True
+        elif kind == "word" and upper in ("WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "UNION", "SELECT",
+                                          "WINDOW", "FOR", "INTERSECT", "EXCEPT"):
+            in_from = False
+        elif upper == "," and in_from:
+            joins += 1
+    return joins
+
+
+def table_aliases(sql, tables):
+    """``{alias or table: table}`` for the known ``tables`` named in ``sql``."""
+    tables = {table.lower(): table for table in tables}
+    tokens = _tokenize(sql)
+    aliases = {}
+    for i, (kind, value) in enumerate(tokens):
+        if not _is_name((kind, value)) or value.lower() not in tables:
+            continue
+        table = tables[value.lower()]
+        aliases[value.lower()] = table
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if nxt is not None and nxt[0] == "word" and nxt[1].upper() == "AS" and i + 2 < len(tokens):
+            nxt = tokens[i + 2]
+        if nxt is not None and _is_name(nxt):
+            aliases[nxt[1].lower()] = table
+    return aliases
+
+
+def add_limit(sql, limit):
+    """Append ``LIMIT limit`` unless the outer statement already limits or locks its rows."""
+    depth = 0
+    for kind, value in _tokenize(sql):
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        elif depth == 0 and kind == "word" and value.upper() in ("LIMIT", "FOR", "FETCH", "INTO"):
+            return sql
+    return f"{sql.strip().rstrip(';').rstrip()} LIMIT {int(limit)}"
+
+
+class SQLCostGuard:
+    """Checks generated SQL against its query plan before it runs.
+
+    ``estimate`` runs ``EXPLAIN`` (``EXPLAIN QUERY PLAN`` on SQLite) and
+    returns the estimated rows examined, the join count and the full table
+    scans. ``check`` raises ``CostLimitExceeded`` when one of the limits is
+    exceeded and otherwise returns the SQL with a ``LIMIT default_limit``
+    appended where the statement has none. Any limit can be None to disable
+    it. With ``use_explain=False`` no plan is read: only the join count
+    (from the SQL text) and the default LIMIT are checked. Statements run
+    with ``execution_options`` get a per-statement ``statement_timeout``
+    (seconds), enforced by ``create_pooled_engine``.
+
+    SQLite plans carry no row estimates, so table sizes are counted (cached
+    per data version) and an index lookup is assumed to match 10 rows, as
+    SQLite's own planner does without ANALYZE statistics.
+    """
+
+    def __init__(self, db, max_estimated_rows=1000000, max_joins=3, max_full_scan_rows=100000,
+                 default_limit=1000, statement_timeout=10, use_explain=True):
+        self.db = db
+        self.max_estimated_rows = max_estimated_rows
+        self.max_joins = max_joins
+        self.max_full_scan_rows = max_full_scan_rows
+        self.default_limit = default_limit
+        self.statement_timeout = statement_timeout
+        self.use_explain = use_explain
+        self._table_rows = {}
+        self._table_rows_version = None
+        self._lock = threading.Lock()
+
+    @property
+    def execution_options(self):
+        return {"statement_timeout": self.statement_timeout} if self.statement_timeout else {}
+
+    def check(self, sql, limit=None):
+        if self.use_explain:
+            estimate = self.estimate(sql)
+        else:
+            estimate = {"estimated_rows": None, "joins": count_joins(sql.strip().rstrip(";")), "full_scans": []}
+        violations = []
+        if self.max_joins is not None and estimate["joins"] > self.max_joins:
+            violations.append({"rule": "joins", "actual": estimate["joins"], "limit": self.max_joins})
+        if self.max_estimated_rows is not None and estimate["estimated_rows"] is not None \
+                and estimate["estimated_rows"] > self.max_estimated_rows:
+            violations.append({"rule": "estimated_rows", "actual": estimate["estimated_rows"],
+                               "limit": self.max_estimated_rows})
+        if self.max_full_scan_rows is not None:
+            for table, rows in estimate["full_scans"]:
+                if rows > self.max_full_scan_rows:
+                    violations.append({"rule": "full_scan_rows", "table": table, "actual": rows,
+                                       "limit": self.max_full_scan_rows})
+        if violations:
+            raise CostLimitExceeded(sql, violations, estimate)
+        limit = limit or self.default_limit
+        return add_limit(sql, limit) if limit else sql
+
+    def timeout_error(self, sql, error):
+        """``CostLimitExceeded`` for a statement the database stopped at its timeout, else None."""
+        message = str(error).lower()
+        if not self.statement_timeout or not any(text in message for text in TIMEOUT_ERRORS):
+            return None
+        return CostLimitExceeded(sql, [{"rule": "execution_seconds", "actual": f">{self.statement_timeout}",
+                                        "limit": self.statement_timeout}])
+
+    def estimate(self, sql, parameters=None):
+        """``{"estimated_rows", "joins", "full_scans": [(table, rows)]}`` for ``sql``."""
+        statement = sql.strip().rstrip(";")
+        if self.db.dialect == "sqlite":
+            estimated_rows, full_scans = self._explain_sqlite(statement, parameters)
+        else:
+            estimated_rows, full_scans = self._explain_mysql(statement, parameters)
+        return {"estimated_rows": estimated_rows, "joins": count_joins(statement), "full_scans": full_scans}
+
+    def _explain_mysql(self, statement, parameters=None):
+        # Rows of one SELECT are joined in a nested loop, so their estimates
+        # multiply; separate SELECTs (subqueries, derived tables, UNION) add up.
+        cursor = self.db.run(f"EXPLAIN {statement}", fetch="cursor", parameters=parameters)
+        selects, full_scans = {}, []
+        for row in cursor.fetchall():
+            step = row._mapping
+            rows = int(step.get("rows") or 1)
+            selects[step.get("id")] = selects.get(step.get("id"), 1) * max(rows, 1)
+            if step.get("type") in ("ALL", "index") and step.get("table") and not step["table"].startswith("<"):
+                full_scans.append((step["table"], rows))
+        return sum(selects.values()), full_scans
+
+    def _explain_sqlite(self, statement, parameters=None):
+        cursor = self.db.run(f"EXPLAIN QUERY PLAN {statement}", fetch="cursor", parameters=parameters)
+        aliases = table_aliases(statement, self.db.get_usable_table_names())
+        groups, full_scans = {}, []
+        for _, parent, _, detail in cursor.fetchall():
+            match = SQLITE_PLAN_STEP.match(detail)
+            if match is None:
+                continue
+            operation, name, _, rest = match.groups()
+            table = aliases.get(name.lower())
+            if table is None:
+                continue  # derived table or CTE, counted in its own group
+            table_rows = self._count_rows(table)
+            if operation == "SCAN":
+                rows = table_rows
+                full_scans.append((table, table_rows))
+            elif "PRIMARY KEY" in rest or "rowid=" in rest:
+                rows = 1
+            elif "=" in rest:
+                rows = min(table_rows, 10)
+            else:
+                rows = max(1, table_rows // 4)
+            groups[parent] = groups.get(parent, 1) * max(rows, 1)
+        return sum(groups.values()), full_scans
+
+    def _count_rows(self, table):
+        version = self.db.data_version()
+        with self._lock:
+            if version != self._table_rows_version:
+                self._table_rows = {}
+                self._table_rows_version = version
+            if table in self._table_rows:
+                return self._table_rows[table]
+        rows = self.db.run(f'SELECT COUNT(*) FROM "{table}"', fetch="cursor").fetchone()[0]
+        with self._lock:
+            self._table_rows[table] = rows
+        return rows
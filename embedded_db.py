@@ -0,0 +1,154 @@
+import os
+import re
+import random
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+DEFAULT_DUMP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset", "atliq_tshirts.sql")
+DEFAULT_DATABASE_PATH = os.path.join(".embedded_db", "atliq_tshirts.db")
+
+
+def _convert_create_table(statement):
+    """Rewrite a MySQL CREATE TABLE into SQLite, keeping ENUMs as CHECK constraints."""
+    # DECIMAL would get NUMERIC affinity and store 10.00 as an integer, turning
+    # "pct_discount / 100" into integer division; REAL keeps MySQL's arithmetic.
+    statement = re.sub(r"\bDECIMAL\(\d+,\s*\d+\)", "REAL", statement, flags=re.IGNORECASE)
+    statement = re.sub(r"(\w+) ENUM\(([^)]*)\)", r"\1 TEXT CHECK (\1 IN (\2))", statement, flags=re.IGNORECASE)
+    statement = re.sub(r"\bINT AUTO_INCREMENT PRIMARY KEY\b", "INTEGER PRIMARY KEY AUTOINCREMENT",
+                       statement, flags=re.IGNORECASE)
+    statement = re.sub(r"\bUNIQUE KEY \w+ \(", "UNIQUE (", statement, flags=re.IGNORECASE)
+    return statement
+
+
+def _parse_procedure(body):
+    """Extract the random-insert loop of a populate procedure such as ``PopulateTShirts``."""
+    max_records = int(re.search(r"DECLARE max_records INT DEFAULT (\d+)", body).group(1))
+    choices = {
+        var: re.findall(r"'([^']*)'", values)
+        for var, values in re.findall(r"SET (\w+) = ELT\(FLOOR\(1 \+ RAND\(\) \* \d+\), ([^;]*)\);", body)
+    }
+    ranges = {
+        var: (int(low), int(span))
+        for var, low, span in re.findall(r"SET (\w+) = FLOOR\((\d+) \+ RAND\(\) \* (\d+)\);", body)
+    }
+    insert = re.search(r"INSERT INTO (\w+) \(([^)]*)\)\s*VALUES \(([^)]*)\);", body)
+    columns = [column.strip() for column in insert.group(2).split(",")]
+    variables = [variable.strip() for variable in insert.group(3).split(",")]
+    return {
+        "table": insert.group(1),
+        "columns": columns,
+        "variables": variables,
+        "choices": choices,
+        "ranges": ranges,
+        "max_records": max_records,
+    }
+
+
+def _run_procedure(connection, procedure, rng):
+    # In MySQL the CONTINUE HANDLER swallows duplicate (brand, color, size)
+    # errors and the counter still advances, so the procedure makes max_records
+    # attempts and keeps whichever combinations were distinct. Here draws are
+    # repeated until min(max_records, combinations) rows exist instead, so every
+    # combination is present (4 * 4 * 5 = 80 in the shipped dump) and questions
+    # about any of them have an answer.
+    combinations = 1
+    for values in procedure["choices"].values():
+        combinations *= len(values)
+    target = min(procedure["max_records"], combinations)
+    placeholders = ", ".join("?" for _ in procedure["columns"])
+    sql = f"INSERT OR IGNORE INTO {procedure['table']} ({', '.join(procedure['columns'])}) VALUES ({placeholders})"
+
+    inserted = 0
+    while inserted < target:
+        row = []
+        for variable in procedure["variables"]:
+            if variable in procedure["choices"]:
+                row.append(rng.choice(procedure["choices"][variable]))
+            else:
+                low, span = procedure["ranges"][variable]
+                row.append(rng.randrange(low, low + span))
+        inserted += connection.execute(sql, row).rowcount
+
+
+def import_mysql_dump(sqlite_path, dump_path=DEFAULT_DUMP, seed=0):
+    """Build a SQLite file from the MySQL dump, running its populate procedures with a seeded RNG."""
+    with open(dump_path) as f:
+        dump = f.read()
+
+    procedures = {}
+    for block in re.findall(r"DELIMITER \$\$(.*?)DELIMITER ;", dump, flags=re.S):
+        name = re.search(r"CREATE PROCEDURE (\w+)\s*\(", block).group(1)
+        procedures[name] = _parse_procedure(block)
+    dump = re.sub(r"DELIMITER \$\$.*?DELIMITER ;", "", dump, flags=re.S)
+    dump = re.sub(r"--[^\n]*", "", dump)
+
+    rng = random.Random(seed)
+    directory = os.path.dirname(os.path.abspath(sqlite_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(sqlite_path)}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        for statement in (s.strip() for s in dump.split(";")):
+            keyword = statement.split(None, 1)[0].upper() if statement else ""
+            if keyword in ("", "USE") or statement.upper().startswith("CREATE DATABASE"):
+                continue
+            if keyword == "CALL":
+                name = re.match(r"CALL (\w+)", statement, flags=re.IGNORECASE).group(1)
+                _run_procedure(connection, procedures[name], rng)
+            elif statement.upper().startswith("CREATE TABLE"):
+                connection.execute(_convert_create_table(statement))
+            else:
+                connection.execute(statement)
+        connection.commit()
+    except BaseException:
+        connection.close()
+        os.remove(tmp_path)
+        raise
+    connection.close()
+    os.replace(tmp_path, sqlite_path)
+    return sqlite_path
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on ``path`` shared across processes."""
+    with open(path, "a+") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _is_stale(sqlite_path, dump_path):
+    return not os.path.exists(sqlite_path) or os.path.getmtime(sqlite_path) < os.path.getmtime(dump_path)
+
+
+def ensure_embedded_database(sqlite_path=DEFAULT_DATABASE_PATH, dump_path=DEFAULT_DUMP, seed=0):
+    """Import the dump once; rebuild only when the dump is newer than the SQLite file.
+
+    Server workers start together, so the import runs under a file lock and
+    only the first of them does it.
+    """
+    if _is_stale(sqlite_path, dump_path):
+        directory = os.path.dirname(os.path.abspath(sqlite_path))
+        os.makedirs(directory, exist_ok=True)
+        with _file_lock(f"{sqlite_path}.lock"):
+            if _is_stale(sqlite_path, dump_path):  # imported by another worker while we waited
+                import_mysql_dump(sqlite_path, dump_path, seed)
+    return sqlite_path
+
+
+def sqlite_uri(sqlite_path):
+    return f"sqlite:///{os.path.abspath(sqlite_path)}"
@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_LOCAL_MODEL = "all-MiniLM-L6-v2"
+GOOGLE_MODEL = "models/gemini-embedding-001"
+
+
+class LocalEmbeddings(Embeddings):
+    """SentenceTransformer embeddings computed in-process, no network round trip.
+
+    The model is loaded (and run once) at construction so the first question
+    does not pay for it. ``embed_documents`` encodes in batches of
+    ``batch_size``; with ``batch_window`` > 0, concurrent ``embed_query``
+    calls that arrive within that many seconds share one encode call.
+    """
+
+    def __init__(self, model_name=DEFAULT_LOCAL_MODEL, device="cpu", batch_size=32, batch_window=0.0,
+                 normalize=True):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device=device)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.normalize = normalize
+        self._pending = []
+        self._lock = threading.Lock()
+        self.embed_query("warm up")
+
+    def _encode(self, texts):
+        vectors = self._model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts):
+        return self._encode(texts) if texts else []
+
+    def embed_query(self, text):
+        if self.batch_window <= 0:
+            return self._encode([text])[0]
+
+        future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            leader = len(self._pending) == 1
+        if leader:
+            # The first caller waits for company, then encodes everyone's text at once.
+            time.sleep(self.batch_window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            try:
+                for (_, waiting), vector in zip(batch, self._encode([text for text, _ in batch])):
+                    waiting.set_result(vector)
+            except Exception as e:
+                for _, waiting in batch:
+                    if not waiting.done():
+                        waiting.set_exception(e)
+        return future.result()
+
+
+def load_embeddings(backend=None, model_name=None):
+    """Embeddings for few-shot selection and the SQL cache.
+
+    ``backend`` is "google" (Gemini API) or "local" (SentenceTransformer on
+    CPU); both default to the ``EMBEDDINGS_BACKEND`` / ``EMBEDDINGS_MODEL``
+    environment variables.
+    """
+    backend = backend or os.getenv("EMBEDDINGS_BACKEND", "google")
+    model_name = model_name or os.getenv("EMBEDDINGS_MODEL")
+    if backend == "local":
+        return LocalEmbeddings(
+            model_name or DEFAULT_LOCAL_MODEL,
+            device=os.getenv("EMBEDDINGS_DEVICE", "cpu"),
+            batch_size=int(os.getenv("EMBEDDINGS_BATCH_SIZE", 32)),
+            batch_window=float(os.getenv("EMBEDDINGS_BATCH_WINDOW_MS", 0)) / 1000
+        )
+    if backend == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=model_name or GOOGLE_MODEL)
+    raise ValueError(f"Unknown embeddings backend: {backend}")
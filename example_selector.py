@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.example_selectors import BaseExampleSelector
+from langchain_experimental.sql.base import SQL_QUERY
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def example_text(example):
+    """Text embedded for a few-shot example (same as the Chroma store)."""
+    return " ".join(example.values())
+
+
+def question_text(input_variables):
+    """The user question from the chain's prompt inputs.
+
+    The chain passes ``input`` as "question\\nSQLQuery:" for SQL generation and
+    with the SQL and result appended for the answer call; both should pick
+    the examples for the question alone.
+    """
+    text = input_variables.get("input") or input_variables.get("query") or ""
+    return text.split(f"\n{SQL_QUERY}")[0].strip()
+
+
+class NumpyExampleSelector(BaseExampleSelector):
+    """Few-shot selector over an in-memory float32 matrix.
+
+    Example embeddings are L2-normalized once into a contiguous matrix, so a
+    lookup is one matrix-vector product and a top-k. With ``use_mmr`` the
+    ``fetch_k`` best matches are re-ranked by maximal marginal relevance.
+    Query embeddings are memoized in a bounded LRU keyed by question text.
+    """
+
+    def __init__(self, embeddings, examples, vectors=None, k=2, use_mmr=False, fetch_k=10, lambda_mult=0.5,
+                 cache_size=256):
+        self.embeddings = embeddings
+        self.examples = list(examples)
+        if vectors is None:
+            vectors = embeddings.embed_documents([example_text(example) for example in self.examples])
+        self.matrix = np.ascontiguousarray(_normalize_rows(np.asarray(vectors, dtype=np.float32)))
+        self.k = k
+        self.use_mmr = use_mmr
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+        self.cache_size = cache_size
+        self._query_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_example(self, example):
+        vector = np.asarray(self.embeddings.embed_documents([example_text(example)])[0], dtype=np.float32)
+        with self._lock:
+            self.examples.append(example)
+            self.matrix = np.ascontiguousarray(np.vstack([self.matrix, _normalize_rows(vector)[None, :]]))
+
+    def select_examples(self, input_variables):
+        query = self._embed_query(question_text(input_variables))
+        with self._lock:
+            matrix, examples = self.matrix, self.examples
+        if not examples:
+            return []
+        scores = matrix @ query
+        k = min(self.k, len(examples))
+        if self.use_mmr:
+            indices = self._mmr(matrix, scores, k)
+        else:
+            indices = np.argpartition(-scores, k - 1)[:k]
+            indices = indices[np.argsort(-scores[indices])]
+        return [dict(examples[i]) for i in indices]
+
+    def _mmr(self, matrix, scores, k):
+        fetch_k = min(max(self.fetch_k, k), len(scores))
+        candidates = list(np.argsort(-scores)[:fetch_k])
+        selected = [candidates.pop(0)]
+        while candidates and len(selected) < k:
+            redundancy = (matrix[candidates] @ matrix[selected].T).max(axis=1)
+            mmr = self.lambda_mult * scores[candidates] - (1 - self.lambda_mult) * redundancy
+            selected.append(candidates.pop(int(np.argmax(mmr))))
+        return selected
+
+    def _embed_query(self, text):
+        with self._lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+                return vector
+        vector = _normalize_rows(np.asarray(self.embeddings.embed_query(text), dtype=np.float32))
+        with self._lock:
+            self._query_cache[text] = vector
+            while len(self._query_cache) > self.cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
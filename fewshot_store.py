@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+from langchain_community.vectorstores import Chroma
+
+DEFAULT_PERSIST_DIRECTORY = ".few_shot_store"
+
+
+def example_id(example):
+    """Content hash of a few-shot example, used as its vector store id."""
+    return hashlib.sha256(json.dumps(example, sort_keys=True).encode()).hexdigest()
+
+
+def few_shot_collection(embeddings):
+    """Collection name for the embedding model, so vectors of different models never mix."""
+    model = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None) or type(embeddings).__name__
+    return "few_shots_" + hashlib.sha256(str(model).encode()).hexdigest()[:12]
+
+
+def load_few_shot_vectorstore(embeddings, examples, persist_directory=DEFAULT_PERSIST_DIRECTORY):
+    """Open the persisted few-shot store and sync it with ``examples``.
+
+    Only examples whose content hash is not stored yet are embedded, and
+    stored examples that no longer exist are deleted, so an unchanged
+    few-shot set loads without a single embedding call. The collection is
+    namespaced by embedding model so switching models never mixes vectors.
+    """
+    vectorstore = Chroma(
+        collection_name=few_shot_collection(embeddings),
+        embedding_function=embeddings,
+        persist_directory=persist_directory
+    )
+
+    wanted = {example_id(example): example for example in examples}
+    stored = set(vectorstore.get(include=[])["ids"])
+
+    stale_ids = [id_ for id_ in stored if id_ not in wanted]
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+
+    new_ids = [id_ for id_ in wanted if id_ not in stored]
+    if new_ids:
+        vectorstore.add_texts(
+            [" ".join(wanted[id_].values()) for id_ in new_ids],
+            metadatas=[wanted[id_] for id_ in new_ids],
+            ids=new_ids
+        )
+    return vectorstore
+
+
+def load_few_shot_vectors(embeddings, examples, persist_directory=DEFAULT_PERSIST_DIRECTORY):
+    """Return a float32 matrix with one embedding per example, in order.
+
+    Vectors are kept in ``<persist_directory>/<collection>.npz`` by example
+    content hash, so like the Chroma store only new or edited examples are
+    embedded, without running a vector database.
+    """
+    path = os.path.join(persist_directory, few_shot_collection(embeddings) + ".npz")
+    stored = {}
+    if os.path.exists(path):
+        with np.load(path) as data:
+            stored = dict(zip(data["ids"].tolist(), data["vectors"]))
+
+    ids = [example_id(example) for example in examples]
+    missing = [i for i, id_ in enumerate(ids) if id_ not in stored]
+    if missing:
+        vectors = embeddings.embed_documents([" ".join(examples[i].values()) for i in missing])
+        for i, vector in zip(missing, vectors):
+            stored[ids[i]] = np.asarray(vector, dtype=np.float32)
+
+    matrix = np.asarray([stored[id_] for id_ in ids], dtype=np.float32)
+    if missing or len(stored) != len(ids):
+        os.makedirs(persist_directory, exist_ok=True)
+        # A private temp file per writer, so concurrent workers never overwrite each other's half-written file.
+        fd, tmp_path = tempfile.mkstemp(dir=persist_directory, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, ids=np.asarray(ids), vectors=matrix)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return matrix
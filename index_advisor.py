@@ -0,0 +1,299 @@
+"""Recommend indexes from the SQL the pipeline actually ran.
+
+    SQL_WORKLOAD_LOG=sql_workload.jsonl streamlit run main.py   # collect
+    python index_advisor.py sql_workload.jsonl --evaluate          # advise
+
+Statements from the workload log (or a ``METRICS_JSON_LOG`` file) are
+grouped by their shape: per table, the columns filtered by equality, by a
+range and used in joins. Filters no existing index serves get an index on
+their equality columns (most selective first) followed by one range
+column, and unindexed join columns an index of their own; with
+``--covering`` the other columns the queries read are appended so the
+table rows are not touched at all.
+
+``--evaluate`` creates each candidate, compares the ``EXPLAIN`` row
+estimates of the grouped queries before and after, drops it again and
+keeps only candidates that lower the estimate; ``--apply`` creates the
+remaining ones. Both run DDL, so point them at a staging copy or the
+embedded SQLite database (``DB_BACKEND=sqlite``).
+"""
+import sys
+import json
+import argparse
+from sqlalchemy import inspect
+from sql_validator import _tokenize, _is_name
+from cost_guard import SQLCostGuard, table_aliases
+
+MAX_INDEX_NAME = 64
+
+CLAUSES = {"SELECT": "select", "FROM": "from", "JOIN": "from", "WHERE": "where", "ON": "on", "GROUP": "group",
+           "ORDER": "order", "HAVING": "having", "LIMIT": "limit"}
+
+
+def load_workload(path):
+    """``[{"sql", "parameters", "execution_seconds"}]`` from a workload or metrics JSON log."""
+    statements = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if not entry.get("sql") or entry.get("error"):
+                continue
+            seconds = entry.get("execution_seconds", (entry.get("timings") or {}).get("sql_execution"))
+            if seconds is None:
+                continue
+            statements.append({"sql": entry["sql"], "parameters": entry.get("parameters"),
+                               "execution_seconds": seconds})
+    return statements
+
+
+def column_usage(sql, columns):
+    """Per table, the columns ``sql`` filters by equality/range, joins on and reads.
+
+    Returns ``{table: {"eq", "range", "join", "used"}}`` of column-name sets.
+    Unqualified columns are attributed to the only table in the query that
+    has them; ambiguous ones are ignored.
+    """
+    tokens = _tokenize(sql)
+    aliases = table_aliases(sql, columns)
+    in_query = set(aliases.values())
+    lowered = {table: {column.lower(): column for column in names} for table, names in columns.items()}
+    usage = {table: {"eq": set(), "range": set(), "join": set(), "used": set()} for table in in_query}
+
+    def resolve(i):
+        if i < 0 or i >= len(tokens) or not _is_name(tokens[i]):
+            return None
+        if i + 1 < len(tokens) and tokens[i + 1] in (("symbol", "."), ("symbol", "(")):
+            return None
+        name = tokens[i][1].lower()
+        if i >= 2 and tokens[i - 1] == ("symbol", "."):
+            table = aliases.get(tokens[i - 2][1].lower())
+            return (table, lowered[table][name]) if table and name in lowered[table] else None
+        owners = [table for table in in_query if name in lowered[table]]
+        return (owners[0], lowered[owners[0]][name]) if len(owners) == 1 else None
+
+    def resolve_operand(i):
+        # "alias.column" starts with the qualifier
+        qualified = i + 2 < len(tokens) and tokens[i + 1] == ("symbol", ".")
+        return resolve(i + 2 if qualified else i)
+
+    clause, stack = None, []
+    for i, (kind, value) in enumerate(tokens):
+        upper = value.upper() if kind == "word" else value
+        if upper == "(":
+            stack.append(clause)
+        elif upper == ")":
+            clause = stack.pop() if stack else None
+        elif kind == "word" and upper in CLAUSES:
+            clause = CLAUSES[upper]
+
+        column = resolve(i)
+        if column is None:
+            continue
+        table, name = column
+        usage[table]["used"].add(name)
+        if clause not in ("where", "on"):
+            continue
+
+        start = i - 2 if i >= 2 and tokens[i - 1] == ("symbol", ".") else i
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ("", "")
+        after = tokens[i + 2] if i + 2 < len(tokens) else ("", "")
+        prev = tokens[start - 1] if start else ("", "")
+        operator = nxt[1].upper()
+        if operator == "=" or (prev == ("symbol", "=") and start >= 2 and tokens[start - 2][1] not in ("<", ">", "!")):
+            other = resolve_operand(i + 2) if operator == "=" else resolve(start - 2)
+            if other is not None and other[0] != table:
+                usage[table]["join"].add(name)
+            elif other is None:
+                usage[table]["eq"].add(name)
+        elif operator == "IN" or (operator == "IS" and after[1].upper() == "NULL"):
+            usage[table]["eq"].add(name)
+        elif operator in ("<", ">", "BETWEEN", "LIKE") and after[1] != ">":
+            usage[table]["range"].add(name)
+    return usage
+
+
+def query_shape(usage):
+    """Hashable shape of a query: which columns of which tables it filters and joins on."""
+    return tuple(sorted(
+        (table, kind, column)
+        for table, kinds in usage.items()
+        for kind in ("eq", "range", "join")
+        for column in kinds[kind]
+    ))
+
+
+class IndexAdvisor:
+    """Groups a SQL workload by shape and proposes the indexes it lacks."""
+
+    def __init__(self, db, covering=False, max_columns=5):
+        self.db = db
+        self.covering = covering
+        self.max_columns = max_columns
+        self.guard = SQLCostGuard(db, max_estimated_rows=None, max_joins=None, max_full_scan_rows=None,
+                                  default_limit=None, statement_timeout=None)
+        self._distinct = {}
+
+    def group(self, statements):
+        """``[{"shape", "usage", "count", "total_seconds", "sql", "parameters"}]``, slowest first."""
+        columns = self.db.column_names()
+        groups = {}
+        for statement in statements:
+            usage = column_usage(statement["sql"], columns)
+            shape = query_shape(usage)
+            if shape not in groups:
+                groups[shape] = {"shape": shape, "usage": usage, "count": 0, "total_seconds": 0.0,
+                                 "sql": statement["sql"], "parameters": statement["parameters"]}
+            groups[shape]["count"] += 1
+            groups[shape]["total_seconds"] += statement["execution_seconds"]
+        return sorted(groups.values(), key=lambda group: -group["total_seconds"])
+
+    def existing_indexes(self, table):
+        inspector = inspect(self.db._engine)
+        indexes = [index["column_names"] for index in inspector.get_indexes(table)]
+        indexes += [constraint["column_names"] for constraint in inspector.get_unique_constraints(table)]
+        primary_key = inspector.get_pk_constraint(table)["constrained_columns"]
+        return [list(index) for index in indexes + ([primary_key] if primary_key else []) if index]
+
+    def recommend(self, statements):
+        """Candidate indexes for the workload, most total execution time first."""
+        candidates = {}
+        existing = {}
+        for group in self.group(statements):
+            for table, usage in group["usage"].items():
+                for key in self._keys(table, usage):
+                    self._add_candidate(candidates, existing, group, table, usage, key)
+        return sorted(candidates.values(), key=lambda candidate: -candidate["total_seconds"])
+
+    def _add_candidate(self, candidates, existing, group, table, usage, key):
+        if table not in existing:
+            existing[table] = self.existing_indexes(table)
+        covering = [column for column in self.db.column_names()[table]
+                    if column in usage["used"] and column not in key] if self.covering else []
+        index_columns = key + covering if len(key) + len(covering) <= self.max_columns else key
+        if any(self._serves(index, key, index_columns) for index in existing[table]):
+            return
+        ddl = self.ddl(table, index_columns)
+        candidate = candidates.setdefault(ddl, {
+            "table": table, "columns": index_columns, "covering": index_columns != key, "ddl": ddl,
+            "queries": 0, "total_seconds": 0.0, "groups": []
+        })
+        candidate["queries"] += group["count"]
+        candidate["total_seconds"] += group["total_seconds"]
+        candidate["groups"].append(group)
+
+    def evaluate(self, candidate):
+        """Add ``rows_before``/``rows_after`` (``EXPLAIN`` estimates, weighted by query count).
+
+        The index only exists while its queries are explained.
+        """
+        candidate["rows_before"] = self._weighted_rows(candidate["groups"])
+        self._execute(candidate["ddl"])
+        try:
+            candidate["rows_after"] = self._weighted_rows(candidate["groups"])
+        finally:
+            self._execute(f"DROP INDEX {self._name(candidate)}"
+                          + (f" ON {candidate['table']}" if self.db.dialect != "sqlite" else ""))
+        return candidate
+
+    def apply(self, candidate):
+        self._execute(candidate["ddl"])
+
+    def ddl(self, table, columns):
+        return f"CREATE INDEX {self._index_name(table, columns)} ON {table} ({', '.join(columns)})"
+
+    def _keys(self, table, usage):
+        """Index keys for the table's filters and, separately, its join columns."""
+        # Equality columns can share the index prefix in any order, so the most
+        # selective go first; a range column can only come after them.
+        selectivity = lambda column: -self._distinct_count(table, column)
+        equality = sorted(usage["eq"], key=selectivity)
+        ranges = sorted(usage["range"] - usage["eq"], key=selectivity)
+        if equality or ranges:
+            yield equality + ranges[:1]
+        if usage["join"]:
+            yield sorted(usage["join"], key=selectivity)
+
+    @staticmethod
+    def _serves(index, key, index_columns):
+        if set(index[:len(key)]) != set(key):
+            return False
+        return set(index_columns) <= set(index)
+
+    def _distinct_count(self, table, column):
+        if (table, column) not in self._distinct:
+            self._distinct[(table, column)] = self.db.run(
+                f"SELECT COUNT(DISTINCT {column}) FROM {table}", fetch="cursor"
+            ).fetchone()[0]
+        return self._distinct[(table, column)]
+
+    def _weighted_rows(self, groups):
+        return sum(group["count"] * self.guard.estimate(group["sql"], group["parameters"])["estimated_rows"]
+                   for group in groups)
+
+    def _execute(self, statement):
+        with self.db._engine.begin() as connection:
+            connection.exec_driver_sql(statement)
+
+    @staticmethod
+    def _index_name(table, columns):
+        return f"idx_{table}_{'_'.join(columns)}"[:MAX_INDEX_NAME]
+
+    def _name(self, candidate):
+        return self._index_name(candidate["table"], candidate["columns"])
+
+
+def format_report(candidates):
+    if not candidates:
+        return "No index recommendations: existing indexes serve every query shape in the workload."
+    lines = []
+    for candidate in candidates:
+        lines.append(f"{candidate['ddl']};")
+        lines.append(f"    -- {candidate['queries']} quer{'y' if candidate['queries'] == 1 else 'ies'}, "
+                     f"{candidate['total_seconds']:.3f}s total execution"
+                     + (", covering" if candidate["covering"] else ""))
+        if "rows_after" in candidate:
+            lines.append(f"    -- estimated rows examined: {candidate['rows_before']} -> {candidate['rows_after']}")
+        for group in candidate["groups"][:3]:
+            lines.append(f"    -- e.g. {group['sql']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recommend indexes from an SQL workload log")
+    parser.add_argument("workload", help="SQL_WORKLOAD_LOG or METRICS_JSON_LOG file")
+    parser.add_argument("--db-backend", choices=["mysql", "sqlite"], help="defaults to DB_BACKEND")
+    parser.add_argument("--covering", action="store_true", help="also append the columns the queries read")
+    parser.add_argument("--max-columns", type=int, default=5)
+    parser.add_argument("--evaluate", action="store_true",
+                        help="create each index temporarily and compare EXPLAIN estimates (runs DDL)")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes")
+    parser.add_argument("--json", action="store_true", help="print the recommendations as JSON")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from langchain_helper import load_database
+    load_dotenv()
+    advisor = IndexAdvisor(load_database(args.db_backend), covering=args.covering, max_columns=args.max_columns)
+    candidates = advisor.recommend(load_workload(args.workload))
+    if args.evaluate:
+        # The planner may prefer a join order that examines more rows; keep only
+        # the indexes whose estimate improves.
+        candidates = [candidate for candidate in candidates
+                      if advisor.evaluate(candidate)["rows_after"] < candidate["rows_before"]]
+    if args.apply:
+        for candidate in candidates:
+            advisor.apply(candidate)
+
+    if args.json:
+        for candidate in candidates:
+            candidate["groups"] = [{"sql": group["sql"], "count": group["count"]} for group in candidate["groups"]]
+        print(json.dumps(candidates, indent=2))
+    else:
+        print(format_report(candidates))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,162 @@
+import re
+import threading
+from sql_cache import normalize_question
+
+STOCK = "stock"
+INVENTORY_VALUE = "inventory_value"
+DISCOUNTED_REVENUE = "discounted_revenue"
+
+FILTER_COLUMNS = ["brand", "color", "size"]
+
+BRAND_ALIASES = {
+    "Van Huesen": ["van heusen", "vanhuesen", "vanheusen"],
+    "Levi": ["levis"],
+}
+
+SIZE_ALIASES = {
+    "XS": ["extra small", "x small"],
+    "S": ["small"],
+    "M": ["medium"],
+    "L": ["large"],
+    "XL": ["extra large", "x large"],
+}
+
+# Every word of a question must be a filter value or come from this list,
+# otherwise the question is handed to the LLM chain.
+VOCABULARY = set("""
+a after all altogether amount an and any applied are at available be before brand can color colour combined
+count current currently discount discounted discounts do does earn entire everything expect expected find for
+from generate generated get give had have how i if in income inventory is it items its left make many me money
+much my no number of on our overall pieces please post quantity remaining revenue sale sales sell selling shirt
+shirts shop show size sized stock store t tee tees tell that the there this to today total tshirt tshirts units
+us value we were what when whole will with without worth would you
+""".split())
+
+STOCK_WORDS = {"many", "stock", "left", "remaining", "units", "count", "number", "quantity", "pieces", "items"}
+# Money wording; on its own it is too vague to pick a formula, so it goes to the LLM.
+VALUE_WORDS = {"revenue", "sales", "sale", "amount", "value", "worth", "income", "money", "earn"}
+# Only these explicit shapes are answered: the value of the inventory, or the
+# revenue if everything were sold.
+INVENTORY_VALUE_PHRASE = re.compile(
+    r"\b(total|inventory|stock) (value|worth)\b|\b(value|worth) of (the |our |my |all )*(inventory|stock)\b"
+)
+SELL_ALL = re.compile(
+    r"\b(if|when) (we|i) (have to |had to |were to |would )?sell\b|\bsell(ing)? (all|everything|the whole|the entire)\b"
+)
+NO_DISCOUNT = re.compile(r"\b(without|no|before) discounts?\b")
+WITH_DISCOUNT = re.compile(r"\b(after|with|post|discounted|applied)\b.*\bdiscounts?\b|\bdiscounts? applied\b|\bdiscounted\b")
+
+
+class IntentMatch:
+    def __init__(self, intent, filters, sql, parameters):
+        self.intent = intent
+        self.filters = filters
+        self.sql = sql
+        self.parameters = parameters
+
+    def __repr__(self):
+        return f"IntentMatch({self.intent!r}, {self.filters!r})"
+
+
+class InventoryIntentMatcher:
+    """Rule-based matcher for the stock and revenue question shapes in ``few_shots``.
+
+    Brand, color and size values are read from the live ``t_shirts`` ENUM
+    definitions and reloaded when the schema version changes. ``match``
+    returns None unless every word of the question is understood, exactly one
+    intent applies and each filter column has at most one value, so anything
+    unusual still goes through the LLM chain.
+    """
+
+    def __init__(self, db, table="t_shirts"):
+        self.db = db
+        self.table = table
+        self._aliases = None
+        self._schema_version = None
+        self._lock = threading.Lock()
+
+    def match(self, question):
+        aliases = self.aliases()
+        text = f" {normalize_question(question)} "
+
+        filters = {}
+        for alias, column, value in aliases:
+            pattern = f" {alias} "
+            if pattern not in text:
+                continue
+            if filters.get(column, value) != value:
+                return None
+            filters[column] = value
+            text = text.replace(pattern, " ")
+
+        words = set(text.split())
+        if not words <= VOCABULARY:
+            return None
+
+        intent = self._classify(text, words)
+        if intent is None:
+            return None
+        sql, parameters = self._build_sql(intent, filters)
+        return IntentMatch(intent, filters, sql, parameters)
+
+    def _classify(self, text, words):
+        inventory_value = bool(INVENTORY_VALUE_PHRASE.search(text))
+        revenue_if_sold = bool(words & VALUE_WORDS) and bool(SELL_ALL.search(text))
+        if inventory_value or revenue_if_sold:
+            if NO_DISCOUNT.search(text):
+                return INVENTORY_VALUE
+            if WITH_DISCOUNT.search(text):
+                return DISCOUNTED_REVENUE
+            if "discount" in text or not inventory_value:
+                return None
+            return INVENTORY_VALUE
+        if words & VALUE_WORDS:
+            return None
+        wants_stock = "how many" in text or bool(words & (STOCK_WORDS - {"many"}))
+        if wants_stock and "discount" not in text:
+            return STOCK
+        return None
+
+    def _build_sql(self, intent, filters):
+        parameters = {column: filters[column] for column in FILTER_COLUMNS if column in filters}
+        where = " AND ".join(f"{column} = :{column}" for column in parameters)
+        where = f" WHERE {where}" if where else ""
+        if intent == STOCK:
+            sql = f"SELECT SUM(stock_quantity) FROM {self.table}{where}"
+        elif intent == INVENTORY_VALUE:
+            sql = f"SELECT SUM(price * stock_quantity) FROM {self.table}{where}"
+        else:
+            sql = (
+                "SELECT SUM(a.total_amount * ((100 - COALESCE(discounts.pct_discount, 0)) / 100.0)) "
+                f"FROM (SELECT SUM(price * stock_quantity) AS total_amount, t_shirt_id FROM {self.table}{where} "
+                "GROUP BY t_shirt_id) a LEFT JOIN discounts ON a.t_shirt_id = discounts.t_shirt_id"
+            )
+        return sql, parameters
+
+    def aliases(self):
+        """``(alias, column, value)`` for every filter value, longest alias first."""
+        version = self.db.schema_version()
+        with self._lock:
+            if self._aliases is None or version != self._schema_version:
+                self._aliases = self._build_aliases(self.db.enum_values(self.table))
+                self._schema_version = version
+            return self._aliases
+
+    @staticmethod
+    def _build_aliases(enums):
+        aliases = []
+        for column in FILTER_COLUMNS:
+            for value in enums.get(column, []):
+                names = {normalize_question(value), normalize_question(value).replace(" ", "")}
+                if column == "brand":
+                    names.update(BRAND_ALIASES.get(value, []))
+                if column == "size":
+                    names.update(SIZE_ALIASES.get(value, []))
+                    if len(value) == 1:
+                        # A bare "s"/"m"/"l" only counts as a size next to the word "size".
+                        names = {f"{value.lower()} size", f"size {value.lower()}"} | (names - {value.lower()})
+                for name in names:
+                    aliases.append((name, column, value))
+        # Longest aliases first so "extra small" wins over "small".
+        aliases.sort(key=lambda alias: len(alias[0]), reverse=True)
+        return aliases
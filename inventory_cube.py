@@ -0,0 +1,111 @@
+import threading
+import numpy as np
+from intent_matcher import STOCK, INVENTORY_VALUE, DISCOUNTED_REVENUE
+
+DIMENSIONS = ["brand", "color", "size"]
+MEASURES = {STOCK: 0, INVENTORY_VALUE: 1, DISCOUNTED_REVENUE: 2}
+
+
+class InventoryCube:
+    """In-memory (measure, brand, color, size) array of stock, gross and post-discount value.
+
+    The cube is loaded once from ``t_shirts`` joined with ``discounts`` and
+    answers the intent matcher's aggregate intents by slicing and summing the
+    array instead of running SQL. When the database reports a new data
+    version only the rows whose contribution changed are re-applied; a new
+    schema version rebuilds the dimensions from scratch.
+    """
+
+    def __init__(self, db, table="t_shirts", discounts_table="discounts"):
+        self.db = db
+        self.table = table
+        self.discounts_table = discounts_table
+        self._values = None
+        self._positions = None
+        self._contributions = {}
+        self._schema_version = None
+        self._data_version = None
+        self._lock = threading.Lock()
+
+    def answer(self, intent, filters):
+        self._ensure_fresh()
+        with self._lock:
+            index = [MEASURES[intent]]
+            for dimension in DIMENSIONS:
+                if dimension not in filters:
+                    index.append(slice(None))
+                elif filters[dimension] in self._positions[dimension]:
+                    index.append(self._positions[dimension][filters[dimension]])
+                else:
+                    return 0.0
+            return float(self._values[tuple(index)].sum())
+
+    def refresh(self, full=False):
+        """Reload the rows and apply the changed contributions (everything when ``full``)."""
+        rows = self._load_rows()
+        with self._lock:
+            if full or self._values is None or not self._fits(rows):
+                self._build(rows)
+                return
+            for t_shirt_id in set(self._contributions) | set(rows):
+                old = self._contributions.get(t_shirt_id)
+                new = rows.get(t_shirt_id)
+                if old == new:
+                    continue
+                if old is not None:
+                    self._apply(old, -1)
+                if new is not None:
+                    self._apply(new, 1)
+            self._contributions = rows
+
+    def _ensure_fresh(self):
+        schema_version = self.db.schema_version()
+        data_version = self.db.data_version()
+        if self._values is None or schema_version != self._schema_version:
+            self.refresh(full=True)
+        elif data_version != self._data_version:
+            self.refresh()
+        self._schema_version, self._data_version = schema_version, data_version
+
+    def _load_rows(self):
+        """Return ``{t_shirt_id: (brand, color, size, stock, gross, net)}``."""
+        result = self.db.run(
+            f"SELECT t.t_shirt_id, t.brand, t.color, t.size, t.price, t.stock_quantity, d.pct_discount "
+            f"FROM {self.table} t LEFT JOIN {self.discounts_table} d ON t.t_shirt_id = d.t_shirt_id",
+            fetch="cursor"
+        ).fetchall()
+        rows = {}
+        for t_shirt_id, brand, color, size, price, stock, pct_discount in result:
+            amount = float(price or 0) * float(stock)
+            net = amount * (100 - float(pct_discount or 0)) / 100
+            if t_shirt_id in rows:
+                # Several discount rows multiply the joined revenue, as the SQL join does.
+                previous = rows[t_shirt_id]
+                rows[t_shirt_id] = previous[:5] + (previous[5] + net,)
+            else:
+                rows[t_shirt_id] = (brand, color, size, float(stock), amount, net)
+        return rows
+
+    def _build(self, rows):
+        enums = self.db.enum_values(self.table)
+        self._positions = {}
+        for i, dimension in enumerate(DIMENSIONS):
+            values = list(enums.get(dimension, []))
+            values += sorted({row[i] for row in rows.values()} - set(values))
+            self._positions[dimension] = {value: position for position, value in enumerate(values)}
+        shape = (len(MEASURES),) + tuple(len(self._positions[dimension]) for dimension in DIMENSIONS)
+        self._values = np.zeros(shape, dtype=np.float64)
+        for row in rows.values():
+            self._apply(row, 1)
+        self._contributions = rows
+
+    def _fits(self, rows):
+        return all(
+            row[i] in self._positions[dimension]
+            for row in rows.values()
+            for i, dimension in enumerate(DIMENSIONS)
+        )
+
+    def _apply(self, row, sign):
+        cell = tuple(self._positions[dimension][row[i]] for i, dimension in enumerate(DIMENSIONS))
+        self._values[(slice(None),) + cell] += sign * np.asarray(row[3:], dtype=np.float64)
@@ -1,61 +1,340 @@
 import os
 import re
+import time
 import asyncio
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from dotenv import load_dotenv
 from few_shots import few_shots
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.prompts import SemanticSimilarityExampleSelector, FewShotPromptTemplate, PromptTemplate
+from langchain.prompts import SemanticSimilarityExampleSelector, MaxMarginalRelevanceExampleSelector, FewShotPromptTemplate, PromptTemplate
 from langchain.chains.sql_database.prompt import PROMPT_SUFFIX
-from langchain_community.utilities import SQLDatabase
-from langchain_experimental.sql import SQLDatabaseChain
-from langchain_google_genai import ChatGoogleGenerativeAI
+from sql_cache import SQLQueryCache
+from fewshot_store import load_few_shot_vectorstore, load_few_shot_vectors, few_shot_collection, example_id, \
+    DEFAULT_PERSIST_DIRECTORY
+from example_selector import NumpyExampleSelector
+from prompt_builder import BudgetedFewShotPromptTemplate, DEFAULT_TOKEN_BUDGET
+from sql_database import TShirtSQLDatabase
+from embedded_db import ensure_embedded_database, sqlite_uri, DEFAULT_DATABASE_PATH
+from common.retry import call_with_backoff, acall_with_backoff
+from intent_matcher import InventoryIntentMatcher, STOCK
+from inventory_cube import InventoryCube
+from sql_chain import TShirtSQLChain, clean_sql_query
+from sql_validator import LocalSQLValidator
+from cost_guard import SQLCostGuard
+from embedding_backends import load_embeddings
+from startup_snapshot import load_snapshot, save_snapshot
+from metrics import QueryMetrics, TimedExampleSelector, metrics_sinks_from_env, span, add_timings, set_source, set_sql, \
+    run_config
+
+INVENTORY_TABLES = ['t_shirts', 'discounts']
+
+# Name used in the prompt and the function that returns today's date, per SQLAlchemy dialect.
+DIALECT_PROMPT_HINTS = {
+    'mysql': ('MySQL', 'CURDATE()'),
+    'sqlite': ('SQLite', "date('now')"),
+}
+
+
+def format_numeric_answer(value):
+    try:
+        if isinstance(value, (Decimal, float, int)):
+            return float("{:.2f}".format(float(value)))
+        elif isinstance(value, str):
+            cleaned = re.sub(r'[^\d.-]', '', value)
+            if cleaned:
+                return float("{:.2f}".format(float(cleaned)))
+        return value
+    except:
+        return value
+
+
+def clean_question(question):
+    return re.sub(r'```sql\s*|\s*```', '', question).strip()
+
+
+def extract_sql_query(result):
+    """Return the SQL statement the chain actually executed, if any."""
+    if isinstance(result, dict):
+        for step in reversed(result.get('intermediate_steps', [])):
+            if isinstance(step, dict) and step.get('sql_cmd'):
+                return clean_sql_query(step['sql_cmd'])
+    return None
+
+
+def load_database(backend=None, snapshot=None):
+    """Open the inventory database configured by ``DB_BACKEND`` and the ``DB_*`` variables.
+
+    ``snapshot`` is saved schema info (``TShirtSQLDatabase.snapshot()``) to start from.
+    """
+    if (backend or os.getenv('DB_BACKEND', 'mysql')) == 'sqlite':
+        # Imported from the MySQL dump on first use, then opened in-process.
+        path = ensure_embedded_database(os.getenv('EMBEDDED_DB_PATH', DEFAULT_DATABASE_PATH))
+        return TShirtSQLDatabase.from_uri(
+            sqlite_uri(path),
+            sample_rows_in_table_info=3,
+            include_tables=INVENTORY_TABLES,
+            snapshot=snapshot
+        )
+    statement_timeout = os.getenv('DB_STATEMENT_TIMEOUT')
+    return TShirtSQLDatabase.from_uri(
+        f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}",
+        replica_uri=os.getenv('DB_REPLICA_URI'),  # generated SELECTs go here when set
+        pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        statement_timeout=float(statement_timeout) if statement_timeout else None,
+        sample_rows_in_table_info=3,
+        include_tables=INVENTORY_TABLES,  # Explicitly include relevant tables
+        snapshot=snapshot
+    )
+
+
+class lazy_component:
+    """Helper attribute built by the decorated method on first access.
+
+    Every component has its own lock, so a slow one (a local embedding
+    model) does not hold up the others; assigning the attribute skips the
+    factory.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__.get(self.name, _UNSET)
+        if value is _UNSET:
+            with obj._component_locks.setdefault(self.name, threading.Lock()):
+                value = obj.__dict__.get(self.name, _UNSET)
+                if value is _UNSET:
+                    value = obj.__dict__[self.name] = self.factory(obj)
+        return value
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
+
+_UNSET = object()
+
 
 class TShirtQueryHelper:
-    def __init__(self):
+    """Answers inventory questions; components are built on first use.
+
+    Construction only reads configuration. The database, embeddings, LLM,
+    chain, caches and fast path are created lazily, or ahead of time by
+    ``warm_up()`` (``background=True`` runs it in a daemon thread and
+    ``ready`` is set once questions can be served). With a startup snapshot
+    (``STARTUP_SNAPSHOT``, see ``startup_snapshot.py``) the database and
+    the few-shot vectors start without any network call.
+    """
+
+    def __init__(self, use_sql_cache=True, use_fast_path=True, use_inventory_cube=True, query_checker="local",
+                 answer_mode="llm", llm=None, embeddings=None, embedding_backend=None, example_selector="numpy",
+                 example_mmr=False, prompt_token_budget=None, db=None, db_backend=None, metrics_sinks=None,
+                 cost_guard=True, use_explain=True, snapshot_path=None):
         load_dotenv()
-        self.embeddings = self._init_embeddings()
-        self.vectorstore = self._init_vectorstore()
-        self.db = self._init_database()
-        self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-        self.chain = self._create_chain()
-    
-    def _init_embeddings(self):
+        self._component_locks = {}
+        self.ready = threading.Event()
+        self.query_checker = query_checker
+        # "llm" lets the chain write the final answer; "sql" stops after executing
+        # the SQL and answers with the first cell, skipping that LLM call.
+        self.answer_mode = answer_mode
+        # "google" (default) or "local" for an in-process SentenceTransformer model.
+        self.embedding_backend = embedding_backend
+        # "numpy" keeps the few-shot embeddings in an in-memory matrix; "chroma" uses the
+        # persisted Chroma collection, for example libraries too large for that.
+        self.example_selector = example_selector
+        self.example_mmr = example_mmr
+        # "mysql" (default) or "sqlite" for a local copy of dataset/atliq_tshirts.sql.
+        self.db_backend = db_backend
+        # Prompts are trimmed to this many tokens; 0 sends the untrimmed few-shot prompt.
+        self.prompt_token_budget = int(os.getenv('PROMPT_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET)) \
+            if prompt_token_budget is None else prompt_token_budget
+        self.use_sql_cache = use_sql_cache
+        self.use_fast_path = use_fast_path
+        self.use_inventory_cube = use_inventory_cube
+        self.use_cost_guard = cost_guard
+        # False skips the EXPLAIN plan check; the LIMIT, join count and statement timeout still apply.
+        self.use_explain = use_explain
+        self.snapshot = load_snapshot(os.getenv('STARTUP_SNAPSHOT') if snapshot_path is None else snapshot_path)
+        for name, value in (("llm", llm), ("embeddings", embeddings), ("db", db)):
+            if value is not None:
+                setattr(self, name, value)
+        # Per-question stage timings, token counts and cache hits; off unless a sink is configured.
+        sinks = metrics_sinks_from_env() if metrics_sinks is None else metrics_sinks
+        self.metrics = QueryMetrics(sinks) if sinks else None
+
+    @lazy_component
+    def embeddings(self):
+        return self._init_embeddings(self.embedding_backend)
+
+    @lazy_component
+    def vectorstore(self):
+        return self._init_vectorstore() if self.example_selector == "chroma" else None
+
+    @lazy_component
+    def db(self):
+        return self._init_database(self.db_backend)
+
+    @lazy_component
+    def llm(self):
+        from langchain_google_genai import ChatGoogleGenerativeAI
         try:
-            return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+            return ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+        except RuntimeError as e:
+            # The client wants an event loop, which warm-up threads don't have.
+            if "no current event loop" not in str(e):
+                raise
+            asyncio.set_event_loop(asyncio.new_event_loop())
+            return ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+
+    @lazy_component
+    def cost_guard(self):
+        # Generated SQL is costed with EXPLAIN, limited and given a timeout before it runs.
+        return self._init_cost_guard() if self.use_cost_guard else None
+
+    @lazy_component
+    def chain(self):
+        return self._create_chain()
+
+    @lazy_component
+    def sql_cache(self):
+        if not self.use_sql_cache:
+            return None
+        return SQLQueryCache(
+            self.embeddings,
+            schema_probe=self.db.schema_version,
+            schema_check_interval=0,  # the database already throttles its version probe
+            filter_aliases=InventoryIntentMatcher(self.db).aliases
+        )
+
+    @lazy_component
+    def intent_matcher(self):
+        return InventoryIntentMatcher(self.db) if self.use_fast_path else None
+
+    @lazy_component
+    def inventory_cube(self):
+        # Fast-path intents are answered from the in-memory cube instead of SQL.
+        return InventoryCube(self.db) if self.use_fast_path and self.use_inventory_cube else None
+
+    def warm_up(self, background=False):
+        """Build every component now; with ``background`` in a daemon thread, which is returned."""
+        if background:
+            thread = threading.Thread(target=self.warm_up, daemon=True)
+            thread.start()
+            return thread
+        for name in ("db", "embeddings", "llm", "chain", "sql_cache", "intent_matcher", "inventory_cube"):
+            getattr(self, name)
+        self.ready.set()
+        if self.inventory_cube is not None:
+            try:
+                self.inventory_cube.answer(STOCK, {})  # loads the cube's rows
+            except Exception:
+                pass  # loaded (and reported) by the first fast-path question instead
+        return None
+
+    def save_startup_snapshot(self, path):
+        """Warm up and save the schema info and few-shot vectors to ``path`` (see ``startup_snapshot.py``)."""
+        self.warm_up()
+        vectors = self._few_shot_vectors() if self.vectorstore is None else None
+        save_snapshot(path, self.db.snapshot(), few_shots=None if vectors is None else {
+            "collection": few_shot_collection(self.embeddings),
+            "ids": [example_id(example) for example in few_shots],
+            "vectors": vectors
+        })
+
+    def _init_embeddings(self, backend=None):
+        try:
+            return load_embeddings(backend)
         except RuntimeError as e:
             if "no current event loop" in str(e):
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
-                return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+                return load_embeddings(backend)
             raise
     
     def _init_vectorstore(self):
-        return Chroma.from_texts(
-            [" ".join(example.values()) for example in few_shots],
+        return load_few_shot_vectorstore(
             self.embeddings,
-            metadatas=few_shots
+            few_shots,
+            persist_directory=os.getenv('FEW_SHOT_STORE_DIR', DEFAULT_PERSIST_DIRECTORY)
+        )
+
+    def _init_example_selector(self):
+        if self.vectorstore is not None:
+            if self.example_mmr:
+                return MaxMarginalRelevanceExampleSelector(vectorstore=self.vectorstore, k=2)
+            return SemanticSimilarityExampleSelector(vectorstore=self.vectorstore, k=2)
+        return NumpyExampleSelector(self.embeddings, few_shots, self._few_shot_vectors(), k=2,
+                                    use_mmr=self.example_mmr)
+
+    def _few_shot_vectors(self):
+        saved = (self.snapshot or {}).get("few_shots")
+        if saved is not None and saved["collection"] == few_shot_collection(self.embeddings) \
+                and saved["ids"] == [example_id(example) for example in few_shots]:
+            return saved["vectors"]
+        return load_few_shot_vectors(
+            self.embeddings,
+            few_shots,
+            persist_directory=os.getenv('FEW_SHOT_STORE_DIR', DEFAULT_PERSIST_DIRECTORY)
         )
     
-    def _init_database(self):
-        return SQLDatabase.from_uri(
-            f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}",
-            sample_rows_in_table_info=3,
-            include_tables=['t_shirts', 'discounts']  # Explicitly include relevant tables
+    def _init_cost_guard(self):
+        def limit(name, default):
+            value = os.getenv(name, default)
+            return int(value) if value else None
+
+        timeout = os.getenv('SQL_STATEMENT_TIMEOUT', '10')
+        return SQLCostGuard(
+            self.db,
+            max_estimated_rows=limit('SQL_MAX_ESTIMATED_ROWS', '1000000'),
+            max_joins=limit('SQL_MAX_JOINS', '3'),
+            max_full_scan_rows=limit('SQL_MAX_FULL_SCAN_ROWS', '100000'),
+            default_limit=limit('SQL_DEFAULT_LIMIT', '1000'),
+            statement_timeout=float(timeout) if timeout else None,
+            use_explain=self.use_explain
         )
+
+    def _init_database(self, backend=None):
+        return load_database(backend, snapshot=(self.snapshot or {}).get("schema"))
+
+    def refresh_schema(self):
+        """Rebuild the cached table info and drop SQL cached for the old schema."""
+        self.db.refresh_table_info()
+        if self.sql_cache is not None:
+            self.sql_cache.check_schema(force=True)
+
+    def _run_rows(self, sql, parameters=None):
+        # Cached and fast-path SQL skip the chain, so the guard's statement timeout is applied here.
+        execution_options = self.cost_guard.execution_options if self.cost_guard is not None else None
+        try:
+            cursor = self.db.run(sql, fetch="cursor", parameters=parameters, execution_options=execution_options)
+            return list(cursor.keys()), [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            error = self.cost_guard.timeout_error(sql, e) if self.cost_guard is not None else None
+            if error is None:
+                raise
+            raise error from e
+
+    def _answer_from_sql(self, sql, parameters=None):
+        _, rows = self._run_rows(sql, parameters)
+        if rows and len(rows[0]) > 0:
+            return format_numeric_answer(rows[0][0])
+        return None
     
     def _create_chain(self):
-        example_selector = SemanticSimilarityExampleSelector(
-            vectorstore=self.vectorstore,
-            k=2,
-        )
+        example_selector = TimedExampleSelector(self._init_example_selector())
 
-        mysql_prompt = """You are a MySQL expert. Given an input question, first create a syntactically correct MySQL query to run, then look at the results of the query and return the answer to the input question.
-    Unless the user specifies in the question a specific number of examples to obtain, query for at most {top_k} results using the LIMIT clause as per MySQL. You can order the results to return the most informative data in the database.
+        sql_prompt = """You are a {dialect_name} expert. Given an input question, first create a syntactically correct {dialect_name} query to run, then look at the results of the query and return the answer to the input question.
+    Unless the user specifies in the question a specific number of examples to obtain, query for at most {top_k} results using the LIMIT clause as per {dialect_name}. You can order the results to return the most informative data in the database.
     Never query for all columns from a table. You must query only the columns that are needed to answer the question. Wrap each column name in backticks (`) to denote them as delimited identifiers.
     Pay attention to use only the column names you can see in the tables below. Be careful to not query for columns that do not exist. Also, pay attention to which column is in which table.
-    Pay attention to use CURDATE() function to get the current date, if the question involves "today".
+    Pay attention to use {current_date} function to get the current date, if the question involves "today".
     
     Use the following format:
     
@@ -67,79 +346,284 @@ class TShirtQueryHelper:
     No pre-amble.
     """
 
+        dialect_name, current_date = DIALECT_PROMPT_HINTS.get(self.db.dialect, DIALECT_PROMPT_HINTS['mysql'])
+        dialect_hints = {"dialect_name": dialect_name, "current_date": current_date}
+
         example_prompt = PromptTemplate(
             input_variables=["Question", "SQLQuery", "SQLResult", "Answer"],
             template="\nQuestion: {Question}\nSQLQuery: {SQLQuery}\nSQLResult: {SQLResult}\nAnswer: {Answer}"
         )
 
-        few_shot_prompt = FewShotPromptTemplate(
-            example_selector=example_selector,
-            example_prompt=example_prompt,
-            prefix=mysql_prompt,
-            suffix=PROMPT_SUFFIX,
-            input_variables=["query", "table_info", "top_k"]
-        )
+        if self.prompt_token_budget:
+            few_shot_prompt = BudgetedFewShotPromptTemplate(
+                example_selector=example_selector,
+                example_prompt=example_prompt,
+                prefix=sql_prompt,
+                suffix=PROMPT_SUFFIX,
+                database=self.db,
+                max_tokens=self.prompt_token_budget,
+                input_variables=["input", "table_info", "top_k"],
+                partial_variables=dialect_hints
+            )
+        else:
+            few_shot_prompt = FewShotPromptTemplate(
+                example_selector=example_selector,
+                example_prompt=example_prompt,
+                prefix=sql_prompt,
+                suffix=PROMPT_SUFFIX,
+                input_variables=["query", "table_info", "top_k"],
+                partial_variables=dialect_hints
+            )
 
-        return SQLDatabaseChain.from_llm(
+        # "local" validates SQL in-process and only falls back to the LLM checker
+        # when that fails; "llm" always asks the LLM to review the SQL.
+        sql_validator = LocalSQLValidator(self.db) if self.query_checker == "local" else None
+
+        return TShirtSQLChain.from_llm(
             self.llm, 
             self.db, 
             prompt=few_shot_prompt,
             verbose=True,
             use_query_checker=True,
+            sql_validator=sql_validator,
+            cost_guard=self.cost_guard,
             return_intermediate_steps=True
         )
 
 
+    def _trace(self, question):
+        return self.metrics.trace(question) if self.metrics is not None else nullcontext()
+
     def query_tshirt_inventory(self, question, top_k=1):
         try:
-            cleaned_question = re.sub(r'```sql\s*|\s*```', '', question).strip()
-            
-            result = self.chain.invoke({
-                "query": cleaned_question,
-                "table_info": self.db.get_table_info(),
-                "top_k": top_k
-            })
-            
-            def clean_sql_query(sql):
-                """Remove markdown code blocks and clean the SQL query"""
-                sql = re.sub(r'^```sql\s*|```\s*$', '', sql, flags=re.IGNORECASE)
-                sql = sql.strip()
-                sql = ' '.join(sql.split())
-                return sql
-
-            def format_numeric_answer(value):
+            return self._answer(question, top_k)
+        except Exception as e:
+            return f"Error processing query: {str(e)}"
+
+    def query_tshirt_inventory_batch(self, questions, top_k=1, max_concurrency=4, max_retries=3):
+        """Answer many questions concurrently.
+
+        Returns one ``{"question", "answer", "error"}`` dict per question, in
+        input order. At most ``max_concurrency`` questions are in flight and a
+        question that hits a rate limit is retried with exponential backoff.
+        """
+        def run(question):
+            try:
+                answer = call_with_backoff(self._answer, question, top_k, max_retries=max_retries)
+                return {"question": question, "answer": answer, "error": None}
+            except Exception as e:
+                return {"question": question, "answer": None, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            return list(executor.map(run, questions))
+
+    async def aquery_tshirt_inventory_batch(self, questions, top_k=1, max_concurrency=4, max_retries=3):
+        """Async variant of ``query_tshirt_inventory_batch`` built on ``chain.ainvoke``."""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(question):
+            async with semaphore:
                 try:
-                    if isinstance(value, (Decimal, float, int)):
-                        return float("{:.2f}".format(float(value)))
-                    elif isinstance(value, str):
-                        cleaned = re.sub(r'[^\d.-]', '', value)
-                        if cleaned:
-                            return float("{:.2f}".format(float(cleaned)))
-                    return value
-                except:
-                    return value
-
-            if isinstance(result, dict) and 'intermediate_steps' in result:
-                for step in result['intermediate_steps']:
-                    if 'sql_query' in step and step['sql_query']:
-                        step['sql_query'] = clean_sql_query(step['sql_query'])
-                    
-                    if 'sql_result' in step and step['sql_result']:
-                        sql_result = step['sql_result']
-                        if sql_result and len(sql_result) > 0 and len(sql_result[0]) > 0:
-                            return format_numeric_answer(sql_result[0][0])
-            
-            if isinstance(result, dict) and 'result' in result:
-                answer_part = result['result'].split('Answer:')[-1].strip()
-                return format_numeric_answer(answer_part)
-            
-            if isinstance(result, (Decimal, float, int)):
-                return format_numeric_answer(result)
-            
-            if isinstance(result, str):
-                return format_numeric_answer(result)
-            
+                    answer = await acall_with_backoff(self._aanswer, question, top_k, max_retries=max_retries)
+                    return {"question": question, "answer": answer, "error": None}
+                except Exception as e:
+                    return {"question": question, "answer": None, "error": str(e)}
+
+        return await asyncio.gather(*(run(question) for question in questions))
+
+    def query_tshirt_inventory_rows(self, question, top_k=1, with_answer=False):
+        """Answer with the typed result rows instead of a single formatted value.
+
+        Returns ``{"question", "sql", "columns", "rows", "answer", "source",
+        "timings"}`` where ``source`` is "cube", "fast_path", "cache" or "llm" and
+        ``timings`` holds seconds per stage. The natural-language answer is
+        only generated (one more LLM call) when ``with_answer`` is True.
+        """
+        cleaned_question = clean_question(question)
+        with self._trace(cleaned_question):
+            result = self._answer_rows(cleaned_question, top_k, with_answer)
+            set_source(result["source"])
+            add_timings(result["timings"])
             return result
-            
-        except Exception as e:
-            return f"Error processing query: {str(e)}"
\ No newline at end of file
+
+    def _answer_rows(self, cleaned_question, top_k, with_answer):
+        started = time.perf_counter()
+        match = self._match_intent(cleaned_question)
+        if match is not None and self.inventory_cube is not None:
+            value = self.inventory_cube.answer(match.intent, match.filters)
+            timings = {"cube": time.perf_counter() - started}
+            return {"question": cleaned_question, "sql": match.sql, "columns": [match.intent],
+                    "rows": [(value,)], "answer": None, "source": "cube", "timings": timings}
+        sql, parameters, source, embedding = self._resolve_sql(cleaned_question, top_k, match)
+        timings = {"sql_lookup": time.perf_counter() - started}
+
+        if sql is not None:
+            set_sql(sql, parameters)
+            started = time.perf_counter()
+            columns, rows = self._run_rows(sql, parameters)
+            timings["sql_execution"] = time.perf_counter() - started
+            return {"question": cleaned_question, "sql": sql, "columns": columns, "rows": rows,
+                    "answer": None, "source": source, "timings": timings}
+
+        result = self.chain.invoke({
+            "query": cleaned_question,
+            "top_k": top_k,
+            "return_rows": True,
+            "with_answer": with_answer
+        }, config=run_config())
+        set_sql(result["sql"])
+        if self.sql_cache is not None:
+            self.sql_cache.store(cleaned_question, result["sql"], embedding, top_k)
+        timings.update(result["timings"])
+        return {"question": cleaned_question, "sql": result["sql"], "columns": result["columns"],
+                "rows": result["rows"], "answer": result["result"] if with_answer else None,
+                "source": "llm", "timings": timings}
+
+    def query_tshirt_inventory_table(self, question, max_rows=10000, batch_size=1000, with_answer=False):
+        """Answer list-style questions with a typed columnar result.
+
+        The SQL runs on a server-side cursor and is streamed ``batch_size``
+        rows at a time into a ``ColumnarResult`` (one NumPy array per column,
+        ``to_arrow()`` for Arrow) capped at ``max_rows``; ``table.truncated``
+        tells whether the cap was hit. Returns ``{"question", "sql", "table",
+        "answer", "source", "timings"}``. The SQL cache is not used here: its
+        entries were generated for a small ``top_k`` and may carry a LIMIT.
+        """
+        cleaned_question = clean_question(question)
+        with self._trace(cleaned_question):
+            started = time.perf_counter()
+            match = self._match_intent(cleaned_question)
+            timings = {"sql_lookup": time.perf_counter() - started}
+            if match is not None:
+                sql, parameters, source = match.sql, match.parameters, "fast_path"
+                set_sql(sql, parameters)
+                started = time.perf_counter()
+                table = self.db.fetch_columnar(sql, max_rows=max_rows, batch_size=batch_size, parameters=parameters)
+                timings["sql_execution"] = time.perf_counter() - started
+                result = {"question": cleaned_question, "sql": sql, "table": table, "answer": None,
+                          "source": source, "timings": timings}
+            else:
+                chain_result = self.chain.invoke({
+                    "query": cleaned_question,
+                    "top_k": max_rows,
+                    "columnar": True,
+                    "max_rows": max_rows,
+                    "with_answer": with_answer
+                }, config=run_config())
+                set_sql(chain_result["sql"])
+                timings.update(chain_result["timings"])
+                result = {"question": cleaned_question, "sql": chain_result["sql"], "table": chain_result["table"],
+                          "answer": chain_result["result"] if with_answer else None, "source": "llm",
+                          "timings": timings}
+            set_source(result["source"])
+            add_timings(timings)
+            return result
+
+    def _answer(self, question, top_k):
+        cleaned_question = clean_question(question)
+        with self._trace(cleaned_question):
+            answer, embedding = self._cached_answer(cleaned_question, top_k)
+            if answer is not None:
+                return answer
+
+            set_source("llm")
+            result = self.chain.invoke({
+                "query": cleaned_question,
+                "top_k": top_k,
+                "return_rows": self.answer_mode == "sql"
+            }, config=run_config())
+            set_sql(result.get("sql"))
+            add_timings(result.get("timings", {}))
+            return self._finish(cleaned_question, top_k, result, embedding)
+
+    async def _aanswer(self, question, top_k):
+        cleaned_question = clean_question(question)
+        with self._trace(cleaned_question):
+            answer, embedding = await asyncio.to_thread(self._cached_answer, cleaned_question, top_k)
+            if answer is not None:
+                return answer
+
+            set_source("llm")
+            result = await self.chain.ainvoke({
+                "query": cleaned_question,
+                "top_k": top_k,
+                "return_rows": self.answer_mode == "sql"
+            }, config=run_config())
+            set_sql(result.get("sql"))
+            add_timings(result.get("timings", {}))
+            return await asyncio.to_thread(self._finish, cleaned_question, top_k, result, embedding)
+
+    def _cached_answer(self, cleaned_question, top_k):
+        """Return ``(answer, embedding)``; ``answer`` is None when the LLM chain is needed."""
+        with span("intent_match"):
+            match = self._match_intent(cleaned_question)
+        if match is not None and self.inventory_cube is not None:
+            set_source("cube")
+            with span("cube"):
+                return format_numeric_answer(self.inventory_cube.answer(match.intent, match.filters)), None
+        with span("sql_lookup"):
+            sql, parameters, source, embedding = self._resolve_sql(cleaned_question, top_k, match)
+        if sql is None:
+            return None, embedding
+        set_source(source)
+        set_sql(sql, parameters)
+        with span("sql_execution"):
+            answer = self._answer_from_sql(sql, parameters)
+        if source == "fast_path":
+            return format_numeric_answer(answer or 0), None
+        return answer, embedding
+
+    def _match_intent(self, cleaned_question):
+        if self.intent_matcher is None:
+            return None
+        return self.intent_matcher.match(cleaned_question)
+
+    def _resolve_sql(self, cleaned_question, top_k, match=None):
+        """Find SQL for the question without the LLM.
+
+        Returns ``(sql, parameters, source, embedding)``. A matched intent uses
+        its parameterized SQL, then the SQL cache is consulted for SQL generated
+        with the same ``top_k``; ``sql`` is None when the chain has to generate it.
+        """
+        if match is not None:
+            return match.sql, match.parameters, "fast_path", None
+        if self.sql_cache is None:
+            return None, None, None, None
+        cached_sql, embedding = self.sql_cache.lookup(cleaned_question, top_k)
+        if cached_sql:
+            return cached_sql, None, "cache", embedding
+        return None, None, None, embedding
+
+    def _finish(self, cleaned_question, top_k, result, embedding=None):
+        if self.sql_cache is not None:
+            executed_sql = extract_sql_query(result)
+            if executed_sql:
+                self.sql_cache.store(cleaned_question, executed_sql, embedding, top_k)
+
+        if isinstance(result, dict) and 'rows' in result:
+            rows = result['rows']
+            if rows and len(rows[0]) > 0:
+                return format_numeric_answer(rows[0][0])
+            return "No results found"
+
+        if isinstance(result, dict) and 'intermediate_steps' in result:
+            for step in result['intermediate_steps']:
+                if 'sql_query' in step and step['sql_query']:
+                    step['sql_query'] = clean_sql_query(step['sql_query'])
+                
+                if 'sql_result' in step and step['sql_result']:
+                    sql_result = step['sql_result']
+                    if sql_result and len(sql_result) > 0 and len(sql_result[0]) > 0:
+                        return format_numeric_answer(sql_result[0][0])
+        
+        if isinstance(result, dict) and 'result' in result:
+            answer_part = result['result'].split('Answer:')[-1].strip()
+            return format_numeric_answer(answer_part)
+        
+        if isinstance(result, (Decimal, float, int)):
+            return format_numeric_answer(result)
+        
+        if isinstance(result, str):
+            return format_numeric_answer(result)
+        
+        return result
@@ -1,6 +1,12 @@
+import os
+import json
+import urllib.request
+import urllib.error
 import streamlit as st
 from langchain_helper import TShirtQueryHelper
-import asyncio
+
+# When set, questions go to the HTTP service (server.py) instead of a local helper.
+API_URL = os.getenv("TEEQUERY_API_URL")
 
 # Custom CSS for better UI
 st.markdown("""
@@ -27,19 +33,36 @@ st.markdown("""
 
 @st.cache_resource
 def get_query_helper():
+    # Construction is cheap; components warm in the background while the page renders.
+    helper = TShirtQueryHelper()
+    helper.warm_up(background=True)
+    return helper
+
+def ask(question):
+    if not API_URL:
+        return get_query_helper().query_tshirt_inventory(question)
+    request = urllib.request.Request(
+        f"{API_URL.rstrip('/')}/query",
+        data=json.dumps({"question": question}).encode(),
+        headers={"Content-Type": "application/json"}
+    )
     try:
-        return TShirtQueryHelper()
-    except RuntimeError as e:
-        if "no current event loop" in str(e):
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            return TShirtQueryHelper()
-        raise
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)["answer"]
+    except urllib.error.HTTPError as e:
+        try:
+            detail = json.load(e).get("detail", str(e))
+        except (ValueError, AttributeError):  # proxies and gateways answer with HTML or plain text
+            detail = str(e)
+        return detail if str(detail).startswith("Error") else f"Error processing query: {detail}"
+    except urllib.error.URLError as e:
+        return f"Error processing query: {e.reason}"
 
 st.title("🎽 T-Shirt Inventory Analytics")
 st.subheader("Ask natural language questions about your inventory")
 
-query_helper = get_query_helper()
+if not API_URL:
+    get_query_helper()
 
 # Sample questions for quick access
 sample_questions = [
@@ -61,7 +84,7 @@ if custom_question:
 
 if st.button("Get Answer", type="primary"):
     with st.spinner("Analyzing your inventory..."):
-        answer = query_helper.query_tshirt_inventory(question)
+        answer = ask(question)
         
         if "Error" in str(answer):
             st.error(answer)
@@ -0,0 +1,385 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.example_selectors import BaseExampleSelector
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = ContextVar("query_trace", default=None)
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Counts LLM calls and the input/output tokens the model reports."""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+        if not usage:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    input_tokens += metadata.get("input_tokens", 0)
+                    output_tokens += metadata.get("output_tokens", 0)
+        with self._lock:
+            self.llm_calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+
+class QueryTrace:
+    """Timings, token usage and outcome of a single question."""
+
+    def __init__(self, question):
+        self.question = question
+        self.source = None
+        self.sql = None
+        self.parameters = None
+        self.error = None
+        self.timings = {}
+        self.usage = TokenUsageHandler()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_timing(self, stage, seconds):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def to_record(self):
+        return {
+            "timestamp": time.time(),
+            "question": self.question,
+            "source": self.source,
+            "cache_hit": self.source == "cache",
+            "sql": self.sql,
+            "parameters": self.parameters,
+            "error": self.error,
+            "total_seconds": time.perf_counter() - self.started,
+            "timings": dict(self.timings),
+            "llm_calls": self.usage.llm_calls,
+            "input_tokens": self.usage.input_tokens,
+            "output_tokens": self.usage.output_tokens,
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add_timing(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Time a block as stage ``name`` of the current query; a no-op outside a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name)
+
+
+def add_timings(timings):
+    trace = _current_trace.get()
+    if trace is not None:
+        for stage, seconds in timings.items():
+            trace.add_timing(stage, seconds)
+
+
+def set_source(source):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.source = source
+
+
+def set_sql(sql, parameters=None):
+    """Record the statement the current query executed (for the SQL workload log)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.sql = sql
+        trace.parameters = parameters
+
+
+def run_config():
+    """``config`` for chain calls so the current trace sees LLM token usage."""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    return {"callbacks": [trace.usage]}
+
+
+class _TraceContext:
+    def __init__(self, metrics, question):
+        self.metrics = metrics
+        self.trace = QueryTrace(question)
+
+    def __enter__(self):
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_trace.reset(self.token)
+        if exc is not None:
+            self.trace.error = str(exc)
+        self.metrics.emit(self.trace.to_record())
+        return False
+
+
+class QueryMetrics:
+    """Fans one record per question out to the configured sinks.
+
+    A sink is any object with ``record(record)``; a failing sink never
+    breaks the query it is measuring.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def trace(self, question):
+        return _TraceContext(self, question)
+
+    def emit(self, record):
+        for sink in self.sinks:
+            try:
+                sink.record(record)
+            except Exception:
+                pass
+
+
+class JSONLogSink:
+    """Writes each record as one JSON line."""
+
+    def __init__(self, stream=None, path=None):
+        self.stream = stream if stream is not None else (open(path, "a") if path else sys.stderr)
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class SQLWorkloadLog(JSONLogSink):
+    """Writes one JSON line per executed SQL statement with its execution time.
+
+    Questions answered without running SQL (the inventory cube) are skipped.
+    The file is the input of ``index_advisor.py``.
+    """
+
+    def record(self, record):
+        if not record.get("sql") or "sql_execution" not in record["timings"]:
+            return
+        super().record({
+            "timestamp": record["timestamp"],
+            "source": record["source"],
+            "sql": record["sql"],
+            "parameters": record.get("parameters"),
+            "execution_seconds": record["timings"]["sql_execution"],
+            "error": record["error"],
+        })
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class HistogramRegistry:
+    """In-process latency histograms per stage plus query, cache and token counters."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        timings = dict(record["timings"], total=record["total_seconds"])
+        with self._lock:
+            for stage, seconds in timings.items():
+                if stage not in self.stages:
+                    self.stages[stage] = Histogram(self.buckets)
+                self.stages[stage].observe(seconds)
+            self._increment(("queries_total", "source", record["source"] or "none"))
+            if record["error"]:
+                self._increment(("query_errors_total", None, None))
+            self._increment(("llm_calls_total", None, None), record["llm_calls"])
+            self._increment(("llm_tokens_total", "direction", "input"), record["input_tokens"])
+            self._increment(("llm_tokens_total", "direction", "output"), record["output_tokens"])
+
+    def _increment(self, key, amount=1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """``{stage: {"count", "sum", "p50", "p95", "p99"}}`` in seconds."""
+        with self._lock:
+            return {
+                stage: {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+                for stage, histogram in self.stages.items()
+            }
+
+    def render_prometheus(self, prefix="teequery"):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per query pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            declared = set()
+            for (name, label, value), amount in sorted(self.counters.items(), key=lambda item: str(item[0])):
+                if name not in declared:
+                    lines.append(f"# TYPE {prefix}_{name} counter")
+                    declared.add(name)
+                labels = f'{{{label}="{value}"}}' if label else ""
+                lines.append(f"{prefix}_{name}{labels} {amount}")
+        return "\n".join(lines) + "\n"
+
+
+def serve_prometheus(registry, host="0.0.0.0", port=9108):
+    """Serve ``registry`` at ``/metrics`` from a daemon thread; returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_registry = None
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def process_registry():
+    """The HistogramRegistry shared by every helper in this process."""
+    global _registry
+    with _exporter_lock:
+        if _registry is None:
+            _registry = HistogramRegistry()
+        return _registry
+
+
+def start_exporter(port, host="0.0.0.0"):
+    """Serve ``process_registry()`` on ``port``; only the first call per process binds it."""
+    global _exporter
+    registry = process_registry()
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = serve_prometheus(registry, host=host, port=port)
+        return _exporter
+
+
+def metrics_sinks_from_env(export=True):
+    """Sinks from ``METRICS_JSON_LOG`` (a path, or "-" for stderr), ``SQL_WORKLOAD_LOG`` and ``METRICS_PORT``.
+
+    ``METRICS_PORT`` adds the process-wide registry and, with ``export``,
+    starts the exporter on that port once per process.
+    """
+    sinks = []
+    json_log = os.getenv("METRICS_JSON_LOG")
+    if json_log:
+        sinks.append(JSONLogSink(path=None if json_log == "-" else json_log))
+    workload_log = os.getenv("SQL_WORKLOAD_LOG")
+    if workload_log:
+        sinks.append(SQLWorkloadLog(path=None if workload_log == "-" else workload_log))
+    port = os.getenv("METRICS_PORT")
+    if port:
+        if export:
+            start_exporter(int(port))
+        sinks.append(process_registry())
+    return sinks
+
+
+class TimedExampleSelector(BaseExampleSelector):
+    """Wraps an example selector so its lookup shows up as the ``example_selection`` stage."""
+
+    def __init__(self, selector):
+        self.selector = selector
+
+    def add_example(self, example):
+        return self.selector.add_example(example)
+
+    def select_examples(self, input_variables):
+        with span("example_selection"):
+            return self.selector.select_examples(input_variables)
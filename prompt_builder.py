@@ -0,0 +1,135 @@
+import re
+from typing import Any
+from pydantic import ConfigDict
+from langchain_core.prompts import PromptTemplate, StringPromptTemplate
+from langchain_core.utils import formatter
+from langchain_core.runnables.config import run_in_executor
+from example_selector import question_text
+from common.token_counter import TokenCounter
+
+DEFAULT_TOKEN_BUDGET = 1200
+
+COMPACT_EXAMPLE_PROMPT = PromptTemplate(
+    input_variables=["Question", "SQLQuery"],
+    template="\nQuestion: {Question}\nSQLQuery: {SQLQuery}"
+)
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def relevant_columns(question, examples, schema, enums):
+    """Pick ``{table: [columns]}`` for the question.
+
+    A table is relevant when the question names it, one of its column names
+    or one of its ENUM values; if none is, the tables used by the selected
+    examples' SQL are taken, then the whole schema. Within a table, keys
+    (``*_id``), columns the question mentions and columns the examples' SQL
+    uses are kept; when only keys match, the table keeps all its columns.
+    Single-letter ENUM values ("S", "M") are too ambiguous to count.
+    """
+    words = set(_words(question)) - {"t", "id"}
+    spaced = f" {' '.join(_words(question))} "
+    squashed = re.sub(r"[^a-z0-9]", "", question.lower())
+    example_words = set(re.findall(r"[a-z0-9_]+", " ".join(e.get("SQLQuery", "") for e in examples).lower()))
+
+    mentioned = {}
+    for table, columns in schema.items():
+        table_enums = enums.get(table, {})
+        matched = [
+            column for column in columns
+            if set(column.lower().split("_")) & words
+            or any(len(value) > 1 and f" {' '.join(_words(value))} " in spaced
+                   for value in table_enums.get(column, []))
+        ]
+        named = table.lower().rstrip("s") in words or table.lower() in words \
+            or re.sub(r"[^a-z0-9]", "", table.lower()) in squashed
+        if matched or named:
+            mentioned[table] = matched
+
+    if not mentioned:
+        mentioned = {table: [] for table in schema if table.lower() in example_words}
+    if not mentioned:
+        return {table: list(columns) for table, columns in schema.items()}
+
+    selected = {}
+    for table, matched in mentioned.items():
+        columns = schema[table]
+        keys = {column for column in columns if column.lower().endswith("_id")}
+        keep = set(matched) | {column for column in columns if column.lower() in example_words}
+        if keep <= keys:
+            keep = set(columns)
+        selected[table] = [column for column in columns if column in keep or column in keys]
+    return selected
+
+
+class BudgetedFewShotPromptTemplate(StringPromptTemplate):
+    """Few-shot SQL prompt that fits a token budget.
+
+    ``table_info`` is rebuilt for the tables and columns relevant to the
+    question (see ``relevant_columns``). While the prompt exceeds
+    ``max_tokens`` it is trimmed in this order: sample rows are dropped,
+    examples are shrunk to question and SQL, then examples are dropped from
+    the least similar one. The instructions and the question are never cut.
+    """
+
+    prefix: str
+    suffix: str
+    example_prompt: PromptTemplate
+    example_selector: Any
+    database: Any
+    max_tokens: int = DEFAULT_TOKEN_BUDGET
+    sample_rows: int = 3
+    compact_example_prompt: PromptTemplate = COMPACT_EXAMPLE_PROMPT
+    token_counter: Any = None
+    example_separator: str = "\n\n"
+
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra="forbid")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.token_counter is None:
+            self.token_counter = TokenCounter()
+
+    @property
+    def _prompt_type(self):
+        return "budgeted_few_shot"
+
+    def format(self, **kwargs):
+        kwargs = self._merge_partial_and_user_variables(**kwargs)
+        question = question_text(kwargs)
+        examples = self.example_selector.select_examples(kwargs)
+        columns = relevant_columns(question, examples, self.database.column_names(), self._enums())
+
+        prompt = None
+        for sample_rows, compact, count in self._trim_steps(len(examples)):
+            table_info = self.database.get_compact_table_info(columns, sample_rows=sample_rows)
+            example_prompt = self.compact_example_prompt if compact else self.example_prompt
+            rendered = [
+                example_prompt.format(**{key: " ".join(str(example[key]).split()) if compact else example[key]
+                                         for key in example_prompt.input_variables})
+                for example in examples[:count]
+            ]
+            prompt = self.example_separator.join([
+                formatter.format(self.prefix, **kwargs),
+                *rendered,
+                formatter.format(self.suffix, **dict(kwargs, table_info=table_info))
+            ])
+            if self.token_counter.count(prompt) <= self.max_tokens:
+                break
+        return prompt
+
+    async def aformat(self, **kwargs):
+        # Example selection embeds the question; keep that off the event loop.
+        return await run_in_executor(None, self.format, **kwargs)
+
+    def _trim_steps(self, example_count):
+        if self.sample_rows:
+            yield self.sample_rows, False, example_count
+        yield 0, False, example_count
+        for count in range(example_count, -1, -1):
+            yield 0, True, count
+
+    def _enums(self):
+        return {table: self.database.enum_values(table) for table in self.database.column_names()}
@@ -0,0 +1,116 @@
+import math
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf", "ivfpq")
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")
+# Exact search is fast enough below this many chunks.
+FLAT_MAX_CHUNKS = int(os.getenv("INDEX_FLAT_MAX_CHUNKS", 20000))
+INDEX_MEMORY_MB = float(os.getenv("INDEX_MEMORY_MB", 1024))
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", 16))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", 64))
+HNSW_M = 32
+# k-means wants about 39 training points per list; PQ codebooks need 256 per subquantizer.
+MIN_POINTS_PER_LIST = 39
+PQ_MIN_CHUNKS = 256 * MIN_POINTS_PER_LIST
+MAX_TRAINING_POINTS = 100000
+
+
+def choose_index_type(count: int, dim: int, memory_budget_mb: float = INDEX_MEMORY_MB,
+                      requested: str = "auto") -> str:
+    """Index type for ``count`` vectors of ``dim`` floats.
+
+    ``auto`` keeps exact flat search for small corpora, then HNSW while its
+    vectors and graph fit ``memory_budget_mb``, IVF while the raw vectors
+    fit, and IVF-PQ (compressed vectors) beyond that. Types that cannot be
+    trained on so few vectors fall back to the next simpler one.
+    """
+    if requested not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{requested}', expected one of {', '.join(INDEX_TYPES)}")
+    kind = requested
+    if kind == "auto":
+        budget = memory_budget_mb * 2 ** 20
+        if count <= FLAT_MAX_CHUNKS and count * dim * 4 <= budget:
+            kind = "flat"
+        elif count * (dim * 4 + HNSW_M * 2 * 4) <= budget:
+            kind = "hnsw"
+        elif count * dim * 4 <= budget:
+            kind = "ivf"
+        else:
+            kind = "ivfpq"
+    if kind == "ivfpq" and count < PQ_MIN_CHUNKS:
+        kind = "ivf"
+    if kind == "ivf" and count < 2 * MIN_POINTS_PER_LIST:
+        kind = "flat"
+    return kind
+
+
+def ivf_lists(count: int) -> int:
+    return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_LIST))
+
+
+def pq_subquantizers(dim: int, count: int, memory_budget_mb: float = INDEX_MEMORY_MB) -> int:
+    """Bytes per vector for IVF-PQ: the largest divisor of ``dim`` within the budget.
+
+    At most 64, and at least 4 dimensions per subquantizer; finer splits
+    train much slower for little recall.
+    """
+    per_vector = memory_budget_mb * 2 ** 20 / max(count, 1) - 8  # the inverted lists also keep an 8-byte id
+    sizes = [m for m in range(1, min(dim // 4, 64) + 1) if dim % m == 0] or [1]
+    fitting = [m for m in sizes if m <= per_vector]
+    return fitting[-1] if fitting else sizes[0]
+
+
+def index_kind(index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def new_index(kind: str, dim: int, count: int, memory_budget_mb: float = INDEX_MEMORY_MB,
+              training: Optional[np.ndarray] = None):
+    """Empty index of ``kind`` for about ``count`` vectors, trained on ``training`` if it needs it."""
+    if kind == "flat":
+        return faiss.IndexFlatL2(dim)
+    if kind == "hnsw":
+        return faiss.IndexHNSWFlat(dim, HNSW_M)
+    quantizer = faiss.IndexFlatL2(dim)
+    if kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, ivf_lists(count))
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, ivf_lists(count), pq_subquantizers(dim, count, memory_budget_mb), 8)
+    index.train(training)
+    return index
+
+
+def needs_rebuild(index, kind: str, count: int) -> bool:
+    """True when the index is of another type or its IVF lists no longer suit ``count`` vectors."""
+    if index_kind(index) != kind:
+        return True
+    return kind in ("ivf", "ivfpq") and not index.nlist / 2 <= ivf_lists(count) <= index.nlist * 2
+
+
+def tune(index, nprobe: int = INDEX_NPROBE, ef_search: int = INDEX_EF_SEARCH):
+    """Set the search-time recall/speed knobs: IVF lists probed and HNSW candidate list size."""
+    kind = index_kind(index)
+    if kind in ("ivf", "ivfpq"):
+        index.nprobe = min(nprobe, index.nlist)
+    elif kind == "hnsw":
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def mmap_flags(kind: str) -> int:
+    """``faiss.read_index`` flags that leave the vectors on disk; HNSW graphs are always read into memory."""
+    if kind == "flat":
+        return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+    if kind in ("ivf", "ivfpq"):
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    return 0
@@ -0,0 +1,157 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from common.token_counter import TokenCounter
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+# Candidates retrieved before packing.
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", 20))
+# Share of a chunk's word 3-grams already packed above which it is a near-duplicate.
+DUPLICATE_THRESHOLD = 0.8
+# Shortest text overlap that joins chunks without a start_index.
+MIN_TEXT_OVERLAP = 20
+MAX_TEXT_OVERLAP = 200
+# Chunks this close are adjacent: the splitter drops the separator ("\n\n" at most) between them.
+MAX_GAP = 2
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def containment(part: set, whole: set) -> float:
+    return len(part & whole) / len(part) if part else 1.0
+
+
+def text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that starts ``right``, if long enough to be a chunk overlap."""
+    for size in range(min(len(left), len(right), MAX_TEXT_OVERLAP), MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class Segment:
+    """A run of text from one source, made of one or more retrieved chunks."""
+
+    def __init__(self, doc, score: float):
+        self.key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        self.start = doc.metadata.get("start_index")
+        self.text = doc.page_content
+        self.score = score
+        self.docs = [doc]
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+    def merged_text(self, doc) -> Optional[str]:
+        """Text of this segment joined with ``doc`` when they overlap or touch, else None."""
+        if (doc.metadata.get("source"), doc.metadata.get("page")) != self.key:
+            return None
+        text, start = doc.page_content, doc.metadata.get("start_index")
+        if self.start is not None and start is not None:
+            end = start + len(text)
+            if start > self.end + MAX_GAP or end < self.start - MAX_GAP:
+                return None
+            if start < self.start:  # doc comes first
+                return text + "\n" * (self.start - end) + self.text[max(0, end - self.start):]
+            return self.text + "\n" * (start - self.end) + text[max(0, self.end - start):]
+        overlap = text_overlap(self.text, text)
+        if overlap:
+            return self.text + text[overlap:]
+        overlap = text_overlap(text, self.text)
+        if overlap:
+            return text + self.text[overlap:]
+        return None
+
+    def merge(self, doc, text: str):
+        start = doc.metadata.get("start_index")
+        if self.start is not None and start is not None:
+            self.start = min(self.start, start)
+        self.text = text
+        self.docs.append(doc)
+
+
+class ContextPacker:
+    """Packs retrieved chunks into a context of at most ``token_budget`` tokens.
+
+    Chunks are taken best score first. A chunk that overlaps or touches a
+    packed chunk of the same source (and page) is merged into it, so the
+    splitter's overlap is sent once; a chunk whose word 3-grams are mostly
+    in the packed text already is skipped; anything else is added while it fits.
+    Merged chunks use ``start_index`` when the splitter recorded it and
+    the overlapping text otherwise.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, duplicate_threshold: float = DUPLICATE_THRESHOLD,
+                 counter: Optional[TokenCounter] = None):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.counter = counter or TokenCounter()
+
+    def pack(self, scored_docs: List[Tuple]) -> Tuple[str, List, Dict[str, int]]:
+        """``(context, docs used, stats)`` for ``(doc, score)`` pairs; higher scores are better."""
+        segments: List[Segment] = []
+        tokens: Dict[int, int] = {}
+        packed = set()
+        stats = {"candidates": len(scored_docs), "merged": 0, "duplicates": 0, "over_budget": 0}
+        used = 0
+        for doc, score in sorted(scored_docs, key=lambda pair: pair[1], reverse=True):
+            for segment in segments:
+                text = segment.merged_text(doc)
+                if text is None:
+                    continue
+                if len(text) == len(segment.text):  # already contained
+                    stats["duplicates"] += 1
+                    break
+                cost = self.counter.count(text) - tokens[id(segment)]
+                if used + cost > self.token_budget:
+                    stats["over_budget"] += 1
+                else:
+                    segment.merge(doc, text)
+                    packed |= shingles(doc.page_content)
+                    tokens[id(segment)] += cost
+                    used += cost
+                    used -= self._join_neighbours(segment, segments, tokens)
+                break
+            else:
+                fingerprint = shingles(doc.page_content)
+                if containment(fingerprint, packed) >= self.duplicate_threshold:
+                    stats["duplicates"] += 1
+                    continue
+                cost = self.counter.count(doc.page_content)
+                if used + cost > self.token_budget:
+                    stats["over_budget"] += 1
+                    continue
+                segment = Segment(doc, score)
+                segments.append(segment)
+                tokens[id(segment)] = cost
+                packed |= fingerprint
+                used += cost
+
+        stats["tokens"] = used
+        stats["chunks"] = sum(len(segment.docs) for segment in segments)
+        stats["merged"] = stats["chunks"] - len(segments)
+        context = "\n\n".join(segment.text for segment in segments)
+        return context, [doc for segment in segments for doc in segment.docs], stats
+
+    def _join_neighbours(self, segment: Segment, segments: List[Segment], tokens: Dict[int, int]) -> int:
+        """Merge segments that ``segment`` now overlaps into it; returns the tokens saved."""
+        saved = 0
+        for other in list(segments):
+            if other is segment:
+                continue
+            bridge = Document(page_content=other.text, metadata=dict(other.docs[0].metadata, start_index=other.start))
+            text = segment.merged_text(bridge)
+            if text is None:
+                continue
+            segment.merge(bridge, text)
+            segment.docs[-1:] = other.docs
+            cost = self.counter.count(text)
+            saved += tokens[id(segment)] + tokens.pop(id(other)) - cost
+            tokens[id(segment)] = cost
+            segments.remove(other)
+        return saved
@@ -2,31 +2,104 @@ from langchain_community.document_loaders.url import UnstructuredURLLoader
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.document_loaders.csv_loader import CSVLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Union
-import streamlit as st
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+import os
+
+
+def load_pdf(path: str, name: str) -> List:
+    """Pages of one PDF, with ``name`` as their source; runs in a worker process."""
+    documents = PyPDFLoader(path).load()
+    for document in documents:
+        document.metadata["source"] = name
+    return documents
+
+
+def load_url(url: str) -> List:
+    return UnstructuredURLLoader(urls=[url]).load()
+
+
+def bounded_map(executor, fn: Callable, items: Iterable, limit: int) -> Iterator:
+    """Yield ``fn(*item)`` results as they complete, with at most ``limit`` calls in flight.
+
+    Bounding the submissions keeps only a few parsed files in memory when
+    the consumer (splitting, embedding) is slower than the workers.
+    """
+    pending = set()
+    try:
+        for item in items:
+            pending.add(executor.submit(fn, *item))
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
 
 class DocumentProcessor:
-    def __init__(self):
+    """Loads URLs, PDFs and CSVs and splits them into chunks.
+
+    The ``iter_*`` methods stream: PDFs are parsed in a process pool
+    (``max_workers``, default one per core), URLs fetched by a bounded
+    thread pool (``max_url_workers``), and documents are yielded as they
+    finish, in completion order. ``iter_chunks`` splits them as they
+    arrive, so the indexer can embed the first chunks while the rest are
+    still loading. ``load_*`` return lists as before.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_url_workers: int = 8,
+                 url_loader: Callable[[str], List] = load_url):
         self.text_splitter = RecursiveCharacterTextSplitter(
             separators=["\n\n", "\n", " "],
             chunk_size=500,
-            chunk_overlap=100
+            chunk_overlap=100,
+            add_start_index=True  # lets the context packer merge overlapping hits
         )
-    
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_url_workers = max_url_workers
+        self.url_loader = url_loader
+
+    def iter_urls(self, urls: List[str]) -> Iterator:
+        with ThreadPoolExecutor(max_workers=self.max_url_workers) as executor:
+            for documents in bounded_map(executor, self.url_loader, ((url,) for url in urls),
+                                         self.max_url_workers):
+                yield from documents
+
+    def iter_pdfs(self, file_paths: List[str], names: Optional[List[str]] = None) -> Iterator:
+        # Uploads live in temp files, so ``names`` (the uploaded file names)
+        # become the source; the index tracks chunks per source.
+        items = list(zip(file_paths, names or file_paths))
+        if len(items) <= 1 or self.max_workers == 1:
+            for path, name in items:
+                yield from load_pdf(path, name)
+            return
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            for documents in bounded_map(executor, load_pdf, items, 2 * self.max_workers):
+                yield from documents
+
+    def iter_csv(self, file_path: str, name: Optional[str] = None) -> Iterator:
+        for document in CSVLoader(file_path).lazy_load():
+            document.metadata["source"] = name or file_path
+            yield document
+
+    def iter_chunks(self, documents: Iterable) -> Iterator:
+        for document in documents:
+            yield from self.text_splitter.split_documents([document])
+
     def load_urls(self, urls: List[str]) -> List:
-        loader = UnstructuredURLLoader(urls=urls)
-        return loader.load()
-    
-    def load_pdfs(self, file_paths: List[str]) -> List:
-        documents = []
-        for path in file_paths:
-            loader = PyPDFLoader(path)
-            documents.extend(loader.load())
-        return documents
-    
-    def load_csv(self, file_path: str) -> List:
-        loader = CSVLoader(file_path)
-        return loader.load()
-    
+        return list(self.iter_urls(urls))
+
+    def load_pdfs(self, file_paths: List[str], names: Optional[List[str]] = None) -> List:
+        return list(self.iter_pdfs(file_paths, names))
+
+    def load_csv(self, file_path: str, name: Optional[str] = None) -> List:
+        return list(self.iter_csv(file_path, name))
+
     def split_documents(self, documents: List) -> List:
-        return self.text_splitter.split_documents(documents)
\ No newline at end of file
+        return self.text_splitter.split_documents(documents)
@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Tuple
+from common.retry import is_rate_limited, backoff_delay
+
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 5))
+
+
+class BatchEmbedder:
+    """Embeds batches of texts with up to ``max_concurrency`` requests in flight.
+
+    ``map`` yields results in input order and reads the next batch only
+    when a slot is free, so a slow or throttled provider holds back the
+    loaders instead of queueing the whole corpus in memory. Rate-limited
+    requests are retried with exponential backoff, and every worker pauses
+    until the backoff has passed, so the pool slows down as a whole.
+    """
+
+    def __init__(self, embeddings, max_concurrency: int = EMBED_CONCURRENCY, max_retries: int = EMBED_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.embeddings = embeddings
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_rate_limited(e):
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                with self._lock:
+                    self.retries += 1
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                attempt += 1
+
+    def map(self, batches: Iterable[Tuple[object, List[str]]]) -> Iterator[Tuple[object, List[List[float]]]]:
+        """Yield ``(payload, vectors)`` for each ``(payload, texts)``, in order."""
+        if self.max_concurrency == 1:
+            for payload, texts in batches:
+                yield payload, self.embed(texts)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            pending = deque()
+            try:
+                for payload, texts in batches:
+                    pending.append((payload, executor.submit(self.embed, texts)))
+                    if len(pending) >= self.max_concurrency:
+                        payload, future = pending.popleft()
+                        yield payload, future.result()
+                while pending:
+                    payload, future = pending.popleft()
+                    yield payload, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from embedding_pipeline import BatchEmbedder, EMBED_CONCURRENCY
+from ann_index import choose_index_type, index_kind, needs_rebuild, new_index, tune, mmap_flags, INDEX_TYPE, \
+    INDEX_MEMORY_MB, INDEX_NPROBE, INDEX_EF_SEARCH, MAX_TRAINING_POINTS
+
+DEFAULT_STORE_DIR = os.getenv("INDEX_STORE_DIR", ".index_store")
+# SQLite allows 999 bound parameters per statement on older builds.
+LOOKUP_BATCH = 500
+# Chunks per embedding request (the Gemini API takes at most 100).
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", 100))
+# Vectors read back from the cache at a time when an index is rebuilt.
+REBUILD_BATCH_SIZE = 10000
+
+_corpus_locks: Dict[str, threading.Lock] = {}
+_corpus_locks_guard = threading.Lock()
+
+
+def corpus_lock(path: str) -> threading.Lock:
+    """One lock per saved index path in this process, shared by every ``IndexStore`` (and Streamlit session)."""
+    with _corpus_locks_guard:
+        return _corpus_locks.setdefault(os.path.realpath(path), threading.Lock())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_key(embeddings) -> str:
+    """Short hash of the embedding model, so vectors of different models never mix."""
+    model = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None) or type(embeddings).__name__
+    return hashlib.sha256(str(model).encode()).hexdigest()[:12]
+
+
+def chunk_ids(chunks: List, seen: Optional[Dict[str, int]] = None) -> List[str]:
+    """Stable id per chunk from its content and metadata; repeated chunks get an ordinal.
+
+    Pass the same ``seen`` dict for consecutive batches of one corpus.
+    """
+    seen = {} if seen is None else seen
+    ids = []
+    for chunk in chunks:
+        key = content_hash(json.dumps([chunk.page_content, chunk.metadata], sort_keys=True, default=str))
+        seen[key] = seen.get(key, 0) + 1
+        ids.append(key if seen[key] == 1 else f"{key}-{seen[key]}")
+    return ids
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that look texts up by content hash in a SQLite file first.
+
+    Only texts never embedded with this model before reach ``embeddings``;
+    ``hits`` and ``misses`` count the lookups. Queries are not cached.
+    """
+
+    def __init__(self, embeddings, path: str):
+        self.embeddings = embeddings
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def lookup(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_BATCH):
+                batch = hashes[start:start + LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM vectors WHERE hash IN ({','.join('?' * len(batch))})", batch
+                )
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        return found
+
+    def store(self, hashes: List[str], vectors: List[List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (hash, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in zip(hashes, vectors)]
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [content_hash(text) for text in texts]
+        found = self.lookup(list(set(hashes)))
+        missing = {key: text for key, text in zip(hashes, texts) if key not in found}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            # Stored as soon as the batch is back, so a failed build resumes from here.
+            self.store(list(missing), vectors)
+            found.update((key, np.asarray(vector, dtype=np.float32)) for key, vector in zip(missing, vectors))
+        with self._lock:
+            self.hits += len(texts) - sum(1 for key in hashes if key in missing)
+            self.misses += len(missing)
+        return [found[key].tolist() for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def cached_vectors(self, texts: List[str]) -> np.ndarray:
+        """Vectors of already indexed ``texts``, without counting them as cache hits."""
+        hashes = [content_hash(text) for text in texts]
+        found = self.lookup(list(set(hashes)))
+        missing = [text for key, text in zip(hashes, texts) if key not in found]
+        if missing:  # the cache file was removed since
+            found.update(zip(map(content_hash, missing), map(np.asarray, self.embed_documents(missing))))
+        return np.asarray([found[key] for key in hashes], dtype=np.float32)
+
+
+class IndexStore:
+    """FAISS indexes saved per corpus under ``store_dir`` and updated incrementally.
+
+    ``update`` compares the chunks with the saved index by chunk id: only
+    new chunks are embedded (through the content-hash cache) and appended,
+    and chunks that are gone are deleted, so re-processing an unchanged
+    corpus costs no embedding calls. Embedding requests go through a
+    ``BatchEmbedder`` with ``max_concurrency`` batches in flight.
+
+    ``index_type`` (see ``ann_index.choose_index_type``) picks flat, HNSW,
+    IVF or IVF-PQ search from the chunk count and ``memory_budget_mb``; a
+    new index is built as that type from the start. When the type changes, IVF lists no longer fit the corpus size or
+    chunks are removed from an approximate index, the index is rebuilt
+    from the cached vectors. ``nprobe`` and ``ef_search`` trade recall for
+    speed at search time.
+    """
+
+    def __init__(self, embeddings, store_dir: str = DEFAULT_STORE_DIR, max_concurrency: int = EMBED_CONCURRENCY,
+                 index_type: str = INDEX_TYPE, memory_budget_mb: float = INDEX_MEMORY_MB, nprobe: int = INDEX_NPROBE,
+                 ef_search: int = INDEX_EF_SEARCH):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.model_key = model_key(embeddings)
+        self.embeddings = CachedEmbeddings(embeddings, os.path.join(store_dir, f"embeddings_{self.model_key}.sqlite"))
+        self.embedder = BatchEmbedder(self.embeddings, max_concurrency=max_concurrency)
+        self.index_type = index_type
+        self.memory_budget_mb = memory_budget_mb
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+    def path(self, corpus: str) -> str:
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", corpus.strip()) or "default"
+        return os.path.join(self.store_dir, f"{name}-{self.model_key}")
+
+    def current(self, corpus: str) -> str:
+        """Directory of the saved index: ``path/CURRENT`` names the latest version."""
+        path = self.path(corpus)
+        try:
+            with open(os.path.join(path, "CURRENT")) as f:
+                return os.path.join(path, f.read().strip())
+        except FileNotFoundError:
+            return path  # saved before versions were kept
+
+    def load(self, corpus: str, mmap: bool = False) -> Optional[FAISS]:
+        """The saved index, or None; with ``mmap`` the vectors stay on disk (read-only, not for HNSW)."""
+        path = self.current(corpus)
+        if not os.path.exists(os.path.join(path, "index.faiss")):
+            return None
+        if not mmap:
+            # The pickled docstore was written by save() below.
+            index = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+        else:
+            with open(os.path.join(path, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            kind = "flat"
+            if os.path.exists(os.path.join(path, "index.json")):
+                with open(os.path.join(path, "index.json")) as f:
+                    kind = json.load(f)["index_type"]
+            faiss_index = faiss.read_index(os.path.join(path, "index.faiss"), mmap_flags(kind))
+            index = FAISS(self.embeddings, faiss_index, docstore, index_to_docstore_id)
+        tune(index.index, self.nprobe, self.ef_search)
+        return index
+
+    def save(self, corpus: str, index: FAISS):
+        """Write ``index`` as a new version, then switch ``CURRENT`` to it with an atomic rename.
+
+        Readers never see a half-written index. The previous version is
+        kept until the next save, for readers that opened it just before.
+        """
+        path = self.path(corpus)
+        os.makedirs(path, exist_ok=True)
+        previous = os.path.basename(self.current(corpus))
+        version = tempfile.mkdtemp(prefix="v-", dir=path)
+        index.save_local(version)
+        with open(os.path.join(version, "index.json"), "w") as f:
+            json.dump({"index_type": index_kind(index.index), "chunks": index.index.ntotal}, f)
+        fd, pointer = tempfile.mkstemp(prefix="CURRENT.", dir=path)
+        with os.fdopen(fd, "w") as f:
+            f.write(os.path.basename(version))
+        os.replace(pointer, os.path.join(path, "CURRENT"))
+        for name in os.listdir(path):
+            if name not in (os.path.basename(version), previous, "CURRENT"):
+                entry = os.path.join(path, name)
+                if os.path.isdir(entry):
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    os.remove(entry)
+
+    def build(self, kind: str, dim: int, ids: List[str], docs: Dict) -> FAISS:
+        """Index of type ``kind`` over ``ids``, with vectors read from the embedding cache.
+
+        Vectors are added ``REBUILD_BATCH_SIZE`` at a time and IVF types are
+        trained on a sample, so only the index itself (compressed for
+        IVF-PQ) has to fit in memory.
+        """
+        if not ids:
+            raise ValueError("No chunks to index")
+
+        def vectors(batch_ids):
+            return self.embeddings.cached_vectors([docs[doc_id].page_content for doc_id in batch_ids])
+
+        training = None
+        if kind in ("ivf", "ivfpq"):
+            sample = np.random.default_rng(0).permutation(len(ids))[:MAX_TRAINING_POINTS]
+            training = vectors([ids[i] for i in sorted(sample)])
+        faiss_index = new_index(kind, dim, len(ids), self.memory_budget_mb, training)
+        for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+            faiss_index.add(vectors(ids[start:start + REBUILD_BATCH_SIZE]))
+        tune(faiss_index, self.nprobe, self.ef_search)
+        return FAISS(self.embeddings, faiss_index, InMemoryDocstore(docs), dict(enumerate(ids)))
+
+    def rebuild(self, index: FAISS, kind: str, drop: Iterable[str] = ()) -> FAISS:
+        """``index`` as an index of type ``kind`` without the chunks in ``drop``."""
+        drop = set(drop)
+        ids = [doc_id for _, doc_id in sorted(index.index_to_docstore_id.items()) if doc_id not in drop]
+        return self.build(kind, index.index.d, ids, {doc_id: index.docstore.search(doc_id) for doc_id in ids})
+
+    def delete(self, corpus: str):
+        shutil.rmtree(self.path(corpus), ignore_errors=True)
+
+    def update(self, corpus: str, chunks: Iterable, prune: bool = True, batch_size: int = INDEX_BATCH_SIZE,
+               progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Tuple[FAISS, Dict[str, int]]:
+        """Bring the corpus index up to date with ``chunks`` and save it.
+
+        ``chunks`` may be a generator: it is read ``batch_size`` chunks at a
+        time, only as fast as the batches are embedded. With ``prune`` the
+        index holds exactly ``chunks`` afterwards; otherwise chunks of
+        sources not in ``chunks`` are kept and only the changed chunks of
+        the given sources are replaced. ``progress`` is called with the
+        running counts after every batch. If the build fails, the batches
+        already embedded are in the cache and are not embedded again.
+        """
+        with corpus_lock(self.path(corpus)):
+            index = self.load(corpus)
+            existing = set(index.index_to_docstore_id.values()) if index is not None else set()
+            wanted, seen, sources = set(), {}, set()
+            hits, misses = self.embeddings.hits, self.embeddings.misses
+            counts = {"processed": 0, "added": 0}
+
+            def stats():
+                return dict(counts, embedded=self.embeddings.misses - misses, cached=self.embeddings.hits - hits)
+
+            def new_batches():
+                for batch in batched(chunks, batch_size):
+                    ids = chunk_ids(batch, seen)
+                    counts["processed"] += len(batch)
+                    wanted.update(ids)
+                    sources.update(chunk.metadata.get("source") for chunk in batch)
+                    new = [(doc_id, chunk) for doc_id, chunk in zip(ids, batch) if doc_id not in existing]
+                    if new:
+                        yield new, [chunk.page_content for _, chunk in new]
+                    elif progress is not None:
+                        progress(stats())
+
+            # New chunks are only embedded (into the cache) while streaming; the
+            # index is built or extended once the final chunk count, and so
+            # the index type, is known.
+            added: Dict[str, Document] = {}
+            dim = index.index.d if index is not None else None
+            for new, vectors in self.embedder.map(new_batches()):
+                for doc_id, chunk in new:
+                    added[doc_id] = Document(page_content=chunk.page_content, metadata=chunk.metadata)
+                dim = dim or len(vectors[0])
+                counts["added"] += len(new)
+                if progress is not None:
+                    progress(stats())
+
+            stale = existing - wanted
+            if not prune:
+                stale = {doc_id for doc_id in stale if index.docstore.search(doc_id).metadata.get("source") in sources}
+            remaining = len(existing) - len(stale) + len(added)
+            if not remaining:
+                raise ValueError("No chunks to index")
+            kind = choose_index_type(remaining, dim, self.memory_budget_mb, self.index_type)
+            # Approximate indexes keep their labels on removal, which the
+            # wrapper's id mapping does not expect, so they are rebuilt.
+            rebuilt = (index is None or needs_rebuild(index.index, kind, remaining)
+                       or bool(stale and index_kind(index.index) != "flat"))
+            if rebuilt:
+                ids, docs = [], {}
+                if index is not None:
+                    ids = [doc_id for _, doc_id in sorted(index.index_to_docstore_id.items()) if doc_id not in stale]
+                    docs = {doc_id: index.docstore.search(doc_id) for doc_id in ids}
+                ids += list(added)
+                docs.update(added)
+                index = self.build(kind, dim, ids, docs)
+            else:
+                if stale:
+                    index.delete(list(stale))
+                for batch_ids in batched(added, REBUILD_BATCH_SIZE):
+                    texts = [added[doc_id].page_content for doc_id in batch_ids]
+                    index.add_embeddings(zip(texts, self.embeddings.cached_vectors(texts)),
+                                         metadatas=[added[doc_id].metadata for doc_id in batch_ids], ids=batch_ids)
+            if stale or added or rebuilt:
+                self.save(corpus, index)
+
+            return index, dict(stats(), chunks=len(index.index_to_docstore_id), removed=len(stale))
@@ -4,7 +4,7 @@ import tempfile
 from pathlib import Path
 from document_processor import DocumentProcessor
 from query_engine import QueryEngine
-from utils import setup_page_config, display_results
+from utils import setup_page_config, display_results, show_index_stats, index_progress
 
 
 import asyncio
@@ -37,6 +37,18 @@ def main():
             index=0
         )
         
+        corpus = st.text_input("Corpus name:", value="default",
+                               help="Each corpus keeps its own saved index; processing updates it incrementally")
+        prune = st.checkbox("Remove sources not in this batch", value=False)
+        
+        if st.session_state.get("corpus") != corpus:
+            # Open the corpus' saved index, e.g. after a restart.
+            st.session_state.corpus = corpus
+            try:
+                st.session_state.query_engine = QueryEngine(corpus=corpus)
+            except ValueError:
+                st.session_state.query_engine = None
+        
         processor = DocumentProcessor()
         
         if source_type == "URLs":
@@ -52,10 +64,12 @@ def main():
                     urls = [url.strip() for url in urls_input.split('\n') if url.strip()]
                     with st.spinner("Loading and processing URLs..."):
                         try:
-                            documents = processor.load_urls(urls)
-                            chunks = processor.split_documents(documents)
-                            st.session_state.query_engine = QueryEngine(chunks)
-                            st.success(f"✅ Processed {len(chunks)} chunks from {len(urls)} URLs")
+                            chunks = processor.iter_chunks(processor.iter_urls(urls))
+                            st.session_state.query_engine = QueryEngine(
+                                chunks, corpus=corpus, prune=prune, progress=index_progress()
+                            )
+                            st.success(f"✅ Processed {st.session_state.query_engine.stats['processed']} chunks from {len(urls)} URLs")
+                            show_index_stats(st.session_state.query_engine.stats)
                         except Exception as e:
                             st.error(f"❌ Error: {str(e)}")
                 else:
@@ -78,10 +92,14 @@ def main():
                                 tmp.write(file.read())
                                 temp_paths.append(tmp.name)
                         
-                        documents = processor.load_pdfs(temp_paths)
-                        chunks = processor.split_documents(documents)
-                        st.session_state.query_engine = QueryEngine(chunks)
-                        st.success(f"✅ Processed {len(chunks)} chunks from {len(uploaded_files)} PDFs")
+                        chunks = processor.iter_chunks(
+                            processor.iter_pdfs(temp_paths, [file.name for file in uploaded_files])
+                        )
+                        st.session_state.query_engine = QueryEngine(
+                            chunks, corpus=corpus, prune=prune, progress=index_progress()
+                        )
+                        st.success(f"✅ Processed {st.session_state.query_engine.stats['processed']} chunks from {len(uploaded_files)} PDFs")
+                        show_index_stats(st.session_state.query_engine.stats)
                         
                         for path in temp_paths:
                             os.unlink(path)
@@ -99,10 +117,12 @@ def main():
                             tmp.write(uploaded_file.read())
                             temp_path = tmp.name
                         
-                        documents = processor.load_csv(temp_path)
-                        chunks = processor.split_documents(documents)
-                        st.session_state.query_engine = QueryEngine(chunks)
-                        st.success(f"✅ Processed {len(chunks)} chunks from CSV")
+                        chunks = processor.iter_chunks(processor.iter_csv(temp_path, uploaded_file.name))
+                        st.session_state.query_engine = QueryEngine(
+                            chunks, corpus=corpus, prune=prune, progress=index_progress()
+                        )
+                        st.success(f"✅ Processed {st.session_state.query_engine.stats['processed']} chunks from CSV")
+                        show_index_stats(st.session_state.query_engine.stats)
                         
                         os.unlink(temp_path)
                     except Exception as e:
@@ -129,7 +149,8 @@ def main():
     with col2:
         if st.session_state.query_engine:
             st.success("✅ Ready to search!")
-            st.info(f"📊 {len(st.session_state.query_engine.retriever.vectorstore.docstore._dict)} documents loaded")
+            st.info(f"📊 {len(st.session_state.query_engine.vector_index.docstore._dict)} documents loaded "
+                    f"({st.session_state.query_engine.index_type} index)")
         else:
             st.warning("⚠️ Please process some documents first")
     
@@ -1,31 +1,97 @@
-from langchain_community.vectorstores import FAISS
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from collections import OrderedDict
 import streamlit as st
 import os
 from dotenv import load_dotenv
+from index_store import IndexStore, DEFAULT_STORE_DIR
+from ann_index import index_kind, INDEX_TYPE, INDEX_MEMORY_MB, INDEX_NPROBE, INDEX_EF_SEARCH
+from context_packer import ContextPacker, CONTEXT_TOKEN_BUDGET, CONTEXT_FETCH_K
 
 load_dotenv()
 
+# Question embeddings kept per engine, so repeated questions (and Streamlit reruns) skip the embedding call.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 256))
+
 class QueryEngine:
-    def __init__(self, chunks: List):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            st.error("Please set GOOGLE_API_KEY in your .env file")
-            st.stop()
-        
-        os.environ["GOOGLE_API_KEY"] = api_key
+    """Answers questions over a corpus of chunks indexed with FAISS.
+
+    The index is kept per ``corpus`` in ``store_dir`` (``INDEX_STORE_DIR``,
+    default ``.index_store/``) and updated incrementally, in batches when
+    ``chunks`` is a generator; ``chunks=None`` opens the saved index.
+    ``stats`` reports how many chunks were added, removed, embedded and
+    served from the embedding cache, and ``progress`` receives the running
+    counts during the build. ``llm`` and ``embeddings`` default to Gemini;
+    pass stubs to build and search offline.
+
+    ``index_type`` (``INDEX_TYPE``: auto, flat, hnsw, ivf or ivfpq),
+    ``memory_budget_mb`` (``INDEX_MEMORY_MB``), ``nprobe`` and
+    ``ef_search`` are passed to the ``IndexStore``. With ``mmap``
+    (``INDEX_MMAP=1``) the saved index is searched memory-mapped from disk
+    instead of held in memory.
+
+    ``query`` retrieves ``fetch_k`` chunks (``CONTEXT_FETCH_K``) and packs
+    them into at most ``context_token_budget`` tokens
+    (``CONTEXT_TOKEN_BUDGET``) with a ``ContextPacker``. The question is
+    embedded once and its vector kept for the last ``query_cache_size``
+    questions.
+    """
+
+    def __init__(self, chunks: Optional[Iterable] = None, corpus: str = "default", prune: bool = True,
+                 store_dir: str = DEFAULT_STORE_DIR, llm=None, embeddings=None,
+                 progress: Optional[Callable[[Dict[str, int]], None]] = None, index_type: str = INDEX_TYPE,
+                 memory_budget_mb: float = INDEX_MEMORY_MB, nprobe: int = INDEX_NPROBE,
+                 ef_search: int = INDEX_EF_SEARCH, mmap: Optional[bool] = None,
+                 context_token_budget: int = CONTEXT_TOKEN_BUDGET, fetch_k: int = CONTEXT_FETCH_K,
+                 query_cache_size: int = QUERY_CACHE_SIZE):
+        if llm is None or embeddings is None:
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                st.error("Please set GOOGLE_API_KEY in your .env file")
+                st.stop()
+            
+            os.environ["GOOGLE_API_KEY"] = api_key
         
-        self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+        self.llm = llm or ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+        self.embeddings = embeddings or GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
         
-        self.vector_index = FAISS.from_documents(chunks, self.embeddings)
-        self.retriever = self.vector_index.as_retriever(search_kwargs={"k": 4})
+        if mmap is None:
+            mmap = os.getenv("INDEX_MMAP", "").lower() in ("1", "true", "yes")
+        self.index_store = IndexStore(self.embeddings, store_dir, index_type=index_type,
+                                      memory_budget_mb=memory_budget_mb, nprobe=nprobe, ef_search=ef_search)
+        if chunks is None:
+            self.vector_index = self.index_store.load(corpus, mmap=mmap)
+            if self.vector_index is None:
+                raise ValueError(f"No saved index for corpus '{corpus}'")
+            self.stats = {"processed": 0, "chunks": len(self.vector_index.index_to_docstore_id), "added": 0,
+                          "removed": 0, "embedded": 0, "cached": 0}
+        else:
+            self.vector_index, self.stats = self.index_store.update(corpus, chunks, prune=prune, progress=progress)
+            if mmap:
+                self.vector_index = self.index_store.load(corpus, mmap=True)
+        self.index_type = index_kind(self.vector_index.index)
+        self.fetch_k = fetch_k
+        self.context_packer = ContextPacker(context_token_budget)
+        self.query_cache_size = query_cache_size
+        self._query_vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def query_vector(self, question: str) -> List[float]:
+        vector = self._query_vectors.get(question)
+        if vector is None:
+            vector = self.index_store.embeddings.embed_query(question)
+            self._query_vectors[question] = vector
+            while len(self._query_vectors) > self.query_cache_size:
+                self._query_vectors.popitem(last=False)
+        else:
+            self._query_vectors.move_to_end(question)
+        return vector
     
     def query(self, question: str) -> Dict[str, Any]:
         try:
-            docs = self.retriever.get_relevant_documents(question)
-            context = "\n\n".join([doc.page_content for doc in docs[:3]])
+            # FAISS returns L2 distances; the packer wants higher-is-better scores.
+            scored = self.vector_index.similarity_search_with_score_by_vector(self.query_vector(question),
+                                                                              k=self.fetch_k)
+            context, docs, context_stats = self.context_packer.pack([(doc, -distance) for doc, distance in scored])
             
             prompt = f"""
             Based on the following context, answer the question:
@@ -42,7 +108,8 @@ class QueryEngine:
             
             return {
                 "answer": response.content,
-                "sources": docs
+                "sources": docs,
+                "context": context_stats
             }
         except Exception as e:
             st.error(f"Error: {str(e)}")
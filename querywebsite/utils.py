@@ -52,6 +52,22 @@ def setup_page_config():
     </style>
     """, unsafe_allow_html=True)
 
+def show_index_stats(stats: Dict[str, int]):
+    st.caption(
+        f"Index: {stats['chunks']} chunks, {stats['added']} added, {stats['removed']} removed; "
+        f"{stats['embedded']} embedded, {stats['cached']} from cache"
+    )
+
+def index_progress():
+    """Progress callback for ``QueryEngine``; the total is unknown while sources stream in."""
+    status = st.empty()
+
+    def update(stats: Dict[str, int]):
+        status.caption(f"⏳ {stats['processed']} chunks read, {stats['added']} new indexed "
+                       f"({stats['embedded']} embedded, {stats['cached']} from cache)")
+
+    return update
+
 def display_results(results: Dict[str, Any]):
     st.markdown("---")
     st.subheader("📋 Search Results")
@@ -63,6 +79,11 @@ def display_results(results: Dict[str, Any]):
     </div>
     """, unsafe_allow_html=True)
     
+    if results.get('context'):
+        context = results['context']
+        st.caption(f"Context: {context['tokens']} tokens from {context['chunks']} of {context['candidates']} "
+                   f"retrieved chunks ({context['merged']} merged, {context['duplicates']} duplicates dropped)")
+    
     if results['sources']:
         st.subheader("📚 Source Documents")
         
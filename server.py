@@ -0,0 +1,249 @@
+"""Async HTTP API around TShirtQueryHelper.
+
+    python server.py --workers 4 --port 8000
+
+Every worker process builds and warms one helper at startup and shares it
+across requests; with ``STARTUP_SNAPSHOT`` set that takes well under a
+second. Endpoints:
+
+    POST /query        {"question": "...", "top_k": 1, "with_answer": false}
+    POST /query/batch  {"questions": ["...", ...], "top_k": 1}
+    POST /query/table  {"question": "...", "max_rows": 10000}, columnar rows for list questions
+    GET  /health       liveness, 200 as soon as the process serves requests
+    GET  /ready        200 once the helper is warm, 503 before
+    GET  /metrics      Prometheus text for this worker
+"""
+import os
+import sys
+import asyncio
+import argparse
+import functools
+import contextvars
+import threading
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from langchain_helper import TShirtQueryHelper, format_numeric_answer
+from metrics import metrics_sinks_from_env, process_registry
+from common.retry import acall_with_backoff
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1)
+    top_k: int = Field(default=1, ge=1)
+    with_answer: bool = False
+
+
+class TableQueryRequest(BaseModel):
+    question: str = Field(min_length=1)
+    max_rows: int = Field(default=10000, ge=1, le=100000)
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str] = Field(min_length=1)
+    top_k: int = Field(default=1, ge=1)
+
+
+class TooBusy(Exception):
+    pass
+
+
+def _answer_payload(result):
+    rows = result["rows"]
+    answer = format_numeric_answer(rows[0][0]) if rows and len(rows[0]) > 0 else None
+    return {
+        "question": result["question"],
+        "answer": answer,
+        "answer_text": result["answer"],
+        "sql": result["sql"],
+        "source": result["source"],
+        "columns": result["columns"],
+        "rows": [list(row) for row in rows],
+        "timings": result["timings"],
+    }
+
+
+def server_helper():
+    """Helper whose metrics go to the process registry behind ``/metrics``.
+
+    Workers never bind ``METRICS_PORT`` themselves; uvicorn starts several
+    per host and only one of them could get the port.
+    """
+    sinks = metrics_sinks_from_env(export=False)
+    if process_registry() not in sinks:
+        sinks.append(process_registry())
+    return TShirtQueryHelper(metrics_sinks=sinks)
+
+
+def create_app(helper_factory=server_helper, max_concurrency=None, request_timeout=None,
+               max_batch_size=None, max_retries=3, registry=None):
+    """Build the ASGI app; limits default to the ``SERVER_*`` environment variables."""
+    registry = registry or process_registry()
+    max_concurrency = max_concurrency or int(os.getenv("SERVER_MAX_CONCURRENCY", 8))
+    request_timeout = request_timeout or float(os.getenv("SERVER_REQUEST_TIMEOUT", 60))
+    max_batch_size = max_batch_size or int(os.getenv("SERVER_MAX_BATCH_SIZE", 50))
+    state = {"helper": None, "error": None}
+
+    def warm_up():
+        try:
+            helper = helper_factory()
+            helper.warm_up()
+            state["helper"] = helper
+        except Exception as e:
+            state["error"] = str(e)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Warm the helper off the event loop so /health answers during startup.
+        threading.Thread(target=warm_up, daemon=True).start()
+        yield
+
+    app = FastAPI(title="AtliQ Tees query API", lifespan=lifespan)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    def get_helper():
+        if state["helper"] is None:
+            raise HTTPException(status_code=503, detail=state["error"] or "Query helper is still warming up")
+        return state["helper"]
+
+    async def run_limited(deadline, fn, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            raise TooBusy()
+        thread = None
+
+        async def in_thread(*call_args):
+            nonlocal thread
+            context = contextvars.copy_context()
+            thread = loop.run_in_executor(None, functools.partial(context.run, fn, *call_args))
+            # Shielded, so a timeout leaves ``thread`` pending until the work really ends.
+            return await asyncio.shield(thread)
+
+        def release(future):
+            if not future.cancelled():
+                future.exception()  # retrieved, nobody awaits it after a timeout
+            semaphore.release()
+
+        try:
+            return await asyncio.wait_for(
+                acall_with_backoff(in_thread, *args, max_retries=max_retries),
+                max(0.0, deadline - loop.time())
+            )
+        finally:
+            # A timed-out query keeps its slot until its thread finishes, so
+            # abandoned work cannot pile up beyond max_concurrency.
+            if thread is None or thread.done():
+                semaphore.release()
+            else:
+                thread.add_done_callback(release)
+
+    async def run_question(helper, question, top_k, with_answer, deadline):
+        return await run_limited(deadline, helper.query_tshirt_inventory_rows, question, top_k, with_answer)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/ready")
+    async def ready():
+        get_helper()
+        return {"status": "ready"}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return registry.render_prometheus()
+
+    @app.post("/query")
+    async def query(request: QueryRequest):
+        helper = get_helper()
+        deadline = asyncio.get_running_loop().time() + request_timeout
+        try:
+            result = await run_question(helper, request.question, request.top_k, request.with_answer, deadline)
+        except TooBusy:
+            raise HTTPException(status_code=503, detail="Too many concurrent queries")
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Query timed out after {request_timeout}s")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+        return _answer_payload(result)
+
+    @app.post("/query/table")
+    async def query_table(request: TableQueryRequest):
+        helper = get_helper()
+        deadline = asyncio.get_running_loop().time() + request_timeout
+        try:
+            result = await run_limited(deadline, helper.query_tshirt_inventory_table, request.question,
+                                       request.max_rows)
+        except TooBusy:
+            raise HTTPException(status_code=503, detail="Too many concurrent queries")
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Query timed out after {request_timeout}s")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+        table = result["table"]
+        return {
+            "question": result["question"],
+            "sql": result["sql"],
+            "source": result["source"],
+            "columns": table.columns,
+            "data": table.to_dict(),
+            "num_rows": len(table),
+            "truncated": table.truncated,
+            "timings": result["timings"],
+        }
+
+    @app.post("/query/batch")
+    async def query_batch(request: BatchQueryRequest):
+        helper = get_helper()
+        if len(request.questions) > max_batch_size:
+            raise HTTPException(status_code=413, detail=f"At most {max_batch_size} questions per batch")
+        deadline = asyncio.get_running_loop().time() + request_timeout
+
+        async def run(question):
+            try:
+                result = await run_question(helper, question, request.top_k, False, deadline)
+                return dict(_answer_payload(result), error=None)
+            except TooBusy:
+                error = "Too many concurrent queries"
+            except asyncio.TimeoutError:
+                error = f"Query timed out after {request_timeout}s"
+            except Exception as e:
+                error = f"Error processing query: {str(e)}"
+            return {"question": question, "answer": None, "error": error}
+
+        return {"results": await asyncio.gather(*(run(question) for question in request.questions))}
+
+    return app
+
+
+app = create_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve TShirtQueryHelper over HTTP")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", os.cpu_count() or 1)),
+                        help="worker processes, each with its own warm helper")
+    parser.add_argument("--max-concurrency", type=int, help="questions in flight per worker")
+    parser.add_argument("--request-timeout", type=float, help="seconds before a request gets a 504")
+    parser.add_argument("--max-batch-size", type=int)
+    args = parser.parse_args(argv)
+
+    # Workers import this module afresh, so limits travel through the environment.
+    for name, value in (("SERVER_MAX_CONCURRENCY", args.max_concurrency),
+                        ("SERVER_REQUEST_TIMEOUT", args.request_timeout),
+                        ("SERVER_MAX_BATCH_SIZE", args.max_batch_size)):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    import uvicorn
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,161 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question):
+    question = re.sub(r"'s\b", "", question.lower())
+    question = re.sub(r"[^\w\s.]|(?<!\d)\.|\.(?!\d)", " ", question)
+    return " ".join(question.split())
+
+
+def _numbers(text):
+    return sorted(re.findall(r"\d+(?:\.\d+)?", text))
+
+
+def _sql_literals(sql):
+    return [a or b for a, b in re.findall(r"'([^']*)'|\"([^\"]*)\"", sql)]
+
+
+def _mentioned_values(question, filter_aliases):
+    """``(column, value)`` pairs named in a normalized question; aliases are tried longest first."""
+    text = f" {question} "
+    values = set()
+    for alias, column, value in filter_aliases:
+        if f" {alias} " in text:
+            values.add((column, value))
+            text = text.replace(f" {alias} ", " ")
+    return values
+
+
+class SQLQueryCache:
+    """LRU/TTL cache of generated SQL keyed on the normalized question and ``top_k``.
+
+    Lookups first try an exact match on the normalized question and then fall
+    back to the most similar cached question by embedding cosine similarity.
+    A similar question only counts as a hit when it mentions the same numbers
+    and every string literal of the cached SQL, so "Nike XS white" never
+    reuses the SQL generated for "Nike XS black". With ``filter_aliases``, a
+    callable returning ``(alias, column, value)`` triples, every filter value
+    the new question names must also be in the cached question or SQL, so
+    "white Nike XS" never reuses the SQL generated for "white Nike" either. SQL generated for one ``top_k`` usually carries its
+    LIMIT, so it is only reused for the same ``top_k``.
+    """
+
+    def __init__(self, embeddings, max_size=256, ttl=3600, similarity_threshold=0.95,
+                 schema_probe=None, schema_check_interval=60, filter_aliases=None):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.schema_probe = schema_probe
+        self.schema_check_interval = schema_check_interval
+        self.filter_aliases = filter_aliases
+        self._entries = OrderedDict()
+        self._schema_version = None
+        self._schema_checked_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def check_schema(self, force=False):
+        """Drop every entry when the probed schema version has changed."""
+        if self.schema_probe is None:
+            return
+        now = time.monotonic()
+        if (not force and self._schema_checked_at is not None
+                and now - self._schema_checked_at < self.schema_check_interval):
+            return
+        version = self.schema_probe()
+        with self._lock:
+            self._schema_checked_at = now
+            if version != self._schema_version:
+                self._entries.clear()
+                self._schema_version = version
+
+    def lookup(self, question, top_k=None):
+        """Return ``(sql, embedding)``; ``sql`` is None on a miss.
+
+        The embedding is computed only when there is no exact match and is
+        handed back so ``store`` does not embed the same question twice.
+        """
+        self.check_schema()
+        key = normalize_question(question)
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get((key, top_k))
+            if entry is not None:
+                self._entries.move_to_end((key, top_k))
+                return entry["sql"], entry["embedding"]
+            if not self._entries:
+                return None, None
+
+        embedding = self._embed(key)
+        aliases = self.filter_aliases() if self.filter_aliases is not None else []
+        with self._lock:
+            candidates = [(k, e) for k, e in self._entries.items()
+                          if k[1] == top_k and e["embedding"] is not None]
+            if not candidates:
+                return None, embedding
+            matrix = np.stack([e["embedding"] for _, e in candidates])
+            scores = matrix @ embedding
+            for idx in np.argsort(-scores):
+                if scores[idx] < self.similarity_threshold:
+                    break
+                cached_key, entry = candidates[idx]
+                if self._same_parameters(key, cached_key[0], entry["sql"], aliases):
+                    self._entries.move_to_end(cached_key)
+                    return entry["sql"], embedding
+        return None, embedding
+
+    def store(self, question, sql, embedding=None, top_k=None):
+        key = normalize_question(question)
+        if embedding is None:
+            embedding = self._embed(key)
+        key = (key, top_k)
+        with self._lock:
+            self._entries[key] = {
+                "sql": sql,
+                "embedding": embedding,
+                "created_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _embed(self, text):
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict_expired(self):
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        expired = [k for k, e in self._entries.items() if e["created_at"] < cutoff]
+        for key in expired:
+            del self._entries[key]
+
+    @staticmethod
+    def _same_parameters(question, cached_question, sql, filter_aliases=()):
+        if _numbers(question) != _numbers(cached_question):
+            return False
+        words = f" {question} "
+        literals = {normalize_question(literal) for literal in _sql_literals(sql)}
+        for literal in literals:
+            if f" {literal} " not in words:
+                return False
+        if filter_aliases:
+            cached = _mentioned_values(cached_question, filter_aliases)
+            cached |= {(column, value) for _, column, value in filter_aliases if normalize_question(value) in literals}
+            if not _mentioned_values(question, filter_aliases) <= cached:
+                return False
+        return True
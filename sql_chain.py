@@ -0,0 +1,195 @@
+import re
+import time
+from typing import Any, Dict, List, Optional
+from pydantic import Field
+from langchain.chains.llm import LLMChain
+from langchain_core.prompts.prompt import PromptTemplate
+from langchain_core.callbacks.manager import CallbackManagerForChainRun
+from langchain_community.tools.sql_database.prompt import QUERY_CHECKER
+from langchain_experimental.sql import SQLDatabaseChain
+from langchain_experimental.sql.base import INTERMEDIATE_STEPS_KEY, SQL_QUERY, SQL_RESULT
+from cost_guard import CostLimitExceeded
+
+
+def clean_sql_query(sql):
+    """Remove markdown code blocks and clean the SQL query"""
+    if SQL_QUERY in sql:
+        sql = sql.split(SQL_QUERY)[1]
+    if SQL_RESULT in sql:
+        sql = sql.split(SQL_RESULT)[0]
+    sql = re.sub(r'^\s*```sql\s*|```\s*$', '', sql.strip(), flags=re.IGNORECASE)
+    sql = sql.strip()
+    sql = ' '.join(sql.split())
+    return sql
+
+
+def _add_timing(timings, stage, started):
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+class TShirtSQLChain(SQLDatabaseChain):
+    """SQLDatabaseChain whose query checker can run locally.
+
+    With a ``sql_validator`` the generated SQL is validated in-process and the
+    LLM query checker only runs when local validation fails, saving one of
+    the three serial LLM calls on the common path. Whatever the checker
+    returns is validated again for safety (single read-only statement over
+    known tables) before it reaches the database. The ``top_k`` passed to
+    ``invoke`` is honoured instead of always using the chain default.
+
+    With a ``cost_guard`` the checked SQL is also costed from its query plan;
+    a rejected statement is regenerated up to ``cost_retries`` times with the
+    reasons added to the question, then ``CostLimitExceeded`` is raised.
+    """
+
+    sql_validator: Optional[Any] = Field(default=None, exclude=True)
+    """Object with ``validate(sql, check_columns=True) -> list[str]``; None keeps the LLM checker."""
+    return_rows: bool = False
+    """Stop after executing the SQL and return typed ``rows``/``columns`` instead of an LLM answer.
+    Can be overridden per call with a ``return_rows`` input; pass ``with_answer=True`` to still
+    get the natural-language answer."""
+    max_rows: int = 10000
+    """Row cap for ``columnar`` calls, which stream the result into a ``ColumnarResult`` ``table``."""
+    cost_guard: Optional[Any] = Field(default=None, exclude=True)
+    """``SQLCostGuard`` that checks the query plan, adds a LIMIT and a statement timeout; None runs the SQL as is."""
+    cost_retries: int = 1
+    """How often SQL rejected by the cost guard (or stopped at its timeout) is regenerated with the reasons."""
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        input_text = f"{inputs[self.input_key]}\n{SQL_QUERY}"
+        _run_manager.on_text(input_text, verbose=self.verbose)
+        table_info = self.database.get_table_info(table_names=inputs.get("table_names_to_use"))
+        llm_inputs = {
+            "input": input_text,
+            "top_k": str(inputs.get("top_k", self.top_k)),
+            "dialect": self.database.dialect,
+            "table_info": table_info,
+            "stop": ["\nSQLResult:"],
+        }
+        if self.memory is not None:
+            for k in self.memory.memory_variables:
+                llm_inputs[k] = inputs[k]
+        return_rows = inputs.get("return_rows", self.return_rows)
+        columnar = inputs.get("columnar", False)
+        with_answer = inputs.get("with_answer", not (return_rows or columnar))
+        timings: Dict[str, float] = {}
+        intermediate_steps: List = []
+        try:
+            feedback = None
+            for attempt in range(self.cost_retries + 1):
+                if feedback is not None:
+                    # Regenerate with the rejection so the LLM can write a cheaper query.
+                    llm_inputs["input"] = f"{inputs[self.input_key]}\n{feedback}\n{SQL_QUERY}"
+                intermediate_steps.append(llm_inputs.copy())  # input: sql generation
+                started = time.perf_counter()
+                sql_cmd = self.llm_chain.predict(
+                    callbacks=_run_manager.get_child(),
+                    **llm_inputs,
+                ).strip()
+                _add_timing(timings, "sql_generation", started)
+                if self.return_sql:
+                    return {self.output_key: sql_cmd}
+
+                started = time.perf_counter()
+                sql_cmd = self._check_sql(clean_sql_query(sql_cmd), _run_manager)
+                _add_timing(timings, "query_check", started)
+                try:
+                    started = time.perf_counter()
+                    sql_cmd, execution_options = self._guard_sql(sql_cmd, inputs, columnar)
+                    if self.cost_guard is not None:
+                        _add_timing(timings, "cost_check", started)
+                    intermediate_steps.append(sql_cmd)  # output: sql generation (checked)
+                    _run_manager.on_text(sql_cmd, color="green", verbose=self.verbose)
+                    intermediate_steps.append({"sql_cmd": sql_cmd})  # input: sql exec
+                    started = time.perf_counter()
+                    try:
+                        result, output = self._execute_sql(sql_cmd, inputs, return_rows, columnar, execution_options)
+                    finally:
+                        _add_timing(timings, "sql_execution", started)
+                    break
+                except CostLimitExceeded as e:
+                    intermediate_steps.append({"rejected": e.sql, "violations": e.violations})
+                    _run_manager.on_text(f"\n{e}\n", color="red", verbose=self.verbose)
+                    if attempt == self.cost_retries:
+                        raise
+                    feedback = e.feedback()
+            intermediate_steps.append(str(result))  # output: sql exec
+
+            input_text = f"{inputs[self.input_key]}\n{SQL_QUERY}"
+            _run_manager.on_text("\nSQLResult: ", verbose=self.verbose)
+            _run_manager.on_text(str(result), color="yellow", verbose=self.verbose)
+            if self.return_direct or not with_answer:
+                final_result = result
+            else:
+                _run_manager.on_text("\nAnswer:", verbose=self.verbose)
+                input_text += f"{sql_cmd}\nSQLResult: {result}\nAnswer:"
+                llm_inputs["input"] = input_text
+                intermediate_steps.append(llm_inputs.copy())  # input: final answer
+                started = time.perf_counter()
+                final_result = self.llm_chain.predict(
+                    callbacks=_run_manager.get_child(),
+                    **llm_inputs,
+                ).strip()
+                timings["answer_generation"] = time.perf_counter() - started
+                intermediate_steps.append(final_result)  # output: final answer
+                _run_manager.on_text(final_result, color="green", verbose=self.verbose)
+            chain_result: Dict[str, Any] = {self.output_key: final_result, "sql": sql_cmd, "timings": timings}
+            chain_result.update(output)
+            if self.return_intermediate_steps:
+                chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
+            return chain_result
+        except Exception as exc:
+            exc.intermediate_steps = intermediate_steps  # type: ignore
+            raise exc
+
+    def _execute_sql(self, sql_cmd, inputs, return_rows, columnar, execution_options):
+        """Return ``(result text, extra chain outputs)``; a timeout becomes ``CostLimitExceeded``."""
+        try:
+            if columnar:
+                table = self.database.fetch_columnar(sql_cmd, max_rows=inputs.get("max_rows", self.max_rows),
+                                                     execution_options=execution_options)
+                return table.preview(), {"table": table}
+            if return_rows:
+                cursor = self.database.run(sql_cmd, fetch="cursor", execution_options=execution_options)
+                columns = list(cursor.keys())
+                rows = [tuple(row) for row in cursor.fetchall()]
+                return str(rows) if rows else "", {"columns": columns, "rows": rows}
+            return self.database.run(sql_cmd, execution_options=execution_options), {}
+        except Exception as e:
+            rejection = self.cost_guard.timeout_error(sql_cmd, e) if self.cost_guard is not None else None
+            if rejection is None:
+                raise
+            raise rejection from e
+
+    def _guard_sql(self, sql_cmd, inputs, columnar):
+        if self.cost_guard is None:
+            return sql_cmd, None
+        # One row past the cap lets fetch_columnar tell that the result was truncated.
+        limit = inputs.get("max_rows", self.max_rows) + 1 if columnar else None
+        return self.cost_guard.check(sql_cmd, limit=limit), self.cost_guard.execution_options
+
+    def _check_sql(self, sql_cmd, run_manager):
+        if self.sql_validator is not None and not self.sql_validator.validate(sql_cmd):
+            return sql_cmd
+
+        if self.use_query_checker:
+            query_checker_prompt = self.query_checker_prompt or PromptTemplate(
+                template=QUERY_CHECKER, input_variables=["query", "dialect"]
+            )
+            query_checker_chain = LLMChain(llm=self.llm_chain.llm, prompt=query_checker_prompt)
+            sql_cmd = clean_sql_query(query_checker_chain.predict(
+                callbacks=run_manager.get_child(),
+                query=sql_cmd,
+                dialect=self.database.dialect,
+            ))
+
+        if self.sql_validator is not None:
+            errors = self.sql_validator.validate(sql_cmd, check_columns=False)
+            if errors:
+                raise ValueError(f"Rejected generated SQL: {'; '.join(errors)}")
+        return sql_cmd
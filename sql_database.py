@@ -0,0 +1,454 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from contextlib import closing
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from langchain_community.utilities import SQLDatabase
+from sql_validator import is_read_only
+from columnar import ColumnarBuilder
+
+
+def create_pooled_engine(database_uri, pool_size=5, max_overflow=10, pool_recycle=1800,
+                         pool_pre_ping=True, statement_timeout=None, **engine_args):
+    """Create an engine with explicit pool settings and an optional statement timeout.
+
+    ``statement_timeout`` (seconds) is applied per connection through MySQL's
+    ``max_execution_time``, which aborts any SELECT running longer than that.
+    A single statement can set its own with the ``statement_timeout``
+    execution option (see ``_install_statement_timeouts``). SQLite manages
+    its own connections, so the pool sizing is skipped there.
+    """
+    url = make_url(database_uri)
+    if url.get_backend_name() != "sqlite":
+        engine_args.setdefault("pool_size", pool_size)
+        engine_args.setdefault("max_overflow", max_overflow)
+    engine_args.setdefault("pool_recycle", pool_recycle)
+    engine_args.setdefault("pool_pre_ping", pool_pre_ping)
+    engine = create_engine(url, **engine_args)
+
+    if statement_timeout and engine.dialect.name == "mysql":
+        @event.listens_for(engine, "connect")
+        def _set_statement_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET SESSION max_execution_time = {int(statement_timeout * 1000)}")
+            cursor.close()
+    _install_statement_timeouts(engine, statement_timeout)
+    return engine
+
+
+def _install_statement_timeouts(engine, default_timeout=None):
+    """Honour a ``statement_timeout`` execution option per statement.
+
+    MySQL gets a ``MAX_EXECUTION_TIME`` optimizer hint on the SELECT. SQLite
+    has no server-side timeout, so a progress handler interrupts the
+    statement (including fetching its rows) once its deadline has passed;
+    there ``default_timeout`` applies to statements without the option.
+    """
+    if engine.dialect.name == "mysql":
+        @event.listens_for(engine, "before_cursor_execute", retval=True)
+        def _add_execution_time_hint(conn, cursor, statement, parameters, context, executemany):
+            timeout = context.execution_options.get("statement_timeout") if context is not None else None
+            if timeout and statement.lstrip()[:6].upper() == "SELECT":
+                statement = f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout * 1000)}) */" + statement.lstrip()[6:]
+            return statement, parameters
+
+    elif engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _install_progress_handler(dbapi_connection, connection_record):
+            info = connection_record.info
+            dbapi_connection.set_progress_handler(
+                lambda: int(info.get("statement_deadline") is not None
+                            and time.monotonic() > info["statement_deadline"]),
+                10000
+            )
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _set_statement_deadline(conn, cursor, statement, parameters, context, executemany):
+            options = context.execution_options if context is not None else {}
+            timeout = options.get("statement_timeout", default_timeout)
+            conn.info["statement_deadline"] = time.monotonic() + timeout if timeout else None
+
+        @event.listens_for(engine, "checkin")
+        def _clear_statement_deadline(dbapi_connection, connection_record):
+            connection_record.info.pop("statement_deadline", None)
+
+
+def _freeze(value):
+    """JSON lists back to the tuples used as ``table_info`` cache keys."""
+    return tuple(_freeze(item) for item in value) if isinstance(value, list) else value
+
+
+class TShirtSQLDatabase(SQLDatabase):
+    """SQLDatabase that builds ``table_info`` once and reuses it.
+
+    ``SQLDatabase.get_table_info`` renders the CREATE TABLE statements and runs
+    a sample-row SELECT per table on every call. Here the rendered text is
+    cached and only rebuilt when a cheap version probe (column definitions
+    plus table checksums, see ``probe_version``) reports that the tables
+    changed, or when ``refresh_table_info`` is called explicitly.
+
+    When a ``replica_engine`` is given, read-only statements (the generated
+    SELECTs) run on the replica and everything else stays on the primary.
+
+    With a ``snapshot`` (from ``snapshot()``, for the same dialect and
+    tables) nothing is read from the database at construction: the table
+    list, rendered table_info, columns and ENUMs come from the snapshot and
+    the tables are only reflected when something outside it is needed. The
+    snapshot is trusted for ``version_check_interval`` seconds, then
+    verified by the usual version probe.
+    """
+
+    def __init__(self, engine, *args, replica_engine=None, version_check_interval=30, snapshot=None, **kwargs):
+        if snapshot is not None and not self._snapshot_matches(engine, snapshot, kwargs):
+            snapshot = None
+        if snapshot is None:
+            super().__init__(engine, *args, **kwargs)
+        else:
+            self._init_from_snapshot(engine, snapshot, **kwargs)
+        self._replica_engine = replica_engine
+        self.version_check_interval = version_check_interval
+        self._table_info_cache = {}
+        self._enum_cache = {}
+        self._snapshot_columns = None
+        self._schema_version = None
+        self._data_version = None
+        self._checked_at = None
+        self._lock = threading.RLock()
+        if snapshot is not None:
+            self._table_info_cache = {_freeze(key): info for key, info in snapshot["table_info"]}
+            self._enum_cache = snapshot["enums"]
+            self._snapshot_columns = snapshot["columns"]
+            self._schema_version, self._data_version = snapshot["schema_version"], snapshot["data_version"]
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _snapshot_matches(engine, snapshot, kwargs):
+        include_tables = kwargs.get("include_tables")
+        return snapshot.get("dialect") == engine.dialect.name and (
+            not include_tables or set(include_tables) == set(snapshot["usable_tables"])
+        )
+
+    def _init_from_snapshot(self, engine, snapshot, schema=None, metadata=None, ignore_tables=None,
+                            include_tables=None, sample_rows_in_table_info=3, indexes_in_table_info=False,
+                            custom_table_info=None, view_support=False, max_string_length=300,
+                            lazy_table_reflection=False):
+        # Mirrors SQLDatabase.__init__ without inspecting or reflecting the database.
+        self._engine = engine
+        self._schema = schema
+        self._inspector = None
+        self._all_tables = set(snapshot["all_tables"])
+        self._include_tables = set(include_tables) if include_tables else set()
+        self._ignore_tables = set(ignore_tables) if ignore_tables else set()
+        self._usable_tables = set(snapshot["usable_tables"])
+        self._sample_rows_in_table_info = sample_rows_in_table_info
+        self._indexes_in_table_info = indexes_in_table_info
+        self._custom_table_info = custom_table_info
+        self._max_string_length = max_string_length
+        self._view_support = view_support
+        self._metadata = metadata or MetaData()
+
+    def snapshot(self):
+        """Schema info for a startup snapshot: tables, columns, ENUMs, rendered table_info and versions."""
+        self._check_version()
+        self.get_table_info()
+        columns = self.column_names()
+        enums = {table: self.enum_values(table) for table in columns}
+        with self._lock:
+            return {
+                "dialect": self.dialect,
+                "all_tables": sorted(self._all_tables),
+                "usable_tables": sorted(self._usable_tables),
+                "columns": columns,
+                "enums": enums,
+                "table_info": [[key, info] for key, info in self._table_info_cache.items()],
+                "schema_version": self._schema_version,
+                "data_version": self._data_version,
+            }
+
+    def _ensure_reflected(self):
+        with self._lock:
+            if self._inspector is None:
+                self._inspector = inspect(self._engine)
+                self._metadata.reflect(
+                    views=self._view_support,
+                    bind=self._engine,
+                    only=list(self._usable_tables),
+                    schema=self._schema
+                )
+                self._snapshot_columns = None
+
+    @classmethod
+    def from_uri(cls, database_uri, engine_args=None, replica_uri=None, pool_size=5, max_overflow=10,
+                 pool_recycle=1800, pool_pre_ping=True, statement_timeout=None, **kwargs):
+        """Construct the database with pooled primary and optional replica engines."""
+        pool_args = dict(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            statement_timeout=statement_timeout
+        )
+        engine = create_pooled_engine(database_uri, **pool_args, **(engine_args or {}))
+        replica_engine = create_pooled_engine(replica_uri, **pool_args, **(engine_args or {})) if replica_uri else None
+        return cls(engine, replica_engine=replica_engine, **kwargs)
+
+    def pool_status(self):
+        status = {"primary": self._engine.pool.status()}
+        if self._replica_engine is not None:
+            status["replica"] = self._replica_engine.pool.status()
+        return status
+
+    def _execute(self, command, fetch="all", *, parameters=None, execution_options=None):
+        if self._replica_engine is None or not isinstance(command, str) or not is_read_only(command):
+            return super()._execute(command, fetch, parameters=parameters, execution_options=execution_options)
+
+        with self._replica_engine.connect() as connection:
+            cursor = connection.execute(text(command), parameters or {}, execution_options=execution_options or {})
+            if not cursor.returns_rows:
+                return []
+            if fetch == "cursor":
+                return cursor
+            if fetch == "one":
+                first_result = cursor.fetchone()
+                return [] if first_result is None else [first_result._asdict()]
+            return [x._asdict() for x in cursor.fetchall()]
+
+    def stream(self, command, batch_size=1000, parameters=None, execution_options=None):
+        """Yield ``(columns, rows)`` batches of ``command`` from a server-side cursor.
+
+        Rows are fetched ``batch_size`` at a time instead of being buffered
+        client-side; read-only statements use the replica when there is one.
+        An empty result yields one empty batch so the columns are known.
+        """
+        use_replica = self._replica_engine is not None and is_read_only(command)
+        engine = self._replica_engine if use_replica else self._engine
+        with engine.connect() as connection:
+            cursor = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+                text(command), parameters or {}, execution_options=execution_options or {}
+            )
+            columns = list(cursor.keys())
+            empty = True
+            for rows in cursor.partitions(batch_size):
+                empty = False
+                yield columns, rows
+            if empty:
+                yield columns, []
+
+    def fetch_columnar(self, command, max_rows=10000, batch_size=1000, parameters=None, execution_options=None):
+        """Stream ``command`` into a ``ColumnarResult`` of at most ``max_rows`` rows."""
+        builder = None
+        truncated = False
+        with closing(self.stream(command, batch_size, parameters, execution_options)) as batches:
+            for columns, rows in batches:
+                if builder is None:
+                    builder = ColumnarBuilder(columns)
+                room = max_rows - builder.num_rows
+                if len(rows) > room:
+                    builder.add(rows[:room])
+                    truncated = True
+                    break
+                builder.add(rows)
+        return builder.build(truncated=truncated)
+
+    def probe_version(self):
+        """Return ``(schema_version, data_version)`` from cheap catalog and checksum queries.
+
+        The data version comes from ``CHECKSUM TABLE`` rather than
+        ``information_schema.TABLES.UPDATE_TIME``: MySQL 8 caches that column
+        for ``information_schema_stats_expiry`` seconds (a day by default),
+        keeps it to the second and InnoDB resets it to NULL on restart, so it
+        misses writes. The checksum reads every row of the (small) inventory
+        tables; raise ``version_check_interval`` for large ones.
+        """
+        if self.dialect == "sqlite":
+            return self._probe_sqlite_version()
+        tables = sorted(self.get_usable_table_names())
+        schema = self.run(
+            "SELECT TABLE_NAME, GROUP_CONCAT(COLUMN_NAME, ' ', COLUMN_TYPE ORDER BY ORDINAL_POSITION) "
+            "FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({}) "
+            "GROUP BY TABLE_NAME ORDER BY TABLE_NAME".format(", ".join(f"'{table}'" for table in tables)),
+            fetch="cursor"
+        ).fetchall()
+        data = self.run(
+            "CHECKSUM TABLE {}".format(", ".join(f"`{table}`" for table in tables)),
+            fetch="cursor"
+        ).fetchall()
+        return (
+            hashlib.sha256(repr(schema).encode()).hexdigest(),
+            hashlib.sha256(repr(data).encode()).hexdigest()
+        )
+
+    def _probe_sqlite_version(self):
+        # SQLite has no update times; the table DDL gives the schema version and
+        # the database file's mtime/size changes on every committed write.
+        tables = ", ".join(f"'{table}'" for table in sorted(self.get_usable_table_names()))
+        schema = self.run(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name IN ({tables}) ORDER BY name",
+            fetch="cursor"
+        ).fetchall()
+        path = self._engine.url.database
+        data = None
+        if path and path != ":memory:" and os.path.exists(path):
+            stat = os.stat(path)
+            data = (stat.st_mtime_ns, stat.st_size)
+        return (
+            hashlib.sha256(repr(schema).encode()).hexdigest(),
+            hashlib.sha256(repr(data).encode()).hexdigest()
+        )
+
+    def schema_version(self):
+        self._check_version()
+        return self._schema_version
+
+    def data_version(self):
+        self._check_version()
+        return self._data_version
+
+    def get_table_info(self, table_names=None):
+        self._check_version()
+        key = tuple(sorted(table_names)) if table_names else None
+        with self._lock:
+            if key not in self._table_info_cache:
+                self._ensure_reflected()
+                self._table_info_cache[key] = super().get_table_info(table_names)
+            return self._table_info_cache[key]
+
+    def get_compact_table_info(self, columns, sample_rows=0):
+        """``table_info`` for only the given ``{table: [columns]}``.
+
+        ENUM columns list their values inline, which usually makes sample
+        rows unnecessary; ``sample_rows`` adds that many rows of the chosen
+        columns. Cached like ``get_table_info``.
+        """
+        self._check_version()
+        key = ("compact", tuple((table, tuple(names)) for table, names in sorted(columns.items())), sample_rows)
+        with self._lock:
+            if key in self._table_info_cache:
+                return self._table_info_cache[key]
+            self._ensure_reflected()
+            tables = {table.name: table for table in self._metadata.sorted_tables}
+
+        parts = []
+        for table_name, names in sorted(columns.items()):
+            enums = self.enum_values(table_name)
+            selected = [column for column in tables[table_name].columns if column.name in names]
+            lines = []
+            for column in selected:
+                if column.name in enums:
+                    column_type = "ENUM(" + ", ".join("'" + value.replace("'", "''") + "'"
+                                                      for value in enums[column.name]) + ")"
+                else:
+                    column_type = column.type.compile(self._engine.dialect)
+                lines.append(f"\t{column.name} {column_type}")
+            info = f"CREATE TABLE {table_name} (\n" + ",\n".join(lines) + "\n)"
+            if sample_rows:
+                cursor = self.run(
+                    f"SELECT {', '.join(column.name for column in selected)} FROM {table_name} LIMIT {int(sample_rows)}",
+                    fetch="cursor"
+                )
+                rows = "\n".join("\t".join(str(value) for value in row) for row in cursor.fetchall())
+                info += (f"\n\n/*\n{sample_rows} rows from {table_name} table:\n"
+                         + "\t".join(column.name for column in selected) + f"\n{rows}\n*/")
+            parts.append(info)
+
+        table_info = "\n\n".join(parts)
+        with self._lock:
+            self._table_info_cache[key] = table_info
+        return table_info
+
+    def refresh_table_info(self, versions=None):
+        """Re-reflect the tables and drop every cached ``table_info``.
+
+        ``versions`` is a ``probe_version()`` result the caller already has.
+        The catalog is read without holding the lock, which only guards the swap.
+        """
+        inspector = inspect(self._engine)
+        metadata = MetaData()
+        metadata.reflect(
+            views=self._view_support,
+            bind=self._engine,
+            only=list(self._usable_tables),
+            schema=self._schema
+        )
+        schema_version, data_version = versions or self.probe_version()
+        with self._lock:
+            self._inspector = inspector
+            self._snapshot_columns = None
+            self._metadata = metadata
+            self._table_info_cache.clear()
+            self._enum_cache.clear()
+            self._schema_version, self._data_version = schema_version, data_version
+            self._checked_at = time.monotonic()
+
+    def _check_version(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.version_check_interval:
+                return
+            # Claimed before probing, so concurrent callers skip instead of probing too.
+            checked_at, self._checked_at = self._checked_at, now
+        try:
+            schema_version, data_version = self.probe_version()
+        except Exception:
+            with self._lock:
+                if self._checked_at == now:
+                    self._checked_at = checked_at
+            raise
+        with self._lock:
+            schema_changed = self._schema_version is not None and schema_version != self._schema_version
+            if not schema_changed:
+                if data_version != self._data_version:
+                    self._table_info_cache.clear()
+                self._schema_version, self._data_version = schema_version, data_version
+        if schema_changed:
+            self.refresh_table_info((schema_version, data_version))
+
+    def enum_values(self, table):
+        """Return ``{column: [values]}`` for every ENUM column of ``table``.
+
+        On SQLite, where ENUMs are imported as ``CHECK (column IN (...))``
+        constraints, those constraints are read instead. Cached until the
+        schema changes.
+        """
+        self._check_version()
+        with self._lock:
+            if table in self._enum_cache:
+                return self._enum_cache[table]
+        if self.dialect == "sqlite":
+            row = self.run(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table",
+                fetch="cursor",
+                parameters={"table": table}
+            ).fetchone()
+            definitions = re.findall(r"CHECK \((\w+) IN \(([^)]*)\)\)", row[0] if row else "", flags=re.IGNORECASE)
+        else:
+            definitions = self.run(
+                "SELECT COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND DATA_TYPE = 'enum' "
+                "ORDER BY ORDINAL_POSITION",
+                fetch="cursor",
+                parameters={"table": table}
+            ).fetchall()
+        enums = {
+            column: [value.replace("''", "'") for value in re.findall(r"'((?:[^']|'')*)'", column_type)]
+            for column, column_type in definitions
+        }
+        with self._lock:
+            self._enum_cache[table] = enums
+        return enums
+
+    def column_names(self):
+        """Return ``{table: [columns]}`` for the reflected usable tables."""
+        with self._lock:
+            if self._snapshot_columns is not None:
+                return self._snapshot_columns
+            self._ensure_reflected()
+            return {
+                table.name: [column.name for column in table.columns]
+                for table in self._metadata.sorted_tables
+                if table.name in self._usable_tables
+            }
@@ -0,0 +1,182 @@
+import re
+
+TOKEN = re.compile(r"""
+    (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<quoted>`(?:[^`]|``)+`)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<symbol>\S)
+""", re.X | re.S)
+
+FORBIDDEN = {
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "TRUNCATE", "REPLACE", "GRANT", "REVOKE",
+    "CALL", "LOAD", "HANDLER", "LOCK", "UNLOCK", "RENAME", "SET", "INTO", "OUTFILE", "DUMPFILE",
+    "PREPARE", "EXECUTE", "DEALLOCATE", "SHUTDOWN", "KILL", "DO",
+}
+
+KEYWORDS = {
+    "SELECT", "FROM", "WHERE", "AND", "OR", "NOT", "XOR", "IN", "IS", "NULL", "AS", "ON", "USING", "JOIN",
+    "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "NATURAL", "STRAIGHT_JOIN", "LATERAL", "GROUP", "BY",
+    "ORDER", "HAVING", "LIMIT", "OFFSET", "DISTINCT", "DISTINCTROW", "ALL", "ANY", "SOME", "ASC", "DESC",
+    "CASE", "WHEN", "THEN", "ELSE", "END", "BETWEEN", "LIKE", "ESCAPE", "REGEXP", "RLIKE", "UNION",
+    "INTERSECT", "EXCEPT", "EXISTS", "WITH", "RECURSIVE", "ROLLUP", "INTERVAL", "DIV", "MOD", "TRUE",
+    "FALSE", "UNKNOWN", "COLLATE", "BINARY", "SEPARATOR", "OVER", "PARTITION", "WINDOW", "ROWS", "RANGE",
+    "PRECEDING", "FOLLOWING", "CURRENT", "ROW", "UNBOUNDED", "CURRENT_DATE", "CURRENT_TIME",
+    "CURRENT_TIMESTAMP", "LOCALTIME", "LOCALTIMESTAMP", "MICROSECOND", "SECOND", "MINUTE", "HOUR", "DAY",
+    "WEEK", "MONTH", "QUARTER", "YEAR", "SIGNED", "UNSIGNED", "INTEGER", "INT", "DECIMAL", "CHAR",
+    "DATE", "DATETIME", "TIME", "FLOAT", "DOUBLE", "REAL", "JSON", "FOR", "SHARE", "NULLS", "FIRST", "LAST",
+}
+
+CLAUSE_ENDS = {"WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "UNION", "INTERSECT", "EXCEPT", "ON", "USING", "WINDOW"}
+
+
+def _tokenize(sql):
+    tokens = []
+    for match in TOKEN.finditer(sql):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "comment":
+            if value.startswith("/*!") or value.startswith("/*+"):
+                tokens.append(("symbol", value))
+            continue
+        if kind == "quoted":
+            value = value[1:-1].replace("``", "`")
+        tokens.append((kind, value))
+    return tokens
+
+
+def _is_name(token):
+    kind, value = token
+    return kind == "quoted" or (kind == "word" and value.upper() not in KEYWORDS and value.upper() not in FORBIDDEN)
+
+
+def is_read_only(sql):
+    """True for a single SELECT/WITH statement without writes, locks or INTO."""
+    tokens = _tokenize(sql.strip())
+    while tokens and tokens[-1] == ("symbol", ";"):
+        tokens.pop()
+    if not tokens or ("symbol", ";") in tokens:
+        return False
+    first = next((value.upper() for kind, value in tokens if kind != "symbol" or value != "("), "")
+    if first not in ("SELECT", "WITH"):
+        return False
+    for i, (kind, value) in enumerate(tokens):
+        followed_by_paren = i + 1 < len(tokens) and tokens[i + 1] == ("symbol", "(")
+        if kind == "word" and value.upper() in FORBIDDEN and not followed_by_paren:
+            return False
+        if kind == "symbol" and value.startswith("/*"):
+            return False
+    return True
+
+
+class LocalSQLValidator:
+    """Validate generated SQL without an LLM round trip.
+
+    ``validate`` returns a list of problems (empty when the statement looks
+    fine): more than one statement, anything but a read-only SELECT/WITH,
+    tables outside the database's usable tables, or identifiers that are not
+    a known column, table or alias. With ``use_explain`` the statement is
+    also dry-run through ``EXPLAIN`` so the database's own parser has the
+    last word.
+    """
+
+    def __init__(self, db, use_explain=False):
+        self.db = db
+        self.use_explain = use_explain
+
+    def validate(self, sql, check_columns=True):
+        tokens = _tokenize(sql.strip())
+        while tokens and tokens[-1] == ("symbol", ";"):
+            tokens.pop()
+        if not tokens:
+            return ["empty statement"]
+
+        errors = []
+        if ("symbol", ";") in tokens:
+            errors.append("multiple statements are not allowed")
+        if any(kind == "symbol" and value.startswith("/*") for kind, value in tokens):
+            errors.append("executable comments are not allowed")
+        first = next((value.upper() for kind, value in tokens if kind != "symbol" or value != "("), "")
+        if first not in ("SELECT", "WITH"):
+            errors.append(f"only SELECT statements are allowed, got {first or 'nothing'}")
+        for i, (kind, value) in enumerate(tokens):
+            followed_by_paren = i + 1 < len(tokens) and tokens[i + 1] == ("symbol", "(")
+            if kind == "word" and value.upper() in FORBIDDEN and not followed_by_paren:
+                errors.append(f"forbidden keyword {value.upper()}")
+        if errors:
+            return errors
+
+        columns = self.db.column_names()
+        tables = {table.lower() for table in columns}
+        referenced, aliases = self._collect_names(tokens)
+
+        for name in referenced:
+            if name.lower() not in tables and name.lower() not in aliases:
+                errors.append(f"unknown table {name}")
+        if check_columns and not errors:
+            errors.extend(self._check_identifiers(tokens, columns, aliases))
+        if self.use_explain and not errors:
+            errors.extend(self._explain(sql))
+        return errors
+
+    def _collect_names(self, tokens):
+        """Return (tables referenced in FROM/JOIN, lower-cased aliases and CTE names)."""
+        referenced, aliases = [], set()
+        in_from = False
+        for i, (kind, value) in enumerate(tokens):
+            upper = value.upper() if kind == "word" else value
+            prev = tokens[i - 1] if i else None
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+
+            if kind == "word" and upper in ("FROM", "JOIN"):
+                in_from = True
+            elif kind == "word" and (upper in CLAUSE_ENDS or upper == "SELECT"):
+                in_from = False
+
+            if not _is_name((kind, value)):
+                continue
+            if prev is not None and prev[0] == "word" and prev[1].upper() == "AS":
+                aliases.add(value.lower())
+            elif nxt is not None and nxt[0] == "word" and nxt[1].upper() == "AS" \
+                    and i + 2 < len(tokens) and tokens[i + 2] == ("symbol", "("):
+                aliases.add(value.lower())  # WITH name AS (...)
+            elif prev is not None and (prev[0] == "word" and prev[1].upper() in ("FROM", "JOIN")
+                                       or in_from and prev == ("symbol", ",")):
+                if nxt != ("symbol", "("):
+                    referenced.append(value)
+            elif prev is not None and (_is_name(prev) or prev == ("symbol", ")")):
+                aliases.add(value.lower())  # implicit alias: "t_shirts t", ") a", "SUM(x) total"
+        return referenced, aliases
+
+    @staticmethod
+    def _check_identifiers(tokens, columns, aliases):
+        tables = {table.lower(): {column.lower() for column in names} for table, names in columns.items()}
+        known_columns = set().union(*tables.values()) if tables else set()
+        errors = []
+        for i, token in enumerate(tokens):
+            if not _is_name(token):
+                continue
+            name = token[1].lower()
+            prev = tokens[i - 1] if i else None
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+            if token[0] == "word" and nxt == ("symbol", "("):
+                continue  # function call
+            if nxt == ("symbol", "."):
+                if name not in tables and name not in aliases:
+                    errors.append(f"unknown table or alias {token[1]}")
+            elif prev == ("symbol", ".") and i >= 2:
+                qualifier = tokens[i - 2][1].lower()
+                allowed = tables[qualifier] if qualifier in tables else known_columns | aliases
+                if name not in allowed:
+                    errors.append(f"unknown column {token[1]}")
+            elif name not in known_columns and name not in tables and name not in aliases:
+                errors.append(f"unknown column {token[1]}")
+        return errors
+
+    def _explain(self, sql):
+        try:
+            self.db.run(f"EXPLAIN {sql.strip().rstrip(';')}", fetch="cursor").fetchall()
+            return []
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
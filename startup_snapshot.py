@@ -0,0 +1,64 @@
+"""Startup snapshot for TShirtQueryHelper.
+
+    python startup_snapshot.py .startup_snapshot.npz
+
+builds and warms a helper, then saves what a new worker would otherwise
+fetch over the network before it can serve: the database's schema info
+(table list, columns, ENUM values, rendered table_info for the prompts)
+and the few-shot example vectors. Point ``STARTUP_SNAPSHOT`` at the file
+(e.g. baked into the image) and workers start from it; anything that no
+longer matches (other tables, dialect, embedding model or few-shots) is
+ignored and loaded the normal way.
+"""
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(path, schema, few_shots=None):
+    """Write ``schema`` (``TShirtSQLDatabase.snapshot()``) and ``{"collection", "ids", "vectors"}``."""
+    meta = {"version": SNAPSHOT_VERSION, "schema": schema}
+    arrays = {}
+    if few_shots is not None:
+        meta["few_shots"] = {"collection": few_shots["collection"], "ids": list(few_shots["ids"])}
+        arrays["vectors"] = np.asarray(few_shots["vectors"], dtype=np.float32)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, meta=np.asarray(json.dumps(meta, default=str)), **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_snapshot(path):
+    """The saved snapshot as a dict, or None when ``path`` is unset, missing or from another version."""
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != SNAPSHOT_VERSION:
+            return None
+        if "few_shots" in meta:
+            meta["few_shots"]["vectors"] = data["vectors"]
+    return meta
+
+
+def main(argv=None):
+    import argparse
+    from langchain_helper import TShirtQueryHelper
+    parser = argparse.ArgumentParser(description="Save a startup snapshot for TShirtQueryHelper workers")
+    parser.add_argument("path", nargs="?", default=os.getenv("STARTUP_SNAPSHOT", ".startup_snapshot.npz"))
+    args = parser.parse_args(argv)
+    helper = TShirtQueryHelper(snapshot_path="")
+    helper.save_startup_snapshot(args.path)
+    print(f"Saved startup snapshot to {args.path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
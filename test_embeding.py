@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 from few_shots import few_shots
 
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from fewshot_store import load_few_shot_vectorstore
 from langchain.prompts import SemanticSimilarityExampleSelector, FewShotPromptTemplate, PromptTemplate
 from langchain.chains.sql_database.prompt import PROMPT_SUFFIX
 from langchain_community.utilities import SQLDatabase
@@ -19,9 +19,7 @@ if not os.getenv("GOOGLE_API_KEY"):
 
 embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
 
-to_vectorize = [" ".join(example.values()) for example in few_shots]
-
-vectorstore = Chroma.from_texts(to_vectorize, embeddings, metadatas=few_shots)
+vectorstore = load_few_shot_vectorstore(embeddings, few_shots)
 
 example_selector = SemanticSimilarityExampleSelector(
     vectorstore=vectorstore,
@@ -0,0 +1,56 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+# The querywebsite modules use flat imports; after the root, so the root's main.py wins.
+sys.path.append(os.path.join(ROOT_DIR, "querywebsite"))
+
+from embedded_db import import_mysql_dump, sqlite_uri  # noqa: E402
+from sql_database import TShirtSQLDatabase  # noqa: E402
+
+INVENTORY_TABLES = ["t_shirts", "discounts"]
+PRICE_QUESTION = "What is the price of a Nike XS white t-shirt?"
+PRICE_SQL = "SELECT price FROM t_shirts WHERE brand = 'Nike' AND color = 'White' AND size = 'XS'"
+LIST_QUESTION = "Which Nike t-shirts do we have?"
+LIST_SQL = "SELECT color, size FROM t_shirts WHERE brand = 'Nike'"
+# Reference SQL for questions outside few_shots, answered by the oracle LLM.
+EXTRA_SQL = {PRICE_QUESTION: PRICE_SQL, LIST_QUESTION: LIST_SQL}
+
+
+@pytest.fixture(scope="session")
+def dataset_path(tmp_path_factory):
+    return import_mysql_dump(str(tmp_path_factory.mktemp("dataset") / "atliq_tshirts.db"))
+
+
+@pytest.fixture
+def db_path(dataset_path, tmp_path):
+    """A private copy of the imported dump, so tests may write to it."""
+    path = str(tmp_path / "atliq_tshirts.db")
+    shutil.copy(dataset_path, path)
+    return path
+
+
+@pytest.fixture
+def db(db_path):
+    return TShirtSQLDatabase.from_uri(sqlite_uri(db_path), sample_rows_in_table_info=3,
+                                      include_tables=INVENTORY_TABLES, version_check_interval=0)
+
+
+@pytest.fixture
+def helper(db, tmp_path, monkeypatch):
+    """TShirtQueryHelper over ``db`` with the benchmark's oracle LLM and fake embeddings."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from benchmark import OracleLLM, load_corpus
+    from langchain_helper import TShirtQueryHelper
+
+    monkeypatch.setenv("FEW_SHOT_STORE_DIR", str(tmp_path / "few_shots"))
+    sql_by_question = {item["question"]: item["sql"] for item in load_corpus()}
+    sql_by_question.update(EXTRA_SQL)
+    helper = TShirtQueryHelper(llm=OracleLLM(sql_by_question=sql_by_question), answer_mode="sql",
+                               embeddings=DeterministicFakeEmbedding(size=64), db=db, metrics_sinks=[])
+    helper.chain.verbose = False
+    return helper
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("faiss")
+
+from langchain_community.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from ann_index import choose_index_type, index_kind  # noqa: E402
+from index_store import IndexStore  # noqa: E402
+
+
+def chunks(source, count):
+    return (Document(page_content=f"{source} chunk {i}", metadata={"source": source}) for i in range(count))
+
+
+@pytest.fixture
+def embeddings():
+    return DeterministicFakeEmbedding(size=16)
+
+
+def test_first_build_creates_the_chosen_type_directly(tmp_path, embeddings, monkeypatch):
+    # Regression: the first build used to go through an in-memory flat index.
+    monkeypatch.setattr(FAISS, "from_embeddings", None)
+    store = IndexStore(embeddings, str(tmp_path), index_type="ivf")
+    index, _ = store.update("docs", chunks("a", 200))
+    assert index_kind(index.index) == "ivf"
+    assert store.load("docs").similarity_search("a chunk 7", k=1)[0].page_content == "a chunk 7"
+
+
+def test_auto_index_type_follows_size_and_memory_budget():
+    assert choose_index_type(1000, 768) == "flat"
+    assert choose_index_type(100000, 768, memory_budget_mb=1024) == "hnsw"
+    assert choose_index_type(100000, 768, memory_budget_mb=100) == "ivfpq"
+    assert choose_index_type(50, 768, requested="ivf") == "flat"
+
+
+def test_mmap_load(tmp_path, embeddings):
+    store = IndexStore(embeddings, str(tmp_path))
+    store.update("docs", chunks("a", 10))
+    index = store.load("docs", mmap=True)
+    assert index.similarity_search("a chunk 3", k=1)[0].page_content == "a chunk 3"
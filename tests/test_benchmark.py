@@ -0,0 +1,39 @@
+import benchmark
+from benchmark import load_corpus
+
+
+def test_benchmark_measures_each_concurrency_level_on_a_fresh_helper(tmp_path, dataset_path, monkeypatch):
+    monkeypatch.setenv("FEW_SHOT_STORE_DIR", str(tmp_path / "few_shots"))
+    helpers = []
+    cached_before_batch = []
+    build_helper = benchmark.build_helper
+
+    def recording_build_helper(args, corpus):
+        built = build_helper(args, corpus)
+        helper = built[0]
+        batch = helper.query_tshirt_inventory_batch
+
+        def recording_batch(questions, **kwargs):
+            cached_before_batch.append((helper, len(helper.sql_cache)))
+            return batch(questions, **kwargs)
+
+        helper.query_tshirt_inventory_batch = recording_batch
+        helpers.append(helper)
+        return built
+
+    monkeypatch.setattr(benchmark, "build_helper", recording_build_helper)
+    report = benchmark.main(["--db-path", dataset_path, "--no-fast-path", "--answer-mode", "llm",
+                             "--concurrency", "1", "2", "--repeat", "3", "--output", str(tmp_path / "report.json")])
+    assert report["accuracy"]["exact_match"] == 1.0
+    assert "answer_generation" in report["latency"]
+    assert all(question["answer_text"] is not None for question in report["questions"])
+
+    questions = len(load_corpus())
+    # One helper for the accuracy pass and one per concurrency level.
+    assert len(helpers) == 3 and len(set(map(id, helpers))) == 3
+    # Every level's cold pass starts with an empty SQL cache; its warm pass reuses what the cold pass cached.
+    assert cached_before_batch == [(helpers[1], 0), (helpers[1], questions), (helpers[2], 0), (helpers[2], questions)]
+    assert [level["concurrency"] for level in report["throughput"]] == [1, 2]
+    for level in report["throughput"]:
+        assert (level["cold"]["questions"], level["warm"]["questions"]) == (questions, 2 * questions)
+        assert level["cold"]["errors"] == level["warm"]["errors"] == 0
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+import numpy as np
+
+from columnar import ColumnarBuilder
+from conftest import LIST_QUESTION, LIST_SQL
+
+
+def test_columns_get_typed_arrays():
+    builder = ColumnarBuilder(["id", "price", "brand", "discount"])
+    builder.add([(1, Decimal("9.50"), "Nike", None), (2, Decimal("12"), "Levi", 10)])
+    builder.add([(3, Decimal("7.25"), "Adidas", Decimal("5.5"))])
+    table = builder.build()
+    assert [table[column].dtype.kind for column in table.columns] == ["i", "f", "O", "f"]
+    assert table["price"].tolist() == [9.5, 12.0, 7.25]
+    assert np.isnan(table["discount"][0])
+    assert table.to_dict()["discount"] == [None, 10.0, 5.5]
+    assert table.rows(1)[0][:3] == (1, 9.5, "Nike")
+
+
+def test_stream_yields_batches_of_batch_size(db):
+    batches = [len(rows) for _, rows in db.stream("SELECT t_shirt_id FROM t_shirts", batch_size=30)]
+    total = db.run("SELECT COUNT(*) FROM t_shirts", fetch="cursor").fetchone()[0]
+    assert batches[:-1] == [30] * (len(batches) - 1)
+    assert sum(batches) == total
+
+
+def test_fetch_columnar_caps_the_rows(db):
+    table = db.fetch_columnar("SELECT t_shirt_id FROM t_shirts", max_rows=7, batch_size=3)
+    assert (len(table), table.truncated) == (7, True)
+    assert not db.fetch_columnar("SELECT t_shirt_id FROM t_shirts WHERE t_shirt_id <= 7", max_rows=7).truncated
+
+
+def test_table_api_limits_generated_sql_one_past_the_cap(helper, db):
+    expected = len(db.run(LIST_SQL, fetch="cursor").fetchall())
+    result = helper.query_tshirt_inventory_table(LIST_QUESTION, max_rows=5, batch_size=2)
+    assert result["source"] == "llm"
+    assert result["sql"].rstrip().rstrip(";").endswith("LIMIT 6")
+    assert (len(result["table"]), result["table"].truncated) == (5, True)
+
+    result = helper.query_tshirt_inventory_table(LIST_QUESTION, max_rows=expected)
+    assert (len(result["table"]), result["table"].truncated) == (expected, False)
+    assert result["table"].columns == ["color", "size"]
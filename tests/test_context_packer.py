@@ -0,0 +1,74 @@
+from langchain_core.documents import Document
+
+from context_packer import ContextPacker, containment, shingles, text_overlap
+
+TEXT = " ".join(f"word{i}" for i in range(300))
+
+
+class WordCounter:
+    def count(self, text):
+        return len(text.split())
+
+
+def chunk(start, end, source="a.pdf", with_index=True):
+    text = TEXT[start:end]
+    metadata = {"source": source}
+    if with_index:
+        metadata["start_index"] = start
+    return Document(page_content=text, metadata=metadata)
+
+
+def packer(budget=10000):
+    return ContextPacker(budget, counter=WordCounter())
+
+
+def test_text_overlap_needs_a_real_overlap():
+    assert text_overlap("abc " + "x" * 30, "x" * 30 + " def") == 30
+    assert text_overlap("abc", "abd") == 0
+
+
+def test_containment():
+    assert containment(shingles("a b c d"), shingles("a b c d e")) == 1.0
+    assert containment(shingles("a b c d"), shingles("x y z")) == 0.0
+
+
+def test_overlapping_chunks_are_merged_once():
+    context, docs, stats = packer().pack([(chunk(0, 500), 0.9), (chunk(400, 900), 0.8)])
+    assert context == TEXT[0:900]
+    assert len(docs) == 2
+    assert stats["merged"] == 1
+
+
+def test_overlapping_chunks_without_start_index_are_merged_by_text():
+    context, _, stats = packer().pack([(chunk(0, 500, with_index=False), 0.9),
+                                       (chunk(400, 900, with_index=False), 0.8)])
+    assert context == TEXT[0:900]
+    assert stats["merged"] == 1
+
+
+def test_chunks_of_other_sources_are_not_merged():
+    context, _, stats = packer().pack([(chunk(0, 500), 0.9), (chunk(400, 900, source="b.pdf"), 0.8)])
+    assert stats["merged"] == 0
+    assert context == TEXT[0:500] + "\n\n" + TEXT[400:900]
+
+
+def test_a_bridging_chunk_joins_two_segments():
+    _, docs, stats = packer().pack([(chunk(0, 500), 0.9), (chunk(800, 1300), 0.8), (chunk(400, 900), 0.7)])
+    assert len(docs) == 3
+    assert stats["merged"] == 2
+
+
+def test_near_duplicates_are_skipped():
+    copy = Document(page_content=TEXT[0:500], metadata={"source": "copy.pdf"})
+    _, docs, stats = packer().pack([(chunk(0, 500), 0.9), (copy, 0.8)])
+    assert len(docs) == 1
+    assert stats["duplicates"] == 1
+
+
+def test_budget_is_respected_best_score_first():
+    low, high = chunk(1000, 1500), chunk(2000, 2500)
+    budget = WordCounter().count(high.page_content)
+    context, docs, stats = packer(budget).pack([(low, 0.1), (high, 0.9)])
+    assert docs == [high]
+    assert stats["over_budget"] == 1
+    assert stats["tokens"] <= budget
@@ -0,0 +1,78 @@
+import pytest
+
+from cost_guard import CostLimitExceeded, SQLCostGuard, add_limit, count_joins
+
+
+def test_add_limit_only_limits_the_outer_statement():
+    assert add_limit("SELECT * FROM t_shirts;", 10) == "SELECT * FROM t_shirts LIMIT 10"
+    assert add_limit("SELECT * FROM t_shirts LIMIT 5", 10) == "SELECT * FROM t_shirts LIMIT 5"
+    sql = "SELECT * FROM (SELECT * FROM t_shirts LIMIT 5) a"
+    assert add_limit(sql, 10) == sql + " LIMIT 10"
+
+
+def test_count_joins_counts_join_keywords_and_from_lists():
+    assert count_joins("SELECT 1 FROM t_shirts") == 0
+    assert count_joins("SELECT 1 FROM t_shirts t JOIN discounts d ON t.t_shirt_id = d.t_shirt_id") == 1
+    assert count_joins("SELECT 1 FROM t_shirts a, t_shirts b, discounts c") == 2
+    assert count_joins("SELECT COUNT(*), MAX(price) FROM t_shirts") == 0
+
+
+def test_check_appends_default_limit(db):
+    guard = SQLCostGuard(db, default_limit=100)
+    assert guard.check("SELECT brand FROM t_shirts") == "SELECT brand FROM t_shirts LIMIT 100"
+
+
+def test_check_rejects_too_many_joins(db):
+    guard = SQLCostGuard(db, max_joins=1)
+    with pytest.raises(CostLimitExceeded) as excinfo:
+        guard.check("SELECT 1 FROM t_shirts a, t_shirts b, t_shirts c")
+    assert excinfo.value.violations[0]["rule"] == "joins"
+    assert "cheaper query" in excinfo.value.feedback()
+
+
+def test_check_rejects_full_scans_of_large_tables(db):
+    guard = SQLCostGuard(db, max_full_scan_rows=10)
+    with pytest.raises(CostLimitExceeded) as excinfo:
+        guard.check("SELECT SUM(stock_quantity) FROM t_shirts")
+    assert {"rule": "full_scan_rows", "table": "t_shirts", "actual": 80, "limit": 10} in excinfo.value.violations
+
+
+def test_estimate_multiplies_rows_of_a_cross_join(db):
+    estimate = SQLCostGuard(db).estimate("SELECT 1 FROM t_shirts a, t_shirts b")
+    assert estimate["joins"] == 1
+    assert estimate["estimated_rows"] == 80 * 80
+
+
+def test_timeout_error_is_reported_as_cost_limit(db):
+    guard = SQLCostGuard(db, statement_timeout=2)
+    error = guard.timeout_error("SELECT 1", RuntimeError("interrupted"))
+    assert isinstance(error, CostLimitExceeded)
+    assert guard.timeout_error("SELECT 1", RuntimeError("syntax error")) is None
+
+
+def test_check_without_explain_reads_no_plan(db, monkeypatch):
+    guard = SQLCostGuard(db, max_full_scan_rows=10, max_joins=0, use_explain=False)
+    monkeypatch.setattr(guard, "estimate", None)
+    assert guard.check("SELECT * FROM t_shirts") == "SELECT * FROM t_shirts LIMIT 1000"
+    with pytest.raises(CostLimitExceeded) as raised:
+        guard.check("SELECT 1 FROM t_shirts t JOIN discounts d ON t.t_shirt_id = d.t_shirt_id")
+    assert [violation["rule"] for violation in raised.value.violations] == ["joins"]
+
+
+def test_helper_passes_use_explain_to_the_guard(helper, db):
+    from langchain_helper import TShirtQueryHelper
+    assert helper.cost_guard.use_explain
+    assert not TShirtQueryHelper(db=db, use_explain=False, metrics_sinks=[]).cost_guard.use_explain
+
+
+def test_cached_sql_runs_with_the_statement_timeout(helper):
+    # Regression: SQL replayed from the cache used to run without the guard's timeout.
+    question = "How many numbers are there?"
+    slow_sql = ("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000000) "
+                "SELECT COUNT(*) FROM n")
+    helper.cost_guard.statement_timeout = 0.2
+    helper.sql_cache.check_schema()
+    helper.sql_cache.store(question, slow_sql, top_k=1)
+    with pytest.raises(CostLimitExceeded) as raised:
+        helper.query_tshirt_inventory_rows(question)
+    assert raised.value.violations[0]["rule"] == "execution_seconds"
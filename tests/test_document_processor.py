@@ -0,0 +1,91 @@
+import functools
+import http.server
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("pypdf")
+
+from document_processor import DocumentProcessor, bounded_map  # noqa: E402
+
+PAGE = "<html><body><h1>Inventory</h1><p>Nike white XS t-shirts are restocked every Monday.</p></body></html>"
+
+
+def write_pdf(path, text):
+    """One-page PDF showing ``text``, written by hand so the test needs no PDF library."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(body)
+    return str(path)
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / "page.html").write_text(PAGE)
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_url_is_fetched_and_split(site, monkeypatch):
+    pytest.importorskip("unstructured")
+    # unstructured classifies the page text with this spaCy model and downloads it on first use.
+    pytest.importorskip("en_core_web_sm")
+    # unstructured refuses loopback and private addresses unless allowed.
+    monkeypatch.setenv("UNSTRUCTURED_ALLOW_PRIVATE_URL", "1")
+    processor = DocumentProcessor(max_url_workers=2)
+    documents = processor.load_urls([f"{site}/page.html"])
+    assert len(documents) == 1
+    assert "restocked every Monday" in documents[0].page_content
+    assert documents[0].metadata["source"] == f"{site}/page.html"
+    chunks = list(processor.iter_chunks(documents))
+    assert chunks and all("start_index" in chunk.metadata for chunk in chunks)
+
+
+def test_pdfs_are_parsed_in_the_process_pool(tmp_path):
+    paths = [write_pdf(tmp_path / f"{i}.pdf", f"Price list number {i}") for i in range(3)]
+    names = [f"upload-{i}.pdf" for i in range(3)]
+    documents = DocumentProcessor(max_workers=2).load_pdfs(paths, names)
+    by_source = {document.metadata["source"]: document.page_content for document in documents}
+    assert by_source == {name: f"Price list number {i}" for i, name in enumerate(names)}
+
+
+def test_bounded_map_keeps_at_most_limit_calls_in_flight():
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def work(value):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threading.Event().wait(0.01)
+        with lock:
+            running[0] -= 1
+        return value * 2
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(bounded_map(executor, work, ((i,) for i in range(20)), 3))
+    assert sorted(results) == [i * 2 for i in range(20)]
+    assert peak[0] <= 3
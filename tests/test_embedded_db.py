@@ -0,0 +1,34 @@
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from embedded_db import ensure_embedded_database, import_mysql_dump
+
+
+def test_import_builds_every_combination(dataset_path):
+    connection = sqlite3.connect(dataset_path)
+    assert connection.execute("SELECT COUNT(*) FROM t_shirts").fetchone()[0] == 4 * 4 * 5
+    assert connection.execute("SELECT COUNT(DISTINCT brand || color || size) FROM t_shirts").fetchone()[0] == 80
+    assert connection.execute("SELECT COUNT(*) FROM discounts").fetchone()[0] > 0
+
+
+def test_import_is_reproducible(tmp_path, dataset_path):
+    path = import_mysql_dump(str(tmp_path / "again.db"))
+    query = "SELECT brand, color, size, price, stock_quantity FROM t_shirts ORDER BY t_shirt_id"
+    assert sqlite3.connect(path).execute(query).fetchall() == sqlite3.connect(dataset_path).execute(query).fetchall()
+
+
+def test_concurrent_workers_import_once(tmp_path):
+    # Regression: workers used to write the same "<db>.tmp" file at once.
+    path = str(tmp_path / "shared" / "atliq_tshirts.db")
+    with ProcessPoolExecutor(4) as executor:
+        assert set(executor.map(ensure_embedded_database, [path] * 4)) == {path}
+    assert sorted(os.listdir(os.path.dirname(path))) == ["atliq_tshirts.db", "atliq_tshirts.db.lock"]
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM t_shirts").fetchone()[0] == 80
+
+
+def test_existing_database_is_not_rebuilt(tmp_path):
+    path = ensure_embedded_database(str(tmp_path / "atliq_tshirts.db"))
+    mtime = os.path.getmtime(path)
+    ensure_embedded_database(path)
+    assert os.path.getmtime(path) == mtime
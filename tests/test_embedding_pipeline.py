@@ -0,0 +1,34 @@
+import pytest
+
+from embedding_pipeline import BatchEmbedder
+
+
+class FlakyEmbeddings:
+    def __init__(self, failures, error="429 resource exhausted"):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError(self.error)
+        return [[float(len(text))] for text in texts]
+
+
+def test_map_keeps_input_order():
+    embedder = BatchEmbedder(FlakyEmbeddings(0), max_concurrency=3)
+    batches = [(i, ["x" * i]) for i in range(1, 10)]
+    assert [(payload, vectors[0][0]) for payload, vectors in embedder.map(batches)] == [(i, i) for i in range(1, 10)]
+
+
+def test_rate_limits_are_retried():
+    embedder = BatchEmbedder(FlakyEmbeddings(2), max_concurrency=1, base_delay=0.001)
+    assert embedder.embed(["ab"]) == [[2.0]]
+    assert embedder.retries == 2
+
+
+def test_other_errors_are_raised():
+    embedder = BatchEmbedder(FlakyEmbeddings(1, error="bad request"), max_concurrency=1, base_delay=0.001)
+    with pytest.raises(RuntimeError, match="bad request"):
+        embedder.embed(["ab"])
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from example_selector import NumpyExampleSelector, question_text
+from few_shots import few_shots
+
+
+class UnitEmbeddings(DeterministicFakeEmbedding):
+    """Normalized fake vectors, so Chroma's L2 ranking equals cosine ranking."""
+
+    queries: int = 0
+
+    def embed_documents(self, texts):
+        return [self._unit(vector) for vector in super().embed_documents(texts)]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self._unit(super().embed_query(text))
+
+    @staticmethod
+    def _unit(vector):
+        return (np.asarray(vector) / np.linalg.norm(vector)).tolist()
+
+
+QUESTIONS = [example["Question"] for example in few_shots] + ["How many Adidas t-shirts are left?"]
+
+
+def test_question_text_drops_the_chain_suffix():
+    assert question_text({"input": "How many?\nSQLQuery:"}) == "How many?"
+    assert question_text({"query": "How many?"}) == "How many?"
+
+
+def test_selects_the_same_examples_as_chroma(tmp_path):
+    pytest.importorskip("chromadb")
+    from langchain.prompts import SemanticSimilarityExampleSelector
+    from fewshot_store import load_few_shot_vectorstore
+
+    embeddings = UnitEmbeddings(size=32)
+    chroma = SemanticSimilarityExampleSelector(
+        vectorstore=load_few_shot_vectorstore(embeddings, few_shots, persist_directory=str(tmp_path)), k=2)
+    selector = NumpyExampleSelector(embeddings, few_shots, k=2)
+    for question in QUESTIONS:
+        expected = [example["Question"] for example in chroma.select_examples({"input": question})]
+        assert [example["Question"] for example in selector.select_examples({"input": question})] == expected
+
+
+def test_query_embeddings_are_memoized():
+    embeddings = UnitEmbeddings(size=32)
+    selector = NumpyExampleSelector(embeddings, few_shots, k=2, cache_size=2)
+    first = selector.select_examples({"input": QUESTIONS[0] + "\nSQLQuery:"})
+    assert selector.select_examples({"input": QUESTIONS[0]}) == first
+    assert embeddings.queries == 1
+
+    selector.select_examples({"input": QUESTIONS[1]})
+    selector.select_examples({"input": QUESTIONS[2]})
+    selector.select_examples({"input": QUESTIONS[0]})
+    # The cache holds two questions, so the first one was evicted and embedded again.
+    assert embeddings.queries == 4
+
+
+def test_mmr_returns_k_distinct_examples_best_match_first():
+    embeddings = UnitEmbeddings(size=32)
+    plain = NumpyExampleSelector(embeddings, few_shots, k=3)
+    mmr = NumpyExampleSelector(embeddings, few_shots, k=3, use_mmr=True)
+    for question in QUESTIONS:
+        selected = [example["Question"] for example in mmr.select_examples({"input": question})]
+        assert len(set(selected)) == 3
+        assert selected[0] == plain.select_examples({"input": question})[0]["Question"]
+
+
+def test_added_example_can_be_selected():
+    embeddings = UnitEmbeddings(size=32)
+    selector = NumpyExampleSelector(embeddings, few_shots[:2], k=1)
+    example = {"Question": "Which brand is cheapest?", "SQLQuery": "SELECT brand FROM t_shirts ORDER BY price LIMIT 1",
+               "SQLResult": "Result of the SQL query", "Answer": "Levi"}
+    selector.add_example(example)
+    assert selector.select_examples({"input": " ".join(example.values())}) == [example]
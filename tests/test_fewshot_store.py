@@ -0,0 +1,59 @@
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from fewshot_store import few_shot_collection, load_few_shot_vectors
+
+
+class NamedEmbeddings:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        # Like LocalEmbeddings before the fix: a loaded model object next to its name.
+        self.model = object()
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_collection_is_keyed_by_model_name():
+    assert few_shot_collection(NamedEmbeddings("a")) == few_shot_collection(NamedEmbeddings("a"))
+    assert few_shot_collection(NamedEmbeddings("a")) != few_shot_collection(NamedEmbeddings("b"))
+
+
+def test_vectors_are_embedded_once_and_written_atomically(tmp_path):
+    embeddings = CountingEmbeddings(size=8)
+    examples = [{"Question": "q1", "SQLQuery": "SELECT 1"}, {"Question": "q2", "SQLQuery": "SELECT 2"}]
+    first = load_few_shot_vectors(embeddings, examples, persist_directory=str(tmp_path))
+    second = load_few_shot_vectors(embeddings, examples, persist_directory=str(tmp_path))
+    assert embeddings.calls == 2
+    assert np.array_equal(first, second)
+    assert os.listdir(tmp_path) == [few_shot_collection(embeddings) + ".npz"]
+
+
+def test_concurrent_writers_leave_one_complete_file(tmp_path):
+    examples = [{"Question": f"q{i}", "SQLQuery": f"SELECT {i}"} for i in range(50)]
+    errors = []
+
+    def load():
+        try:
+            load_few_shot_vectors(CountingEmbeddings(size=8), examples, persist_directory=str(tmp_path))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(os.listdir(tmp_path)) == 1
+    embeddings = CountingEmbeddings(size=8)
+    assert load_few_shot_vectors(embeddings, examples, persist_directory=str(tmp_path)).shape == (50, 8)
+    assert embeddings.calls == 0
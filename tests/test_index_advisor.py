@@ -0,0 +1,61 @@
+from conftest import LIST_QUESTION, LIST_SQL, PRICE_QUESTION, PRICE_SQL
+from index_advisor import IndexAdvisor, column_usage, load_workload, query_shape
+from metrics import QueryMetrics, SQLWorkloadLog
+
+STOCK_QUESTION = "How many t-shirts do we have left for Nike in XS size and white color?"
+LOW_STOCK_SQL = "SELECT brand, color, size FROM t_shirts WHERE stock_quantity < 10"
+JOIN_SQL = ("SELECT SUM(t.price * t.stock_quantity * (1 - d.pct_discount / 100)) "
+            "FROM t_shirts t JOIN discounts d ON t.t_shirt_id = d.t_shirt_id")
+
+
+def test_column_usage_separates_filters_ranges_and_joins(db):
+    usage = column_usage(
+        "SELECT t.brand, SUM(t.price * t.stock_quantity) FROM t_shirts t JOIN discounts d "
+        "ON t.t_shirt_id = d.t_shirt_id WHERE t.brand = 'Nike' AND t.size IN ('XS', 'S') AND price > 10 "
+        "GROUP BY t.brand", db.column_names())
+    assert usage["t_shirts"]["eq"] == {"brand", "size"}
+    assert usage["t_shirts"]["range"] == {"price"}
+    assert usage["t_shirts"]["join"] == {"t_shirt_id"}
+    assert usage["discounts"]["join"] == {"t_shirt_id"}
+    assert "stock_quantity" in usage["t_shirts"]["used"]
+
+
+def test_same_shape_with_other_values_is_grouped(db):
+    columns = db.column_names()
+    first = column_usage("SELECT * FROM t_shirts WHERE brand = 'Nike' AND size = 'XS'", columns)
+    second = column_usage("SELECT * FROM t_shirts WHERE size = :size AND brand = :brand", columns)
+    assert query_shape(first) == query_shape(second)
+
+
+def test_workload_log_records_executed_sql(helper, tmp_path):
+    path = tmp_path / "workload.jsonl"
+    helper.metrics = QueryMetrics([SQLWorkloadLog(path=str(path))])
+    helper.query_tshirt_inventory_rows(STOCK_QUESTION)
+    helper.query_tshirt_inventory_rows(PRICE_QUESTION)
+    helper.query_tshirt_inventory_rows(LIST_QUESTION)
+
+    # The cube answer ran no SQL, so it is not in the workload.
+    statements = load_workload(str(path))
+    assert [statement["sql"].split(" LIMIT")[0] for statement in statements] == [PRICE_SQL, LIST_SQL]
+    assert all(statement["execution_seconds"] >= 0 for statement in statements)
+
+
+def test_advisor_recommends_the_indexes_the_workload_lacks(db, tmp_path):
+    path = tmp_path / "workload.jsonl"
+    sink = SQLWorkloadLog(path=str(path))
+    for sql, seconds in [(LOW_STOCK_SQL, 0.3), (LOW_STOCK_SQL.replace("10", "5"), 0.3), (JOIN_SQL, 0.2),
+                         (PRICE_SQL, 0.1)]:
+        sink.record({"timestamp": 0, "source": "llm", "sql": sql, "timings": {"sql_execution": seconds},
+                     "error": None})
+
+    advisor = IndexAdvisor(db)
+    candidates = advisor.recommend(load_workload(str(path)))
+    # The UNIQUE (brand, color, size) key already serves the price lookup.
+    assert [(candidate["table"], candidate["columns"], candidate["queries"]) for candidate in candidates] == [
+        ("t_shirts", ["stock_quantity"], 2), ("discounts", ["t_shirt_id"], 1)]
+
+    candidate = advisor.evaluate(candidates[0])
+    assert candidate["rows_after"] < candidate["rows_before"]
+    assert advisor.existing_indexes("t_shirts") == [["brand", "color", "size"], ["t_shirt_id"]]
+    advisor.apply(candidate)
+    assert [candidate["table"] for candidate in advisor.recommend(load_workload(str(path)))] == ["discounts"]
@@ -0,0 +1,121 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from langchain_community.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from index_store import IndexStore, corpus_lock, model_key  # noqa: E402
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def chunks(source, count):
+    return (Document(page_content=f"{source} chunk {i}", metadata={"source": source}) for i in range(count))
+
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbeddings(size=16)
+
+
+def test_update_is_incremental(tmp_path, embeddings):
+    store = IndexStore(embeddings, str(tmp_path))
+    _, stats = store.update("docs", chunks("a", 20))
+    assert (stats["added"], stats["embedded"], stats["chunks"]) == (20, 20, 20)
+
+    _, stats = store.update("docs", chunks("a", 20))
+    assert (stats["added"], stats["embedded"], stats["removed"]) == (0, 0, 0)
+    assert embeddings.calls == 20
+
+
+def test_prune_removes_other_sources_only_when_asked(tmp_path, embeddings):
+    store = IndexStore(embeddings, str(tmp_path))
+    store.update("docs", chunks("a", 10))
+    index, stats = store.update("docs", chunks("b", 5), prune=False)
+    assert stats["chunks"] == 15
+    index, stats = store.update("docs", chunks("b", 5), prune=True)
+    assert (stats["chunks"], stats["removed"]) == (5, 10)
+    assert {doc.metadata["source"] for doc in index.docstore._dict.values()} == {"b"}
+
+
+def test_embedding_cache_is_shared_across_corpora(tmp_path, embeddings):
+    store = IndexStore(embeddings, str(tmp_path))
+    store.update("one", chunks("a", 10))
+    _, stats = store.update("two", chunks("a", 10))
+    assert (stats["embedded"], stats["cached"]) == (0, 10)
+
+
+def test_save_switches_versions_atomically(tmp_path, embeddings):
+    store = IndexStore(embeddings, str(tmp_path))
+    store.update("docs", chunks("a", 5))
+    first = store.current("docs")
+    store.update("docs", chunks("b", 5), prune=False)
+    second = store.current("docs")
+    store.update("docs", chunks("c", 5), prune=False)
+
+    assert len({first, second, store.current("docs")}) == 3
+    # The previous version stays for readers that opened it; older ones are removed.
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+    assert sorted(os.listdir(store.path("docs"))) == sorted(
+        ["CURRENT", os.path.basename(second), os.path.basename(store.current("docs"))])
+
+
+def test_index_saved_in_the_old_layout_still_loads(tmp_path, embeddings):
+    store = IndexStore(embeddings, str(tmp_path))
+    index, _ = store.update("docs", chunks("a", 5))
+    store.delete("docs")
+    index.save_local(store.path("docs"))
+    assert len(store.load("docs").index_to_docstore_id) == 5
+    _, stats = store.update("docs", chunks("b", 5), prune=False)
+    assert stats["chunks"] == 10
+    assert len(store.load("docs").index_to_docstore_id) == 10
+
+
+def test_stores_share_one_lock_per_corpus(tmp_path, embeddings):
+    # Regression: every Streamlit session has its own IndexStore, and their
+    # updates of one corpus used to interleave and lose chunks.
+    first, second = IndexStore(embeddings, str(tmp_path)), IndexStore(embeddings, str(tmp_path))
+    assert corpus_lock(first.path("docs")) is corpus_lock(second.path("docs"))
+
+    errors = []
+
+    def update(store, source):
+        try:
+            store.update("docs", chunks(source, 30), prune=False)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=update, args=(store, source))
+               for store, source in [(first, "a"), (second, "b"), (first, "c"), (second, "d")]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(first.load("docs").index_to_docstore_id) == 120
+
+
+def test_empty_corpus_is_rejected(tmp_path, embeddings):
+    with pytest.raises(ValueError):
+        IndexStore(embeddings, str(tmp_path)).update("docs", [])
+    assert IndexStore(embeddings, str(tmp_path)).load("docs") is None
+
+
+def test_model_key_uses_the_model_name():
+    class Named:
+        def __init__(self, model_name):
+            self.model_name = model_name
+            self.model = object()
+
+    assert model_key(Named("a")) == model_key(Named("a")) != model_key(Named("b"))
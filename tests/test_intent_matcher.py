@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import PRICE_QUESTION, PRICE_SQL
+from intent_matcher import DISCOUNTED_REVENUE, INVENTORY_VALUE, STOCK, InventoryIntentMatcher
+
+
+@pytest.fixture
+def matcher(db):
+    return InventoryIntentMatcher(db)
+
+
+@pytest.mark.parametrize("question, intent, filters", [
+    ("How many t-shirts do we have left for Nike in XS size and white color?", STOCK,
+     {"brand": "Nike", "size": "XS", "color": "White"}),
+    ("How many white color Levi's shirt I have?", STOCK, {"brand": "Levi", "color": "White"}),
+    ("If we have to sell all the Levi's T-shirts today with discounts applied. How much revenue our store "
+     "will generate (post discounts)?", DISCOUNTED_REVENUE, {"brand": "Levi"}),
+    ("If we have to sell all the Levi's T-shirts today. How much revenue our store will generate without "
+     "discount?", INVENTORY_VALUE, {"brand": "Levi"}),
+    ("how much sales amount will be generated if we sell all large size t shirts today in nike brand after "
+     "discounts?", DISCOUNTED_REVENUE, {"brand": "Nike", "size": "L"}),
+    ("What is the total inventory value of Adidas t-shirts?", INVENTORY_VALUE, {"brand": "Adidas"}),
+])
+def test_matches_known_question_shapes(matcher, question, intent, filters):
+    match = matcher.match(question)
+    assert match is not None
+    assert (match.intent, match.filters) == (intent, filters)
+
+
+@pytest.mark.parametrize("question", [
+    # Regressions: per-item prices and sales history are not inventory aggregates.
+    "What is the price of a Nike XS white t-shirt?",
+    "What is the price of the discounted Nike shirts?",
+    "How many Nike t shirts have we sold?",
+    # Revenue wording without an explicit inventory or sell-everything condition.
+    "How much revenue do Nike shirts make?",
+    "How much revenue will we make if we sell all Nike shirts?",
+    # Conflicting values and words outside the vocabulary.
+    "How many Nike Adidas t-shirts?",
+    "List the cheapest Nike t-shirts",
+])
+def test_falls_back_to_the_chain(matcher, question):
+    assert matcher.match(question) is None
+
+
+def test_builds_parameterized_sql(matcher, db):
+    match = matcher.match("How many white Nike t-shirts do we have?")
+    assert match.parameters == {"brand": "Nike", "color": "White"}
+    assert ":brand" in match.sql and "'Nike'" not in match.sql
+    expected = db.run("SELECT SUM(stock_quantity) FROM t_shirts WHERE brand = 'Nike' AND color = 'White'",
+                      fetch="cursor").fetchone()[0]
+    assert db.run(match.sql, fetch="cursor", parameters=match.parameters).fetchone()[0] == expected
+
+
+def test_bare_size_letters_need_the_word_size(matcher):
+    assert matcher.match("How many s t-shirts?") is None
+    assert matcher.match("How many s size t-shirts?").filters == {"size": "S"}
+
+
+def test_price_question_goes_to_the_llm(helper, db):
+    # Regression: "price" used to be read as inventory value by the fast path.
+    result = helper.query_tshirt_inventory_rows(PRICE_QUESTION)
+    assert result["source"] == "llm"
+    assert result["rows"][0][0] == db.run(PRICE_SQL, fetch="cursor").fetchone()[0]
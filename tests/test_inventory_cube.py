@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from intent_matcher import DISCOUNTED_REVENUE, INVENTORY_VALUE, STOCK, InventoryIntentMatcher
+from inventory_cube import InventoryCube
+
+
+def sql_answer(db, intent, filters):
+    sql, parameters = InventoryIntentMatcher(db)._build_sql(intent, filters)
+    return float(db.run(sql, fetch="cursor", parameters=parameters).fetchone()[0] or 0)
+
+
+def touch(db_path):
+    # SQLite's data version is the file's mtime and size; make sure a write within the same tick shows.
+    stat = os.stat(db_path)
+    os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+
+@pytest.mark.parametrize("intent, filters", [
+    (STOCK, {}),
+    (STOCK, {"brand": "Nike", "color": "White", "size": "XS"}),
+    (INVENTORY_VALUE, {"size": "S"}),
+    (DISCOUNTED_REVENUE, {"brand": "Levi"}),
+    (DISCOUNTED_REVENUE, {"brand": "Nike", "size": "L"}),
+])
+def test_cube_matches_the_intent_sql(db, intent, filters):
+    assert InventoryCube(db).answer(intent, filters) == pytest.approx(sql_answer(db, intent, filters))
+
+
+def test_unknown_value_answers_zero(db):
+    assert InventoryCube(db).answer(STOCK, {"brand": "Puma"}) == 0.0
+
+
+def test_data_change_is_applied_incrementally(db, db_path):
+    cube = InventoryCube(db)
+    before = cube.answer(STOCK, {"brand": "Nike"})
+    t_shirt_id, stock = db.run("SELECT t_shirt_id, stock_quantity FROM t_shirts WHERE brand = 'Nike' LIMIT 1",
+                               fetch="cursor").fetchone()
+    db.run(f"UPDATE t_shirts SET stock_quantity = {stock + 5} WHERE t_shirt_id = {t_shirt_id}")
+    touch(db_path)
+
+    built = cube._values
+    assert cube.answer(STOCK, {"brand": "Nike"}) == before + 5
+    assert cube._values is built  # updated in place, not rebuilt
+
+
+def test_discount_change_updates_revenue(db, db_path):
+    cube = InventoryCube(db)
+    before = cube.answer(DISCOUNTED_REVENUE, {})
+    db.run("UPDATE discounts SET pct_discount = 50")
+    touch(db_path)
+    assert cube.answer(DISCOUNTED_REVENUE, {}) != pytest.approx(before)
+    assert cube.answer(DISCOUNTED_REVENUE, {}) == pytest.approx(sql_answer(db, DISCOUNTED_REVENUE, {}))
+
+
+def test_helper_answers_stock_questions_from_the_cube(helper, db):
+    question = "How many t-shirts do we have left for Nike in XS size and white color?"
+    result = helper.query_tshirt_inventory_rows(question)
+    assert result["source"] == "cube"
+    assert result["rows"][0][0] == sql_answer(db, STOCK, {"brand": "Nike", "color": "White", "size": "XS"})
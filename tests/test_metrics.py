@@ -0,0 +1,41 @@
+import socket
+import urllib.request
+
+import metrics
+from metrics import HistogramRegistry, QueryMetrics, metrics_sinks_from_env, process_registry
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_registry_renders_stage_histograms_and_counters():
+    registry = HistogramRegistry()
+    with QueryMetrics([registry]).trace("How many?") as trace:
+        trace.add_timing("sql_execution", 0.02)
+    text = registry.render_prometheus()
+    assert 'teequery_stage_seconds_count{stage="sql_execution"} 1' in text
+
+
+def test_exporter_starts_once_per_process(monkeypatch):
+    # Regression: every helper used to bind METRICS_PORT again and fail with EADDRINUSE.
+    monkeypatch.setattr(metrics, "_exporter", None)
+    monkeypatch.setenv("METRICS_PORT", str(free_port()))
+    first, second = metrics_sinks_from_env(), metrics_sinks_from_env()
+    assert first == second == [process_registry()]
+    try:
+        port = metrics._exporter.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+        assert body.startswith("# HELP teequery_stage_seconds")
+    finally:
+        metrics._exporter.shutdown()
+        metrics._exporter.server_close()
+
+
+def test_export_false_never_binds(monkeypatch):
+    monkeypatch.setattr(metrics, "_exporter", None)
+    monkeypatch.setenv("METRICS_PORT", str(free_port()))
+    assert metrics_sinks_from_env(export=False) == [process_registry()]
+    assert metrics._exporter is None
@@ -0,0 +1,70 @@
+from langchain.chains.sql_database.prompt import PROMPT_SUFFIX
+from langchain.prompts import PromptTemplate
+
+from few_shots import few_shots
+from prompt_builder import BudgetedFewShotPromptTemplate, relevant_columns
+from common.token_counter import TokenCounter
+
+EXAMPLE_PROMPT = PromptTemplate(
+    input_variables=["Question", "SQLQuery", "SQLResult", "Answer"],
+    template="\nQuestion: {Question}\nSQLQuery: {SQLQuery}\nSQLResult: {SQLResult}\nAnswer: {Answer}"
+)
+QUESTION = "How many white Nike t-shirts are left?"
+
+
+class FixedExampleSelector:
+    def __init__(self, examples):
+        self.examples = examples
+
+    def add_example(self, example):
+        self.examples.append(example)
+
+    def select_examples(self, input_variables):
+        return list(self.examples)
+
+
+def build_prompt(db, max_tokens):
+    return BudgetedFewShotPromptTemplate(
+        example_selector=FixedExampleSelector(few_shots[:3]),
+        example_prompt=EXAMPLE_PROMPT,
+        prefix="You are a SQLite expert. Query for at most {top_k} results.",
+        suffix=PROMPT_SUFFIX,
+        database=db,
+        max_tokens=max_tokens,
+        input_variables=["input", "table_info", "top_k"],
+    )
+
+
+def test_token_counter_counts_something():
+    counter = TokenCounter()
+    assert counter.count("") == 0
+    assert 0 < counter.count("How many t-shirts are left?") < 20
+
+
+def test_relevant_columns_keeps_mentioned_tables_and_columns(db):
+    columns = relevant_columns(QUESTION, [], db.column_names(), {"t_shirts": db.enum_values("t_shirts")})
+    assert list(columns) == ["t_shirts"]
+    assert {"brand", "color", "t_shirt_id"} <= set(columns["t_shirts"])
+
+
+def test_relevant_columns_falls_back_to_example_tables(db):
+    examples = [{"SQLQuery": "SELECT pct_discount FROM discounts"}]
+    columns = relevant_columns("what about it", examples, db.column_names(), {})
+    assert list(columns) == ["discounts"]
+
+
+def test_generous_budget_keeps_examples_and_sample_rows(db):
+    prompt = build_prompt(db, 10000).format(input=QUESTION, top_k=5)
+    assert prompt.count("SQLResult: Result of the SQL query") == 3
+    assert "rows from t_shirts table" in prompt
+    assert QUESTION in prompt
+
+
+def test_tight_budget_trims_but_keeps_instructions_and_question(db):
+    generous = build_prompt(db, 10000).format(input=QUESTION, top_k=5)
+    tight = build_prompt(db, 250).format(input=QUESTION, top_k=5)
+    counter = TokenCounter()
+    assert counter.count(tight) < counter.count(generous)
+    assert "rows from t_shirts table" not in tight
+    assert tight.startswith("You are a SQLite expert. Query for at most 5 results.")
+    assert QUESTION in tight
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("faiss")
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from langchain_core.language_models import FakeListChatModel  # noqa: E402
+
+from query_engine import QueryEngine  # noqa: E402
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+
+def engine(tmp_path, embeddings, **kwargs):
+    chunks = [Document(page_content=f"chunk {i}", metadata={"source": "a", "start_index": i * 10}) for i in range(10)]
+    return QueryEngine(chunks, store_dir=str(tmp_path), llm=FakeListChatModel(responses=["answer"]),
+                       embeddings=embeddings, **kwargs)
+
+
+def test_question_is_embedded_once_and_reused(tmp_path):
+    embeddings = CountingEmbeddings(size=16)
+    query_engine = engine(tmp_path, embeddings)
+    result = query_engine.query("chunk 3")
+    assert result["answer"] == "answer"
+    assert result["sources"][0].page_content == "chunk 3"
+    assert embeddings.queries == 1
+
+    query_engine.query("chunk 3")
+    assert embeddings.queries == 1
+
+
+def test_query_vectors_are_bounded(tmp_path):
+    embeddings = CountingEmbeddings(size=16)
+    query_engine = engine(tmp_path, embeddings, query_cache_size=1)
+    query_engine.query("chunk 1")
+    query_engine.query("chunk 2")
+    query_engine.query("chunk 1")
+    assert embeddings.queries == 3
@@ -0,0 +1,37 @@
+from benchmark import load_corpus
+
+CORPUS = load_corpus()
+
+
+def test_batch_answers_in_order(helper):
+    questions = [item["question"] for item in CORPUS]
+    answers = helper.query_tshirt_inventory_batch(questions, max_concurrency=3)
+    assert [answer["question"] for answer in answers] == questions
+    assert all(answer["error"] is None for answer in answers)
+
+
+def test_batch_reports_errors_per_question(helper, monkeypatch):
+    def answer(question, top_k):
+        if question == "bad":
+            raise ValueError("no such column")
+        return "1"
+
+    monkeypatch.setattr(helper, "_answer", answer)
+    answers = helper.query_tshirt_inventory_batch(["good", "bad", "good"], max_concurrency=2)
+    assert [answer["error"] for answer in answers] == [None, "no such column", None]
+
+
+def test_rate_limited_question_is_retried(helper, monkeypatch):
+    calls = []
+
+    def answer(question, top_k):
+        calls.append(question)
+        if len(calls) == 1:
+            raise RuntimeError("429 quota exceeded")
+        return "1"
+
+    monkeypatch.setattr(helper, "_answer", answer)
+    monkeypatch.setattr("common.retry.backoff_delay", lambda *args: 0)
+    assert helper.query_tshirt_inventory_batch(["q"], max_retries=2)[0] == {"question": "q", "answer": "1",
+                                                                              "error": None}
+    assert len(calls) == 2
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+from metrics import HistogramRegistry  # noqa: E402
+
+
+class StubHelper:
+    metrics = None
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        pass
+
+    def query_tshirt_inventory_rows(self, question, top_k=1, with_answer=False):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        return {"question": question, "sql": "SELECT 1", "columns": ["n"], "rows": [(7,)], "answer": None,
+                "source": "llm", "timings": {}}
+
+
+def client(helper, **kwargs):
+    return TestClient(server.create_app(helper_factory=lambda: helper, registry=HistogramRegistry(), **kwargs))
+
+
+def wait_ready(test_client):
+    for _ in range(100):
+        if test_client.get("/ready").status_code == 200:
+            return
+        time.sleep(0.01)
+    raise AssertionError("helper never became ready")
+
+
+def test_query_answers_with_rows():
+    with client(StubHelper()) as test_client:
+        wait_ready(test_client)
+        response = test_client.post("/query", json={"question": "How many?"})
+    assert response.status_code == 200
+    assert response.json()["answer"] == 7
+
+
+def test_metrics_route_works_without_metrics_port(monkeypatch):
+    # Regression: /metrics only worked when METRICS_PORT bound an exporter in every worker.
+    monkeypatch.delenv("METRICS_PORT", raising=False)
+    with client(StubHelper()) as test_client:
+        response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.text.startswith("# HELP teequery_stage_seconds")
+
+
+def test_failed_warm_up_is_reported_by_ready():
+    def broken():
+        raise OSError("boom")
+
+    with TestClient(server.create_app(helper_factory=broken)) as test_client:
+        time.sleep(0.05)
+        response = test_client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["detail"] == "boom"
+
+
+def test_timed_out_query_keeps_its_slot_until_the_thread_ends():
+    # Regression: the slot used to be freed on timeout while the thread kept running.
+    helper = StubHelper(delay=0.5)
+    with client(helper, max_concurrency=1, request_timeout=0.1) as test_client:
+        wait_ready(test_client)
+        assert test_client.post("/query", json={"question": "slow"}).status_code == 504
+        assert test_client.post("/query", json={"question": "next"}).status_code == 503
+        time.sleep(0.6)
+        helper.delay = 0.0
+        assert test_client.post("/query", json={"question": "later"}).status_code == 200
+    assert helper.max_running == 1
+
+
+def test_batch_size_is_limited():
+    with client(StubHelper(), max_batch_size=2) as test_client:
+        wait_ready(test_client)
+        response = test_client.post("/query/batch", json={"questions": ["a", "b", "c"]})
+    assert response.status_code == 413
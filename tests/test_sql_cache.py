@@ -0,0 +1,99 @@
+import pytest
+
+from conftest import LIST_QUESTION, LIST_SQL, PRICE_QUESTION
+from intent_matcher import InventoryIntentMatcher
+from sql_cache import SQLQueryCache, normalize_question
+
+WHITE_NIKE_SQL = "SELECT SUM(stock_quantity) FROM t_shirts WHERE brand = 'Nike' AND color = 'White'"
+
+
+class ConstantEmbeddings:
+    """Every text gets the same vector, so only the parameter checks tell questions apart."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0, 0.0]
+
+
+@pytest.fixture
+def cache(db):
+    return SQLQueryCache(ConstantEmbeddings(), filter_aliases=InventoryIntentMatcher(db).aliases)
+
+
+def test_normalize_question():
+    assert normalize_question("How many Levi's T-Shirts?") == "how many levi t shirts"
+    assert normalize_question("Price above 10.5.") == "price above 10.5"
+
+
+def test_exact_match_does_not_embed(cache):
+    cache.store("How many white Nike t-shirts?", WHITE_NIKE_SQL)
+    calls = cache.embeddings.calls
+    assert cache.lookup("how many WHITE nike t-shirts")[0] == WHITE_NIKE_SQL
+    assert cache.embeddings.calls == calls
+
+
+def test_similar_question_with_same_parameters_hits(cache):
+    cache.store("How many white Nike t-shirts?", WHITE_NIKE_SQL)
+    assert cache.lookup("How many white Nike t-shirts do we have?")[0] == WHITE_NIKE_SQL
+
+
+def test_different_literal_misses(cache):
+    cache.store("How many white Nike t-shirts?", WHITE_NIKE_SQL)
+    assert cache.lookup("How many black Nike t-shirts?")[0] is None
+
+
+def test_extra_filter_value_misses(cache):
+    # Regression: the cached question's values all appear in the new one,
+    # but the new one adds a size the cached SQL does not filter on.
+    cache.store("How many white Nike t-shirts?", WHITE_NIKE_SQL)
+    assert cache.lookup("How many white Nike XS t-shirts?")[0] is None
+    assert cache.lookup("How many white Nike extra small t-shirts?")[0] is None
+
+
+def test_different_numbers_miss(cache):
+    cache.store("Which t-shirts cost more than 20?", "SELECT * FROM t_shirts WHERE price > 20")
+    assert cache.lookup("Which t-shirts cost more than 30?")[0] is None
+
+
+def test_lru_and_ttl_eviction():
+    cache = SQLQueryCache(ConstantEmbeddings(), max_size=1)
+    cache.store("first question", "SELECT 1")
+    cache.store("second question", "SELECT 2")
+    assert len(cache) == 1
+    assert cache.lookup("second question")[0] == "SELECT 2"
+
+    expired = SQLQueryCache(ConstantEmbeddings(), ttl=-1)
+    expired.store("first question", "SELECT 1")
+    assert expired.lookup("first question")[0] is None
+
+
+def test_schema_change_clears_entries():
+    versions = iter(["v1", "v1", "v2"])
+    cache = SQLQueryCache(ConstantEmbeddings(), schema_probe=lambda: next(versions), schema_check_interval=0)
+    cache.check_schema()
+    cache.store("first question", "SELECT 1")
+    assert cache.lookup("first question")[0] == "SELECT 1"
+    assert cache.lookup("first question")[0] is None
+
+
+def test_sql_is_only_reused_for_the_same_top_k(cache):
+    cache.store("How many white Nike t-shirts?", WHITE_NIKE_SQL, top_k=1)
+    assert cache.lookup("How many white Nike t-shirts?", top_k=50)[0] is None
+    assert cache.lookup("How many white Nike t-shirts do we have?", top_k=50)[0] is None
+    assert cache.lookup("How many white Nike t-shirts do we have?", top_k=1)[0] == WHITE_NIKE_SQL
+
+
+def test_repeated_llm_question_is_served_from_the_cache(helper):
+    assert helper.query_tshirt_inventory_rows(PRICE_QUESTION)["source"] == "llm"
+    assert helper.query_tshirt_inventory_rows(PRICE_QUESTION)["source"] == "cache"
+
+
+def test_rows_api_does_not_reuse_sql_limited_to_another_top_k(helper, db):
+    # Regression: SQL cached with LIMIT 1 used to answer a top_k=50 request with one row.
+    helper.query_tshirt_inventory(LIST_QUESTION)
+    result = helper.query_tshirt_inventory_rows(LIST_QUESTION, top_k=50)
+    assert result["source"] == "llm"
+    assert len(result["rows"]) == len(db.run(LIST_SQL, fetch="cursor").fetchall())
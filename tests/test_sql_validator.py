@@ -0,0 +1,42 @@
+import pytest
+
+from sql_validator import LocalSQLValidator, is_read_only
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT SUM(stock_quantity) FROM t_shirts WHERE brand = 'Nike'",
+    "WITH a AS (SELECT t_shirt_id FROM t_shirts) SELECT COUNT(*) FROM a;",
+    "SELECT REPLACE(color, 'e', 'a') FROM t_shirts",
+])
+def test_read_only_statements(sql):
+    assert is_read_only(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM t_shirts",
+    "SELECT 1; DROP TABLE t_shirts",
+    "SELECT * FROM t_shirts INTO OUTFILE '/tmp/x'",
+    "SELECT /*!50000 SLEEP(1) */ 1",
+    "",
+])
+def test_writes_and_stacked_statements_are_rejected(sql):
+    assert not is_read_only(sql)
+
+
+def test_validate_accepts_known_tables_columns_and_aliases(db):
+    sql = ("SELECT SUM(a.total_amount * ((100 - COALESCE(d.pct_discount, 0)) / 100)) AS revenue FROM "
+           "(SELECT SUM(price * stock_quantity) AS total_amount, t_shirt_id FROM t_shirts WHERE brand = 'Levi' "
+           "GROUP BY t_shirt_id) a LEFT JOIN discounts d ON a.t_shirt_id = d.t_shirt_id")
+    assert LocalSQLValidator(db).validate(sql) == []
+
+
+def test_validate_reports_unknown_tables_and_columns(db):
+    validator = LocalSQLValidator(db)
+    assert validator.validate("SELECT SUM(stock) FROM t_shirts") == ["unknown column stock"]
+    assert validator.validate("SELECT COUNT(*) FROM orders") == ["unknown table orders"]
+
+
+def test_validate_rejects_writes(db):
+    errors = LocalSQLValidator(db).validate("UPDATE t_shirts SET price = 0")
+    assert "only SELECT statements are allowed, got UPDATE" in errors
+    assert "forbidden keyword SET" in errors
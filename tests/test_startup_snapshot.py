@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmark import OracleLLM
+from langchain_helper import TShirtQueryHelper
+from startup_snapshot import load_snapshot
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(Engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def sqlite_backend(db_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDED_DB_PATH", db_path)
+
+
+def worker(snapshot_path, embeddings):
+    return TShirtQueryHelper(snapshot_path=snapshot_path, db_backend="sqlite", answer_mode="sql",
+                             llm=OracleLLM(sql_by_question={}), embeddings=embeddings, metrics_sinks=[])
+
+
+def test_construction_builds_nothing(statements):
+    helper = TShirtQueryHelper(snapshot_path="", metrics_sinks=[])
+    assert not {"db", "embeddings", "llm", "chain", "sql_cache"} & set(vars(helper))
+    assert statements == []
+
+
+def test_worker_starts_from_a_snapshot_without_statements_or_embeds(sqlite_backend, tmp_path, monkeypatch,
+                                                                    statements):
+    path = str(tmp_path / "snapshot.npz")
+    monkeypatch.setenv("FEW_SHOT_STORE_DIR", str(tmp_path / "saved_few_shots"))
+    worker("", CountingEmbeddings(size=16)).save_startup_snapshot(path)
+    assert load_snapshot(path)["few_shots"]["vectors"].shape[1] == 16
+
+    # A new worker with an empty few-shot store: everything has to come from the snapshot.
+    monkeypatch.setenv("FEW_SHOT_STORE_DIR", str(tmp_path / "worker_few_shots"))
+    embeddings = CountingEmbeddings(size=16)
+    helper = worker(path, embeddings)
+    del statements[:]
+    helper.db.get_table_info()
+    helper.db.column_names()
+    helper.db.enum_values("t_shirts")
+    helper.intent_matcher.aliases()
+    helper.chain
+    assert statements == []
+    assert embeddings.calls == 0
+
+
+def test_snapshot_for_other_tables_is_ignored(sqlite_backend, tmp_path):
+    path = str(tmp_path / "snapshot.npz")
+    worker("", CountingEmbeddings(size=16)).save_startup_snapshot(path)
+    snapshot = load_snapshot(path)
+    snapshot["schema"]["usable_tables"] = ["t_shirts"]
+    helper = worker("", CountingEmbeddings(size=16))
+    helper.snapshot = snapshot
+    assert sorted(helper.db.get_usable_table_names()) == ["discounts", "t_shirts"]